@@ -18,6 +18,9 @@ import tempfile
 import subprocess
 import time
 import json
+import contextlib
+import functools
+from collections import deque
 from pathlib import Path
 
 # ---------- Configuration ----------
@@ -25,7 +28,12 @@ SELF_PATH = Path(__file__).resolve()
 LIB_DIR = Path("/sdcard/abhi_lib")
 BACKUP_DIR = Path("/sdcard/abhi_backup")
 MEMORY_FILE = Path("/sdcard/abhi_memory.json")
+MEMORY_LOG = Path("/sdcard/abhi_memory.log.jsonl")
+MEMORY_MAX = 500            # entries kept in memory and in the snapshot
+MEMORY_SNAPSHOT_EVERY = 50  # appends between snapshot rewrites
 MAX_REPLACE_BYTES = 2 * 1024 * 1024  # 2 MB safety limit for replacement
+TRACE_FILE = Path("/sdcard/abhi_traces.jsonl")
+TRACE_ENABLED = False       # --trace or the 'trace' command turns spans on
 
 # Ensure directories exist
 LIB_DIR.mkdir(parents=True, exist_ok=True)
@@ -38,19 +46,129 @@ def log(msg):
     now = time.strftime("%Y-%m-%d %H:%M:%S")
     print(f"[{now}] {msg}")
 
+class Tracer:
+    """
+    Minimal tracer: nested spans on a stack (the CLI is single-threaded), one
+    JSONL line per finished span in the same schema as vega_full's
+    traces.jsonl, so `vega_full.py --trace-chrome` converts either file.
+    Disabled, span() is one attribute check and a shared null context.
+    """
+    def __init__(self, path, enabled=False):
+        self.path = Path(path)
+        self.enabled = enabled
+        self._stack = []
+        self._next_id = 1
+        self._null = contextlib.nullcontext({})
+
+    def span(self, name, **attrs):
+        if not self.enabled:
+            return self._null
+        return self._record(name, attrs)
+
+    @contextlib.contextmanager
+    def _record(self, name, attrs):
+        parent = self._stack[-1] if self._stack else None
+        span_id = self._next_id
+        self._next_id += 1
+        trace_id = parent[0] if parent else os.urandom(8).hex()
+        self._stack.append((trace_id, span_id))
+        wall, start = time.time(), time.perf_counter_ns()
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            dur = time.perf_counter_ns() - start
+            self._stack.pop()
+            rec = {"trace": trace_id, "span": span_id, "parent": parent[1] if parent else None, "name": name,
+                   "ts": round(wall, 6), "start_us": start // 1000, "dur_us": dur // 1000,
+                   "pid": os.getpid(), "thread": "main"}
+            if attrs:
+                rec["attrs"] = attrs
+            try:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                log(f"trace write failed: {e}")
+
+TRACER = Tracer(TRACE_FILE, TRACE_ENABLED)
+
+def traced(name):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+class MemoryStore:
+    """
+    Capped memory ring (deque). Each append is one line in MEMORY_LOG; every
+    MEMORY_SNAPSHOT_EVERY appends the ring is written to MEMORY_FILE (atomic
+    rename) and the log is truncated. Records carry a "seq" so replay after a
+    crash between the two steps never duplicates entries.
+    """
+    def __init__(self, snapshot_path, log_path, maxlen=MEMORY_MAX, snapshot_every=MEMORY_SNAPSHOT_EVERY):
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = Path(log_path)
+        self.snapshot_every = snapshot_every
+        self.items = deque(maxlen=maxlen)
+        self.seq = 0
+        self.since_snapshot = 0
+
+    def load(self):
+        try:
+            arr = json.loads(self.snapshot_path.read_text(encoding="utf-8") or "[]")
+        except Exception:
+            arr = []
+        self.items.extend(arr)
+        self.seq = max((r.get("seq", 0) for r in self.items), default=0)
+        if self.log_path.exists():
+            for line in self.log_path.read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if rec.get("seq", 0) > self.seq:
+                    self.items.append(rec)
+                    self.seq = rec["seq"]
+                    self.since_snapshot += 1
+        return self
+
+    @traced("memory_append")
+    def append(self, entry):
+        self.seq += 1
+        rec = {"seq": self.seq, "time": time.time(), "entry": entry}
+        self.items.append(rec)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec) + "\n")
+        self.since_snapshot += 1
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(list(self.items)))
+            f.flush()
+            os.fsync(f.fileno())  # snapshot must be durable before the log it replaces is truncated
+        os.replace(tmp, self.snapshot_path)
+        self.log_path.write_text("", encoding="utf-8")
+        self.since_snapshot = 0
+
+MEMORY = MemoryStore(MEMORY_FILE, MEMORY_LOG).load()
+
 def save_memory(entry):
-    try:
-        arr = json.loads(MEMORY_FILE.read_text(encoding="utf-8") or "[]")
-    except Exception:
-        arr = []
-    arr.append({"time": time.time(), "entry": entry})
-    MEMORY_FILE.write_text(json.dumps(arr, indent=2), encoding="utf-8")
+    MEMORY.append(entry)
 
 def typed_confirm(prompt="Type CONFIRM: YES to proceed"):
     print(prompt)
     ans = input("> ").strip()
     return ans == "CONFIRM: YES"
 
+@traced("backup_self")
 def backup_self():
     ts = time.strftime("%Y%m%d_%H%M%S")
     dest = BACKUP_DIR / f"{SELF_PATH.stem}_backup_{ts}.py"
@@ -60,6 +178,7 @@ def backup_self():
     return dest
 
 # ---------- Git helper (tries git CLI, otherwise raises) ----------
+@traced("git_clone")
 def git_clone(repo_url, branch="main"):
     tmp = Path(tempfile.mkdtemp(prefix="abhi_update_"))
     log(f"Cloning repo {repo_url} into {tmp} ...")
@@ -87,6 +206,7 @@ def git_clone(repo_url, branch="main"):
             raise RuntimeError("git clone failed - install git or gitpython")
 
 # ---------- Update from GitHub ----------
+@traced("update_from_github")
 def update_from_github(repo_url: str, branch: str = "main", repo_file_path: str | None = None):
     """
     repo_url: HTTPS git url, e.g. https://github.com/user/repo.git
@@ -155,6 +275,7 @@ def update_from_github(repo_url: str, branch: str = "main", repo_file_path: str
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
 # ---------- Rewrite self from input ----------
+@traced("rewrite_self_from_input")
 def rewrite_self_from_input():
     log("REQUEST: rewrite_self_from_input")
     if not typed_confirm("You are about to overwrite this script. Type CONFIRM: YES to proceed"):
@@ -196,6 +317,7 @@ def rewrite_self_from_input():
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
 # ---------- Simple book download helper (with typed confirmation) ----------
+@traced("download_book_to_lib")
 def download_book_to_lib(url: str, filename: str | None = None):
     if not typed_confirm("Download book from internet? Type CONFIRM: YES to allow"):
         log("User declined download.")
@@ -223,6 +345,7 @@ def download_book_to_lib(url: str, filename: str | None = None):
 def list_books():
     return sorted([p.name for p in LIB_DIR.glob("*.txt")])
 
+@traced("read_book")
 def read_book(name):
     p = LIB_DIR / name
     if not p.exists():
@@ -245,6 +368,7 @@ Available admin commands:
        e.g. update github https://github.com/user/repo.git main abhi_x4.py
   rewrite self
   backup
+  trace             (toggle span tracing to TRACE_FILE)
   exit
 Notes:
  - For update/rewrite/download operations you MUST type the exact confirmation string:
@@ -264,45 +388,53 @@ def main_loop():
         if not cmd:
             continue
         parts = cmd.split()
-        if parts[0].lower() in ("help","h","?"):
-            print_help()
-            continue
-
-        if cmd.lower() == "list books":
-            print("\n".join(list_books() or ["<no books>"]))
-            continue
-
-        if parts[0].lower() == "read" and len(parts) >= 2:
-            name = " ".join(parts[1:])
-            read_book(name)
-            continue
-
-        if parts[0].lower() == "download" and len(parts) >= 2:
-            url = parts[1]
-            filename = parts[2] if len(parts) >= 3 else None
-            download_book_to_lib(url, filename)
-            continue
-
-        if parts[0].lower() == "update" and len(parts) >= 3 and parts[1].lower() == "github":
-            repo_url = parts[2]
-            branch = parts[3] if len(parts) >= 4 else "main"
-            repo_file = parts[4] if len(parts) >= 5 else None
-            update_from_github(repo_url, branch=branch, repo_file_path=repo_file)
-            continue
-
-        if cmd.lower() == "rewrite self":
-            rewrite_self_from_input()
-            continue
-
-        if cmd.lower() == "backup":
-            backup_self()
-            continue
-
-        if cmd.lower() == "exit":
-            log("Exit requested by user.")
-            break
-
-        print("Unknown command. Type 'help' for list.")
+        with TRACER.span("command", cmd=parts[0].lower()):
+            if parts[0].lower() in ("help","h","?"):
+                print_help()
+                continue
+
+            if cmd.lower() == "list books":
+                print("\n".join(list_books() or ["<no books>"]))
+                continue
+
+            if parts[0].lower() == "read" and len(parts) >= 2:
+                name = " ".join(parts[1:])
+                read_book(name)
+                continue
+
+            if parts[0].lower() == "download" and len(parts) >= 2:
+                url = parts[1]
+                filename = parts[2] if len(parts) >= 3 else None
+                download_book_to_lib(url, filename)
+                continue
+
+            if parts[0].lower() == "update" and len(parts) >= 3 and parts[1].lower() == "github":
+                repo_url = parts[2]
+                branch = parts[3] if len(parts) >= 4 else "main"
+                repo_file = parts[4] if len(parts) >= 5 else None
+                update_from_github(repo_url, branch=branch, repo_file_path=repo_file)
+                continue
+
+            if cmd.lower() == "rewrite self":
+                rewrite_self_from_input()
+                continue
+
+            if cmd.lower() == "backup":
+                backup_self()
+                continue
+
+            if cmd.lower() == "trace":
+                TRACER.enabled = not TRACER.enabled
+                log(f"Tracing {'on' if TRACER.enabled else 'off'} -> {TRACER.path}")
+                continue
+
+            if cmd.lower() == "exit":
+                log("Exit requested by user.")
+                break
+
+            print("Unknown command. Type 'help' for list.")
 
 if __name__ == "__main__":
+    if "--trace" in sys.argv:
+        TRACER.enabled = True
     main_loop()
@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# vega_full creates its log directory at import time: keep tests off /sdcard
+os.environ.setdefault("VEGA_LOG_DIR", tempfile.mkdtemp(prefix="vega_test_"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
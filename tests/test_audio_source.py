@@ -0,0 +1,38 @@
+import vega_full
+
+
+class Bus:
+    def __init__(self):
+        self.events = []
+
+    def publish_threadsafe(self, kind, payload):
+        self.events.append((kind, payload))
+
+
+def test_missing_speech_recognition_fails_once(monkeypatch, capsys):
+    calls = []
+
+    def listen():
+        calls.append(1)
+        raise ImportError("No module named 'speech_recognition'")
+
+    monkeypatch.setattr(vega_full, "listen_utterance", listen)
+    vega_full.audio_source(Bus(), sleep=lambda s: None)  # returns instead of looping forever
+    assert len(calls) == 1
+    assert capsys.readouterr().out.count("voice input disabled") == 1
+
+
+def test_errors_back_off_and_reset_after_success(monkeypatch, capsys):
+    script = [OSError("no mic")] * 8 + ["audio", OSError("no mic"), ImportError("stop")]
+    delays, bus = [], Bus()
+
+    def listen():
+        step = script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return step
+
+    monkeypatch.setattr(vega_full, "listen_utterance", listen)
+    vega_full.audio_source(bus, sleep=delays.append)
+    assert delays == [1, 2, 4, 8, 16, 32, vega_full.AUDIO_RETRY_MAX, vega_full.AUDIO_RETRY_MAX, 1]
+    assert bus.events == [("audio", "audio")]
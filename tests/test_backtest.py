@@ -0,0 +1,68 @@
+import pytest
+
+import vega_full
+
+
+class OneBarEngine:
+    """Warm after one bar and never ready for ATR levels: the 24h-change rules decide."""
+    warmup = 1
+
+    def __init__(self):
+        self.ticks = 0
+
+    def update(self, close, high=None, low=None):
+        self.ticks += 1
+
+    def snapshot(self):
+        return None
+
+
+T0 = 1_700_000_000
+BARS = [  # (ts, high, low, close)
+    (T0, 100.0, 100.0, 100.0),        # flat 24h -> trend down: long at 100, stop 98 (-2%), target 103 (+3%)
+    (T0 + 60, 103.5, 99.0, 102.0),    # target hit at 103; up 2% on the day: long at 102, stop 100.98, target 105.06
+    (T0 + 120, 102.0, 100.0, 101.0),  # stop hit at 100.98; up 1%: long at 101, stop 99.99, target 104.03
+    (T0 + 180, 101.5, 100.5, 101.0),  # nothing touched: closed at the last close by report()
+]
+
+
+def run(fee_pct, bars=BARS):
+    bt = vega_full.Backtest(fee_pct, engine=OneBarEngine())
+    bt.feed(bars)
+    return bt.report()
+
+
+def test_fixed_series_with_fees_on_both_sides():
+    side = 1 - 0.001  # 0.1% per side
+    rets = [103 / 100 * side ** 2 - 1, 100.98 / 102 * side ** 2 - 1, 101 / 101 * side ** 2 - 1]
+    equity = (1 + rets[0]) * (1 + rets[1]) * (1 + rets[2])
+    r = run(0.1)
+    assert r["bars"] == 4 and r["trades"] == 3
+    assert (r["target"], r["stop"], r["open_at_end"]) == (1, 1, 1)
+    assert (r["down_win"], r["up_loss"]) == (1, 2)
+    assert r["hit_rate"] == pytest.approx(1 / 3)
+    assert r["pnl_pct"] == pytest.approx((equity - 1) * 100)
+    assert r["max_drawdown_pct"] == pytest.approx((1 - equity / (1 + rets[0])) * 100)
+
+
+def test_without_fees_the_flat_exit_breaks_even():
+    r = run(0.0)
+    assert r["pnl_pct"] == pytest.approx((1.03 * 0.99 - 1) * 100)
+    assert (r["down_win"], r["up_loss"]) == (1, 2)  # an exit at the entry price is not a win
+
+
+def test_a_bar_touching_stop_and_target_counts_as_the_stop():
+    r = run(0.0, BARS[:1] + [(T0 + 60, 104.0, 97.0, 100.0)])
+    assert r["stop"] == 1 and "target" not in r
+    assert r["pnl_pct"] == pytest.approx(-2.0)
+
+
+def test_run_backtest_streams_a_csv(tmp_path, capsys):
+    path = tmp_path / "bars.csv"
+    path.write_text("timestamp,high,low,close\n" + "".join(f"{ts * 1000},{h},{l},{c}\n" for ts, h, l, c in BARS))
+    chunks = list(vega_full.read_price_bars(str(path), chunk=3))
+    assert [len(c) for c in chunks] == [3, 1]
+    assert [bar for chunk in chunks for bar in chunk] == BARS  # epoch milliseconds -> seconds
+    r = vega_full.run_backtest(str(path), fee_pct=0.1)
+    assert r["bars"] == 4
+    assert "(fee 0.1%/side)" in capsys.readouterr().out
@@ -0,0 +1,129 @@
+import math
+import random
+import time
+import wave
+
+import pytest
+
+pytest.importorskip("speech_recognition")
+
+import vega_full
+
+RATE = 16000
+
+
+def write_wav(path, layout, rate=RATE, seed=1):
+    """layout: ("noise" | "tone", seconds) steps -> mono 16-bit WAV."""
+    rng = random.Random(seed)
+    samples = []
+    for kind, seconds in layout:
+        for i in range(int(seconds * rate)):
+            if kind == "tone":
+                samples.append(int(6000 * math.sin(2 * math.pi * 440 * i / rate)))
+            else:
+                samples.append(rng.randint(-30, 30))
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(b"".join(s.to_bytes(2, "little", signed=True) for s in samples))
+    return str(path)
+
+
+THREE_WORDS = [("noise", 1.0)] + [("tone", 0.6), ("noise", 1.2)] * 3
+
+
+def capture(path, **kw):
+    cap = vega_full.AudioCapture(vega_full.WavFileSource(path), queue_size=100, **kw).start()
+    assert cap.finished.wait(10)
+    out = []
+    while True:
+        audio = cap.next_utterance(timeout=0)
+        if audio is None:
+            return cap, out
+        out.append(audio)
+
+
+def test_gate_drops_frames_while_speaking(tmp_path):
+    path = write_wav(tmp_path / "three.wav", THREE_WORDS)
+    frame_s = vega_full.CAPTURE_FRAME_MS / 1000.0
+    reads = iter(range(10 ** 6))
+
+    def gate():  # "assistant speaking" over the first tone (1.0 s - 1.8 s of the file)
+        return 1.0 <= next(reads) * frame_s < 1.8
+
+    cap, utterances = capture(path, gate=gate)
+    assert len(utterances) == 2
+    assert cap.gated_frames > 0
+
+
+def test_gate_resets_utterance_in_progress(tmp_path):
+    path = write_wav(tmp_path / "one.wav", [("noise", 1.0), ("tone", 0.6), ("noise", 1.2)])
+    frame_s = vega_full.CAPTURE_FRAME_MS / 1000.0
+    reads = iter(range(10 ** 6))
+
+    def gate():  # playback starts half-way through the tone
+        return next(reads) * frame_s >= 1.3
+
+    cap, utterances = capture(path, gate=gate)
+    assert utterances == []
+
+
+def test_speaker_reports_speaking_with_tail():
+    tts = vega_full.Speaker(vega_full.FakeTTSEngine(seconds_per_char=0.02)).start()
+    assert not tts.speaking()
+    tts.speak("नमस्ते दुनिया")  # ~0.25 s of fake playback
+    time.sleep(0.1)
+    assert tts.speaking()
+    tts.drain(timeout=5)
+    assert tts.speaking(tail=10)
+    assert not tts.speaking(tail=0)
+
+
+@pytest.mark.parametrize("gap", [0.9, 1.5])
+def test_segments_each_word(tmp_path, gap):
+    path = write_wav(tmp_path / "words.wav", [("noise", 1.0)] + [("tone", 0.6), ("noise", gap)] * 4)
+    cap, utterances = capture(path)
+    assert len(utterances) == 4
+    preroll, hangover = vega_full.VAD_PREROLL_MS / 1000.0, vega_full.VAD_HANGOVER_MS / 1000.0
+    for audio in utterances:
+        seconds = len(audio.frame_data) / 2 / audio.sample_rate
+        assert 0.6 <= seconds <= 0.6 + preroll + hangover + 0.1
+        assert audio.sample_rate == RATE
+
+
+def test_short_gap_merges_words(tmp_path):
+    # a pause shorter than the hangover is part of the same utterance
+    path = write_wav(tmp_path / "merged.wav", [("noise", 1.0), ("tone", 0.5), ("noise", 0.3), ("tone", 0.5), ("noise", 1.2)])
+    cap, utterances = capture(path)
+    assert len(utterances) == 1
+
+
+def test_clicks_are_not_utterances(tmp_path):
+    path = write_wav(tmp_path / "clicks.wav", [("noise", 1.0)] + [("tone", 0.09), ("noise", 1.0)] * 3)
+    cap, utterances = capture(path)
+    assert utterances == []
+    assert cap.vad.noise_floor is not None
+
+
+def test_utterance_cut_at_end_of_file(tmp_path):
+    path = write_wav(tmp_path / "cut.wav", [("noise", 1.0), ("tone", 0.8)])
+    cap, utterances = capture(path)
+    assert len(utterances) == 1
+
+
+def test_replay_wav_counts(tmp_path, capsys):
+    path = write_wav(tmp_path / "three.wav", THREE_WORDS)
+    assert vega_full.replay_wav(path) == 3
+    assert "3 utterances" in capsys.readouterr().out
+
+
+def test_wav_source_rejects_stereo(tmp_path):
+    path = tmp_path / "stereo.wav"
+    with wave.open(str(path), "wb") as wf:
+        wf.setnchannels(2)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(b"\0" * 400)
+    with pytest.raises(ValueError):
+        vega_full.AudioCapture(vega_full.WavFileSource(str(path))).start()
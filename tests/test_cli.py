@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+import vega_full
+
+SCRIPT = vega_full.__file__
+
+
+def run(*args, **env):
+    return subprocess.run([sys.executable, SCRIPT, *args], capture_output=True, text=True, timeout=60,
+                          env=dict(os.environ, **env), stdin=subprocess.DEVNULL)
+
+
+def test_listen_wav_without_path():
+    r = run("--listen-wav")
+    assert r.returncode == 2
+    assert "usage" in r.stdout
+    assert "Traceback" not in r.stderr
+
+
+def test_listen_wav_missing_file(tmp_path):
+    r = run("--listen-wav", str(tmp_path / "missing.wav"))
+    assert r.returncode == 1
+    assert "cannot replay" in r.stdout
+
+
+def test_trace_chrome_without_path():
+    r = run("--trace-chrome")
+    assert r.returncode == 2
+    assert "Traceback" not in r.stderr
+
+
+def test_startup_profile_stubs_the_feed_and_the_device(tmp_path):
+    r = run("--startup-profile", VEGA_LOG_DIR=str(tmp_path))
+    assert r.returncode == 0
+    assert "time to first listen" in r.stdout
+    assert not (tmp_path / "tickstore").exists()  # the fake poll went to a scratch store
@@ -0,0 +1,90 @@
+import subprocess
+import threading
+import time
+
+import pytest
+
+import vega_full
+
+
+class Local:
+    """CommandRunner.local stand-in: fails while `failing`, optionally blocking on `gate`."""
+
+    def __init__(self):
+        self.failing = True
+        self.gate = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, cmd, **kw):
+        with self._lock:
+            self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failing:
+            raise subprocess.CalledProcessError(1, cmd, "", "boom")
+        return subprocess.CompletedProcess(cmd, 0, "ok", "")
+
+
+@pytest.fixture
+def feedback(monkeypatch):
+    logged = []
+    monkeypatch.setattr(vega_full, "log_feedback", lambda cmd, status, details="": logged.append(status))
+    return logged
+
+
+def runner(local, cooldown=0.2):
+    return vega_full.CommandRunner(threshold=2, cooldown=cooldown, sleep=lambda s: None, local=local)
+
+
+def test_breaker_lets_a_single_probe_through():
+    b = vega_full.CircuitBreaker(threshold=2, cooldown=10)
+    assert not b.record(False, 0) and b.record(False, 0)  # second failure trips it
+    assert not b.allow(5)
+    assert b.allow(10)  # half-open: one trial
+    assert not b.allow(10) and not b.allow(15)
+    assert not b.record(False, 15)  # trial failed: open again, not a new trip
+    assert not b.allow(20) and b.allow(25)
+    b.record(True, 25)
+    assert b.allow(25) and b.allow(25)
+
+
+def test_stuck_probe_frees_the_slot_after_cooldown():
+    b = vega_full.CircuitBreaker(threshold=1, cooldown=10)
+    b.record(False, 0)
+    assert b.allow(10)
+    assert not b.allow(19)
+    assert b.allow(20)
+
+
+def test_concurrent_callers_during_half_open_run_one_probe(feedback):
+    local = Local()
+    r = runner(local, cooldown=0.05)
+    for _ in range(2):
+        r.run(["probe"], "probe", retries=0)
+    assert local.calls == 2
+    time.sleep(0.1)
+    local.failing, local.gate = False, threading.Event()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(r.run(["probe"], "probe", retries=0))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while local.calls < 3:
+        time.sleep(0.01)
+    local.gate.set()
+    for t in threads:
+        t.join()
+    assert local.calls == 3  # exactly one probe reached the command
+    assert sorted(ok for ok, _ in results) == [False] * 7 + [True]
+    assert r.metrics["probe"]["short_circuited"] == 7
+    assert r.run(["probe"], "probe", retries=0) == (True, "ok")  # closed again
+
+
+def test_short_circuits_are_not_logged_as_failures(feedback):
+    local = Local()
+    r = runner(local, cooldown=60)
+    for _ in range(5):
+        r.run(["probe"], "probe", retries=0)
+    assert local.calls == 2
+    assert feedback == ["fail", "fail", "circuit_open", "short_circuit", "short_circuit", "short_circuit"]
+    assert r.metrics["probe"]["fail"] == 2
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import vega_full
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(vega_full, "PERSIST", vega_full.PersistWorker())  # not started: writes apply inline
+
+    def make(**kw):
+        return vega_full.ConversationStore(str(tmp_path / "memory.json"), str(tmp_path / "memory.log.jsonl"), **kw).load()
+    return make
+
+
+def log_seqs(s):
+    with open(s.log_path, encoding="utf-8") as f:
+        return [json.loads(line)["seq"] for line in f]
+
+
+def test_appends_go_to_the_log_until_the_snapshot(store):
+    s = store(snapshot_every=3)
+    s.append({"user": "a"})
+    s.append({"user": "b"})
+    assert log_seqs(s) == [1, 2]
+    assert vega_full.load_json(s.snapshot_path, None) is None
+    s.append({"user": "c"})  # third append: snapshot, then the log is trimmed
+    snap = vega_full.load_json(s.snapshot_path, None)
+    assert snap["seq"] == 3 and [e["user"] for e in snap["conversations"]] == ["a", "b", "c"]
+    assert log_seqs(s) == []
+    s.append({"user": "d"})
+    assert log_seqs(s) == [4]
+
+
+def test_reload_is_the_snapshot_plus_newer_log_lines(store):
+    s = store(snapshot_every=2)
+    for u in "abc":
+        s.append({"user": u})
+    r = store()
+    assert [e["user"] for e in r.recent(10)] == ["a", "b", "c"]
+    assert r.since(1) == ([{"user": "b"}, {"user": "c"}], 3)
+    r.append({"user": "d"})  # sequence numbers continue after the reload
+    assert log_seqs(r) == [3, 4]
+
+
+def test_log_lines_the_snapshot_already_holds_are_not_replayed_twice(store):
+    s = store(snapshot_every=100)
+    for u in "ab":
+        s.append({"user": u})
+    s.snapshot()
+    with open(s.log_path, "a", encoding="utf-8") as f:  # a crash between the snapshot and the trim
+        f.write(json.dumps({"seq": 2, "user": "b"}) + "\n")
+        f.write('{"seq": 3, "us')
+    assert [e["user"] for e in store().recent(10)] == ["a", "b"]
+
+
+def test_the_ring_keeps_only_the_newest_entries(store):
+    s = store(maxlen=3, snapshot_every=2)
+    for n in range(5):
+        s.append({"n": n})
+    assert [e["n"] for e in s] == [2, 3, 4]
+    assert [e["n"] for e in store(maxlen=3).recent(10)] == [2, 3, 4]
+    assert len(s) == 3
@@ -0,0 +1,146 @@
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+import vega_full
+
+pytestmark = pytest.mark.skipif(shutil.which("sh") is None or not hasattr(os, "killpg"), reason="needs a POSIX sh")
+
+
+@pytest.fixture
+def executor():
+    ex = vega_full.DeviceExecutor(shell=["sh"])
+    yield ex
+    ex.close()
+
+
+def alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+
+def test_stdout_exit_code_and_stderr(executor):
+    assert executor.run(["echo", "नमस्ते"]).stdout == "नमस्ते\n"
+    assert executor.run(["printf", "no newline"]).stdout == "no newline"
+    assert executor.run(["printf", "a\\n\\nb\\n\\n"]).stdout == "a\n\nb\n\n"
+    res = executor.run(["sh", "-c", "echo out; echo err >&2; exit 3"], check=False)
+    assert (res.returncode, res.stdout, res.stderr) == (3, "out\n", "err\n")
+    with pytest.raises(subprocess.CalledProcessError) as e:
+        executor.run(["sh", "-c", "exit 1"])
+    assert e.value.returncode == 1
+
+
+def test_arguments_are_quoted(executor):
+    arg = "it's $HOME; `true` | cat"
+    assert executor.run(["printf", "%s", arg]).stdout == arg
+
+
+def test_commands_do_not_read_the_helpers_stdin(executor):
+    assert executor.run(["cat"]).stdout == ""
+    assert executor.run(["echo", "still in sync"]).stdout == "still in sync\n"
+
+
+def test_pipelined_commands_keep_order_on_one_helper(executor):
+    futures = [executor.submit(["sh", "-c", f"echo {i}; echo e{i} >&2; exit {i % 3}"]) for i in range(30)]
+    results = [f.result(timeout=10) for f in futures]
+    assert [r.stdout for r in results] == [f"{i}\n" for i in range(30)]
+    assert [r.stderr for r in results] == [f"e{i}\n" for i in range(30)]
+    assert [r.returncode for r in results] == [i % 3 for i in range(30)]
+    assert executor.counters["helper_starts"] == 1
+    assert os.listdir(executor._errdir) == []  # per-command stderr files are cleaned up
+
+
+def test_timeout_kills_hung_command_and_recovers(executor, tmp_path):
+    pidfile = tmp_path / "pid"
+    hung = executor.submit(["sh", "-c", f"sleep 60 & echo $! > {pidfile}; wait"], timeout=0.5)
+    queued = executor.submit(["echo", "behind the hung one"])
+    with pytest.raises(subprocess.TimeoutExpired):
+        hung.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        queued.result(timeout=5)
+    assert executor.counters["timeouts"] == 1
+    assert wait_for(pidfile.exists)
+    pid = int(pidfile.read_text())
+    assert wait_for(lambda: not alive(pid)), "the hung command outlived its helper shell"
+    assert executor.run(["echo", "fresh"]).stdout == "fresh\n"
+    assert executor.counters["helper_starts"] == 2
+
+
+def test_helper_exit_fails_pending_and_restarts(executor):
+    with pytest.raises(RuntimeError):
+        executor.submit(["exit", "0"]).result(timeout=5)  # the helper itself exits
+    assert executor.run(["echo", "back"]).stdout == "back\n"
+    assert executor.counters["helper_starts"] == 2
+
+
+def test_ensure_dedupes_until_failure_or_refresh(executor):
+    assert executor.ensure("flag", True, ["true"]).result(timeout=5).returncode == 0
+    assert executor.ensure("flag", True, ["true"]) is None
+    assert executor.counters["deduped"] == 1
+    executor.invalidate("flag")
+    executor.ensure("flag", True, ["false"]).result(timeout=5)
+    assert wait_for(lambda: executor.ensure("flag", True, ["true"]) is not None, timeout=1)
+
+
+def test_queued_command_times_out_without_waiting_for_the_head(executor):
+    head = executor.submit(["sleep", "1.5"], timeout=5)
+    queued = executor.submit(["echo", "late"], timeout=0.3)
+    start = time.monotonic()
+    with pytest.raises(vega_full.DeviceNotRun):
+        queued.result(timeout=5)
+    assert time.monotonic() - start < 1.2
+    assert executor.counters["queue_timeouts"] == 1
+    assert head.result(timeout=10).returncode == 0  # the head was left alone
+    assert executor.run(["echo", "next"]).stdout == "next\n"  # the skipped command did not desync the helper
+    assert executor.counters["helper_starts"] == 1
+
+
+def test_oneshot_commands_do_not_hold_up_the_helper(tmp_path):
+    ex = vega_full.DeviceExecutor(shell=["sh"], oneshot=("sleep", "sh", "no-such-command-vega"))
+    try:
+        slow = ex.submit(["sleep", "1"])
+        start = time.monotonic()
+        assert ex.run(["echo", "quick"]).stdout == "quick\n"
+        assert time.monotonic() - start < 0.5
+        assert slow.result(timeout=5).returncode == 0
+        pidfile = tmp_path / "pid"
+        with pytest.raises(subprocess.TimeoutExpired):
+            ex.run(["sh", "-c", f"sleep 60 & echo $! > {pidfile}; wait"], timeout=0.5)
+        assert wait_for(lambda: not alive(int(pidfile.read_text())))
+        assert ex.run(["no-such-command-vega"], check=False).returncode == 127
+        assert ex.counters["oneshot"] == 3 and ex.counters["helper_starts"] == 1
+    finally:
+        ex.close()
+
+
+def test_not_run_device_commands_stay_off_the_breaker(monkeypatch):
+    monkeypatch.setattr(vega_full, "log_feedback", lambda *a, **kw: None)
+
+    class Restarting:
+        def run(self, cmd_list, timeout=None):
+            raise vega_full.DeviceNotRun("device helper restarted before termux-volume ran")
+
+    r = vega_full.CommandRunner(threshold=2, sleep=lambda s: None, device=Restarting())
+    for _ in range(5):
+        ok, out = r.run(["termux-volume"], "volume_read", retries=0)
+        assert not ok and "restarted" in out
+    assert r.metrics["volume_read"]["not_run"] == 5
+    assert r.metrics["volume_read"].get("short_circuited", 0) == 0
+    assert r.snapshot()["volume_read"]["breaker"] == "closed"
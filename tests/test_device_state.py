@@ -0,0 +1,24 @@
+import vega_full
+
+
+def test_refresh_periods_stay_under_max_age():
+    assert vega_full.BATTERY_REFRESH < vega_full.BATTERY_MAX_AGE
+    assert vega_full.DEVICE_STATE_REFRESH < vega_full.VOLUME_MAX_AGE
+
+
+def test_battery_read_is_served_from_memory_between_ticks(monkeypatch):
+    state = vega_full.DeviceState()
+    runs = []
+
+    def safe_run(cmd, label=None, retries=0, timeout=10):
+        runs.append(label)
+        return True, "level: 87\nstatus: 2\n"
+
+    monkeypatch.setattr(vega_full, "safe_run", safe_run)
+    monkeypatch.setattr(vega_full, "DEVICE_STATE", state)
+    vega_full.handle_tick("battery")
+    assert runs == ["battery"]
+    assert state.get_battery() == {"level": 87, "status": 2, "charging": True}
+    assert runs == ["battery"]  # the tick's reading is still fresh
+    vega_full.handle_tick("device_state")
+    assert runs == ["battery", "volume_read"]
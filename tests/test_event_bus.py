@@ -0,0 +1,117 @@
+import asyncio
+import queue
+import threading
+
+import pytest
+
+import vega_full
+
+
+@pytest.fixture
+def stdin(monkeypatch):
+    lines = queue.Queue()
+
+    def fake_input(prompt=""):
+        line = lines.get(timeout=5)
+        if line is None:
+            raise EOFError
+        return line
+    monkeypatch.setattr("builtins.input", fake_input)
+    yield lines
+    lines.put(None)  # let the reader thread see EOF and exit
+
+
+def collector():
+    got, cond = [], threading.Condition()
+
+    def on_line(line):
+        with cond:
+            got.append(line)
+            cond.notify_all()
+
+    def wait_for(n):
+        with cond:
+            assert cond.wait_for(lambda: len(got) >= n, timeout=5)
+        return got
+    return on_line, wait_for
+
+
+def test_lines_go_to_the_bus_when_nobody_asks(stdin):
+    term, (on_line, wait_for) = vega_full.TerminalInput(), collector()
+    term.start(on_line)
+    stdin.put("STATS")
+    stdin.put("HUSH")
+    assert wait_for(2) == ["STATS", "HUSH"]
+
+
+def test_ask_takes_the_next_line_ahead_of_the_bus(stdin):
+    term, (on_line, wait_for) = vega_full.TerminalInput(), collector()
+    term.start(on_line)
+    answer = []
+    asker = threading.Thread(target=lambda: answer.append(term.ask(timeout=5)))
+    asker.start()
+    while not term._pending:
+        vega_full.time.sleep(0.001)
+    stdin.put("CONFIRM: YES")
+    asker.join(5)
+    stdin.put("STATS")
+    assert answer == ["CONFIRM: YES"]
+    assert wait_for(1) == ["STATS"]
+
+
+def test_an_ask_that_times_out_does_not_swallow_the_next_line(stdin):
+    term, (on_line, wait_for) = vega_full.TerminalInput(), collector()
+    term.start(on_line)
+    assert term.ask(timeout=0.01) is None
+    stdin.put("STATS")
+    assert wait_for(1) == ["STATS"]
+
+
+def test_ask_reads_stdin_directly_without_a_core(stdin):
+    term = vega_full.TerminalInput()
+    stdin.put("token-123")
+    assert term.ask("token: ") == "token-123"
+    stdin.put(None)
+    assert term.ask() is None
+
+
+def test_bus_delivers_events_from_other_threads_in_order():
+    async def main():
+        bus = vega_full.EventBus(asyncio.get_running_loop())
+        bus.publish("tick", "battery")
+        t = threading.Thread(target=lambda: [bus.publish_threadsafe("terminal", str(i)) for i in range(3)])
+        t.start()
+        got = [await bus.get() for _ in range(4)]
+        t.join()
+        return got
+    assert asyncio.run(main()) == [("tick", "battery")] + [("terminal", str(i)) for i in range(3)]
+
+
+def test_handlers_run_off_the_loop_bounded_per_kind(monkeypatch):
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow(payload):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        vega_full.time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+    monkeypatch.setitem(vega_full.EVENT_HANDLERS, "tick", slow)
+
+    async def main():
+        limit = asyncio.Semaphore(2)
+        await asyncio.gather(*(vega_full._run_handler("tick", i, limit) for i in range(6)))
+    asyncio.run(main())
+    assert peak[0] == 2
+
+
+def test_a_failing_handler_is_logged_not_raised(monkeypatch):
+    feedback = []
+    monkeypatch.setattr(vega_full, "log_feedback", lambda cmd, status, details="": feedback.append((cmd, status, details)))
+
+    def boom(payload):
+        raise RuntimeError("no mic")
+    monkeypatch.setitem(vega_full.EVENT_HANDLERS, "audio", boom)
+    asyncio.run(vega_full._run_handler("audio", None, asyncio.Semaphore(1)))
+    assert feedback == [("internal_exception", "fail", "no mic")]
@@ -0,0 +1,81 @@
+import os
+
+import vega_full
+
+
+def event_log(tmp_path, **kw):
+    return vega_full.EventLog(str(tmp_path / "events"), fsync_every=1, **kw)
+
+
+def test_segments_rotate_by_size_and_read_back_in_order(tmp_path):
+    log = event_log(tmp_path, segment_bytes=200)
+    for n in range(20):
+        log.append("usage", {"n": n})
+    assert len(log.segments()) > 2
+    assert [r["n"] for r in log.iter_events("usage")] == list(range(20))
+    log.close()
+
+
+def test_segments_rotate_by_age(tmp_path):
+    log = event_log(tmp_path, segment_seconds=0)
+    log.append("usage", {"n": 1})
+    log.append("usage", {"n": 2})
+    assert len(log.segments()) == 3  # each append closes its segment, the last one is still empty
+    log.close()
+
+
+def test_types_share_the_log_and_filter_on_read(tmp_path):
+    log = event_log(tmp_path)
+    log.append_many([("usage", {"n": 1}), ("feedback", {"ok": True}), ("usage", {"n": 2})])
+    assert [r["n"] for r in log.iter_events("usage")] == [1, 2]
+    assert log.tail("feedback") == [{"type": "feedback", "ok": True}]
+    log.close()
+
+
+def test_compaction_keeps_the_newest_records_per_type(tmp_path):
+    log = event_log(tmp_path, segment_bytes=200, retain={"usage": 5})
+    for n in range(30):
+        log.append("usage", {"n": n})
+    log.append("feedback", {"ok": True})
+    log.compact()
+    assert len(log.segments()) == 2  # the merged closed segments + the fresh current one
+    assert [r["n"] for r in log.iter_events("usage")] == list(range(25, 30))
+    assert len(log.tail("feedback")) == 1  # no retain limit for this type
+    assert not [n for n in os.listdir(log.directory) if n.endswith(".tmp")]
+    log.close()
+
+
+def test_compaction_runs_once_segments_exceed_the_limit(tmp_path):
+    log = event_log(tmp_path, segment_bytes=1, max_segments=3)
+    for n in range(10):
+        log.append("usage", {"n": n})
+    assert len(log.segments()) <= 3
+    assert [r["n"] for r in log.iter_events("usage")] == list(range(10))
+    log.close()
+
+
+def test_a_torn_last_line_is_skipped_and_does_not_eat_the_next_record(tmp_path):
+    log = event_log(tmp_path)
+    log.append_many([("usage", {"n": 1}), ("usage", {"n": 2})])
+    log.close()
+    seg = log._segment_path(log.segments()[-1])
+    with open(seg, "a", encoding="utf-8") as f:
+        f.write('{"type": "usage", "n"')  # crash mid-write
+    log = event_log(tmp_path)
+    assert [r["n"] for r in log.iter_events("usage")] == [1, 2]
+    log.append("usage", {"n": 3})
+    assert [r["n"] for r in log.iter_events("usage")] == [1, 2, 3]
+    log.compact()
+    assert [r["n"] for r in log.iter_events("usage")] == [1, 2, 3]
+    log.close()
+
+
+def test_legacy_json_list_is_migrated_once(tmp_path):
+    legacy = tmp_path / "vega_usage.json"
+    vega_full.save_json(str(legacy), [{"cmd": "a"}, {"cmd": "b"}])
+    log = event_log(tmp_path)
+    assert log.import_legacy(str(legacy), "usage") == 2
+    assert log.import_legacy(str(legacy), "usage") == 0
+    assert [r["cmd"] for r in log.iter_events("usage")] == ["a", "b"]
+    assert (tmp_path / "vega_usage.json.migrated").exists()
+    log.close()
@@ -0,0 +1,118 @@
+import http.server
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("requests")
+
+import vega_full
+
+
+class StandIn:
+    """Local HTTP server: counts connections and requests, replies from a script of
+    (status, delay) steps and then 200 forever."""
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.counts = Counter()
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stand_in.counts["connections"] += 1
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+                stand_in.counts[self.command] += 1
+                status, delay = stand_in.script.pop(0) if stand_in.script else (200, 0)
+                time.sleep(delay)
+                body = b'{"ok": true}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.handle_error = lambda request, address: None  # clients that timed out hung up
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def make(script=()):
+        servers.append(StandIn(script))
+        return servers[-1]
+
+    yield make
+    for s in servers:
+        s.close()
+
+
+def test_retries_5xx_with_backoff(stand_in):
+    server = stand_in([(503, 0), (503, 0)])
+    client = vega_full.HttpClient(retries=2, backoff=0.1)
+    start = time.perf_counter()
+    r = client.get(server.url)
+    elapsed = time.perf_counter() - start
+    client.close()
+    assert r.status_code == 200
+    assert server.counts["GET"] == 3
+    assert elapsed >= 0.15  # second retry waits backoff * 2
+
+
+def test_gives_up_after_retry_budget(stand_in):
+    server = stand_in([(503, 0)] * 5)
+    client = vega_full.HttpClient(retries=2, backoff=0)
+    r = client.get(server.url)
+    client.close()
+    assert r.status_code == 503
+    assert server.counts["GET"] == 3
+
+
+def test_session_reused_per_host(stand_in):
+    server = stand_in()
+    client = vega_full.HttpClient()
+    for _ in range(5):
+        assert client.get(server.url).json() == {"ok": True}
+    client.close()
+    assert server.counts["GET"] == 5
+    assert server.counts["connections"] == 1
+    assert client.requests_by_host["127.0.0.1"] == 5
+
+
+def test_read_timeout_not_retried_on_budgeted_host(stand_in):
+    server = stand_in([(200, 1.0)] * 3)
+    client = vega_full.HttpClient(retries=2, backoff=0, timeouts={"127.0.0.1": 0.3},
+                                  read_retries={"127.0.0.1": 0})
+    with pytest.raises(vega_full.requests.exceptions.ConnectionError):
+        client.post(server.url, json={"inputs": "x"})
+    client.close()
+    assert server.counts["POST"] == 1
+
+
+def test_read_timeout_retried_elsewhere(stand_in):
+    server = stand_in([(200, 1.0), (200, 0)])
+    client = vega_full.HttpClient(retries=2, backoff=0, timeouts={"127.0.0.1": 0.3}, read_retries={})
+    assert client.get(server.url).status_code == 200
+    client.close()
+    assert server.counts["GET"] == 2
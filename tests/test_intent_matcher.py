@@ -0,0 +1,26 @@
+import pytest
+
+import vega_full
+
+KEYWORDS = sorted({kw for _, kws in vega_full.INTENT_RULES + vega_full.VOLUME_RULES for kw in kws}
+                  | set(vega_full.DANGEROUS_KEYWORDS))
+FRAMES = ["{}", "{} करो", "please {} now", "mera phone {} kar do", "ज़रा {} दिखाओ", "bhai {} kya hai"]
+MIXED = [
+    "फोन unlock करो", "phone ko लॉक kar do", "volume थोड़ा बढ़ा दो", "आवाज़ kam karo", "आवाज़ म्यूट",
+    "volume ऊपर", "volume", "वॉल्यूम down please", "camera से photo लो", "screen shot le lo",
+    "टाइम बताओ", "kitna time hua", "बैटरी status", "whatsapp खोलो", "youtube open karo",
+    "btc ka price batao", "ethereum का भाव क्या है", "doge kharidu kya", "run port scan on 10.0.0.5",
+    "lab.local पर scan चलाओ", "open camera", "unlock the screenshot", "lock screen का photo",
+    "volume up and open youtube", "", "   ", "namaste vega", "मुझे एक कहानी सुनाओ",
+]
+CORPUS = sorted(set(vega_full.BENCH_UTTERANCES + MIXED + [f.format(kw) for kw in KEYWORDS for f in FRAMES]))
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_matcher_agrees_with_the_legacy_chain(text):
+    assert vega_full.INTENT_MATCHER.match(text) == vega_full._legacy_local_intent(text)
+
+
+@pytest.mark.parametrize("text", ["UNLOCK phone", "Take A Screenshot", "BTC price"])
+def test_matching_ignores_case_like_the_legacy_chain(text):
+    assert vega_full.INTENT_MATCHER.match(text) == vega_full._legacy_local_intent(text) is not None
@@ -0,0 +1,62 @@
+import sys
+import threading
+
+import vega_full
+
+SAMPLES = [
+    ("स्क्रीनशॉट लो", "SCREENSHOT"), ("take a screenshot", "SCREENSHOT"), ("screen ka photo lo", "SCREENSHOT"),
+    ("समय क्या है", "TIME"), ("what time is it", "TIME"), ("kitne baje hain", "TIME"),
+    ("tell me a joke", "UNKNOWN"), ("मुझे एक कहानी सुनाओ", "UNKNOWN"), ("good morning", "UNKNOWN"),
+]
+
+
+def trained(tmp_path, rounds=3):
+    clf = vega_full.LocalIntentClassifier(str(tmp_path / "model.json"))
+    for _ in range(rounds):
+        clf.partial_fit([(text, label, 1.0) for text, label in SAMPLES])
+    return clf
+
+
+def test_predicts_trained_labels(tmp_path):
+    clf = trained(tmp_path)
+    assert clf.predict("take a screenshot", min_conf=0.5) == ("SCREENSHOT", None)
+    assert clf.predict("what time is it", min_conf=0.5) == ("TIME", None)
+    assert clf.predict("tell me a joke", min_conf=0.5) == ("UNKNOWN", "tell me a joke")
+
+
+def test_predict_during_training(tmp_path):
+    clf = trained(tmp_path)
+    errors, stop = [], threading.Event()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # interleave readers with the trainer as often as possible
+
+    def reader():
+        while not stop.is_set():
+            try:
+                clf.predict("what time is it", min_conf=0.0)
+                clf.predict("a brand new phrase %d" % len(errors), min_conf=0.0)
+            except Exception as e:  # mismatched rows / KeyError before the model swap
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for i in range(20):
+        clf.partial_fit([("new label %d" % i, "LABEL_%d" % i, 1.0)] + [(t, l, 1.0) for t, l in SAMPLES], epochs=1)
+    stop.set()
+    for t in threads:
+        t.join()
+    sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(clf.classes) == 3 + 20
+
+
+def test_training_never_mutates_published_model(tmp_path):
+    clf = trained(tmp_path)
+    m = clf.model
+    before = (m.classes, m.bias, {f: list(w) for f, w in m.weights.items()})
+    clf.partial_fit([("brand new phrase", "NEW_LABEL", 1.0)])
+    assert (m.classes, m.bias, {f: list(w) for f, w in m.weights.items()}) == before
+    assert clf.model is not m
+    assert "NEW_LABEL" in clf.model.classes
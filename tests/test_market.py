@@ -0,0 +1,195 @@
+import threading
+
+import pytest
+
+import vega_full
+
+COINS = {"bitcoin": ("BTC", []), "ethereum": ("ETH", [])}
+
+
+class FlakyFeed(vega_full.FakePriceFeed):
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.down = False
+        self.requests = []
+
+    def fetch(self, coins, currencies):
+        self.requests.append((tuple(coins), tuple(currencies)))
+        if self.down:
+            self.calls += 1
+            raise ConnectionError("feed down")
+        return super().fetch(coins, currencies)
+
+
+def market(store=None, **kw):
+    feed = FlakyFeed(**kw)
+    return feed, vega_full.MarketData(feed, store, coins=COINS, currencies=["usd", "inr"])
+
+
+def age_quotes(m, seconds):
+    for q in m.quotes.values():
+        q["ts"] -= seconds
+
+
+def test_fresh_quote_is_served_from_memory():
+    feed, m = market()
+    q = m.quote("bitcoin", "usd")
+    assert q["price"] > 0 and q["age"] < 1
+    assert feed.calls == 1
+    assert m.quote("ethereum", "inr") is not None  # same batch: every watchlist pair x currency
+    assert feed.calls == 1
+    assert (m.counters["misses"], m.counters["hits"]) == (1, 1)
+
+
+def test_expired_quote_refetches_the_whole_batch():
+    feed, m = market()
+    m.quote("bitcoin", "usd")
+    age_quotes(m, vega_full.PRICE_MAX_AGE + 1)
+    m.quote("bitcoin", "usd")
+    assert feed.calls == 2
+    assert feed.requests[-1] == (("bitcoin", "ethereum"), ("usd", "inr"))
+
+
+def test_pair_outside_watchlist_joins_the_batch():
+    feed, m = market()
+    assert m.quote("solana", "eur")["price"] > 0
+    assert feed.requests == [(("bitcoin", "ethereum", "solana"), ("usd", "inr", "eur"))]
+    assert m.quote("bitcoin", "usd") is not None and feed.calls == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    feed, m = market(latency=0.2)
+    quotes = []
+    threads = [threading.Thread(target=lambda: quotes.append(m.quote("bitcoin", "usd"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert feed.calls == 1  # the rest queued on the fetch lock and found the pair fresh
+    assert len({q["price"] for q in quotes}) == 1
+
+
+def test_stale_quote_is_served_while_the_feed_is_down(capsys):
+    feed, m = market()
+    price = m.quote("bitcoin", "usd")["price"]
+    feed.down = True
+    age_quotes(m, vega_full.PRICE_MAX_AGE + 60)
+    q = m.quote("bitcoin", "usd")
+    assert q["price"] == price
+    assert vega_full.PRICE_MAX_AGE < q["age"] <= vega_full.PRICE_STALE_MAX_AGE
+    assert m.counters["stale"] == 1 and m.counters["errors"] == 1
+    assert "price fetch failed" in capsys.readouterr().out
+
+
+def test_nothing_past_the_stale_window():
+    feed, m = market()
+    m.quote("bitcoin", "usd")
+    feed.down = True
+    age_quotes(m, vega_full.PRICE_STALE_MAX_AGE + 1)
+    assert m.quote("bitcoin", "usd") is None
+    assert m.counters["stale"] == 0
+
+
+def test_tick_round_trip_through_the_store(tmp_path):
+    pytest.importorskip("numpy")
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    feed, m = market(store)
+    for _ in range(5):
+        m.refresh()
+    got = store.range(vega_full.TickStore.asset("bitcoin", "usd"))
+    assert got["price"].size == 5
+    assert list(got["ts"]) == sorted(got["ts"])
+    assert got["price"][-1] == pytest.approx(m.quotes[("bitcoin", "usd")]["price"])
+    assert (got["volume"] > 0).all()
+    fresh = vega_full.MarketData(FlakyFeed(), store, coins=COINS, currencies=["usd", "inr"])
+    assert fresh.load_history() == 5 * 4
+    assert fresh.indicators("bitcoin", "usd") == m.indicators("bitcoin", "usd")
+
+
+def test_tick_store_splits_days_and_slices_ranges(tmp_path):
+    np = pytest.importorskip("numpy")
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    day = 86400 * 20000
+    ts = [day - 120.0, day - 60.0, day, day + 60.0, day + 120.0]
+    store.append_many("x_usd", ts, [1.0, 2.0, 3.0, 4.0, 5.0], [10.0] * 5)
+    assert store.days("x_usd") == ["20241003", "20241004"]
+    assert list(store.range("x_usd")["price"]) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert list(store.range("x_usd", day - 60, day + 61)["price"]) == [2.0, 3.0, 4.0]
+    one_day = store.range("x_usd", day)
+    assert isinstance(one_day["price"], np.memmap)  # a single-day range is a zero-copy view
+    store.append("x_usd", day + 180.0, 6.0)
+    assert store.range("x_usd")["price"].size == 6
+
+
+def seed_history(store, n=30, price=100.0):
+    now = vega_full.time.time()
+    store.append_many(vega_full.TickStore.asset("bitcoin", "usd"),
+                      [now - 60.0 * (n - i) for i in range(n)], [price + i for i in range(n)])
+
+
+def test_warm_up_keeps_history_when_a_quote_arrives_first(tmp_path):
+    pytest.importorskip("numpy")
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    seed_history(store)
+    feed, m = market(store)
+    m.quote("bitcoin", "usd")  # a command before the poller's first tick creates the engine
+    assert m.engines[("bitcoin", "usd")].ticks == 1
+    m.poll_seconds = 60
+    m.start()
+    deadline = vega_full.time.monotonic() + 5
+    while m.counters["fetches"] < 2 and vega_full.time.monotonic() < deadline:
+        vega_full.time.sleep(0.01)
+    m.stop()
+    assert m.engines[("bitcoin", "usd")].ticks == 30 + 2  # history, the on-demand tick, the poll
+
+
+def test_flat_series_rsi_agrees_with_the_reference():
+    for prices in ([100.0] * 40, [100.0 + i for i in range(40)], [100.0 - i for i in range(40)]):
+        engine = vega_full.IndicatorEngine()
+        for p in prices:
+            engine.update(p)
+        assert engine.snapshot()["rsi"] == pytest.approx(vega_full.recompute_indicators(prices)["rsi"])
+    assert vega_full.recompute_indicators([100.0] * 40)["rsi"] == 50.0
+
+
+def test_late_rows_are_merged_in_ts_order(tmp_path):
+    pytest.importorskip("numpy")
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    day = 86400 * 20000
+    store.append_many("x_usd", [day + 300.0, day + 400.0], [3.0, 4.0], [30.0, 40.0])
+    store.append_many("x_usd", [day + 350.0, day - 100.0, day + 100.0], [3.5, 0.5, 1.0], [35.0, 5.0, 10.0])
+    got = store.range("x_usd")
+    assert list(got["ts"]) == [day - 100.0, day + 100.0, day + 300.0, day + 350.0, day + 400.0]
+    assert list(got["price"]) == [0.5, 1.0, 3.0, 3.5, 4.0]
+    assert list(got["volume"]) == [5.0, 10.0, 30.0, 35.0, 40.0]
+    assert list(store.range("x_usd", day + 320, day + 400)["price"]) == [3.5]
+    assert not [n for n in (tmp_path / "ticks" / "x_usd").iterdir() if n.suffix == ".tmp"]
+
+
+def test_bars_volume_follows_the_assets_volume_kind(tmp_path):
+    pytest.importorskip("numpy")
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    hour = 3600 * 480000
+    ts = [hour + 10.0, hour + 20.0, hour + 70.0, hour + 80.0]
+    store.append_many("coin_usd", ts, [1.0, 2.0, 3.0, 4.0], [500.0, 510.0, 520.0, 530.0], volume_kind="rolling_24h")
+    store.append_many("trades_usd", ts, [1.0, 2.0, 3.0, 4.0], [5.0, 1.0, 2.0, 3.0], volume_kind="per_tick")
+    store.append_many("legacy_usd", ts, [1.0, 2.0, 3.0, 4.0], [500.0, 510.0, 520.0, 530.0])
+    assert list(store.bars("coin_usd")["volume"]) == [510.0, 530.0]
+    assert list(store.bars("coin_usd", interval="1h")["volume"]) == [530.0]
+    assert list(store.bars("trades_usd")["volume"]) == [6.0, 5.0]
+    assert list(store.bars("trades_usd", interval="1d")["volume"]) == [11.0]
+    assert list(store.bars("legacy_usd", interval="1h")["volume"]) == [530.0]  # undeclared: a running total
+    assert list(store.bars("coin_usd", volume="sum")["volume"]) == [1010.0, 1050.0]
+    assert vega_full.TickStore(str(tmp_path / "ticks")).volume_kind("trades_usd") == "per_tick"
+    with pytest.raises(ValueError):
+        store.append("trades_usd", hour + 90.0, 5.0, 1.0, volume_kind="rolling_24h")
+    with pytest.raises(ValueError):
+        store.append("other_usd", hour, 1.0, volume_kind="cumulative")
+
+
+def test_polled_ticks_are_recorded_as_rolling_volume(tmp_path):
+    store = vega_full.TickStore(str(tmp_path / "ticks"))
+    feed, m = market(store)
+    m.refresh()
+    assert store.volume_kind(vega_full.TickStore.asset("bitcoin", "usd")) == "rolling_24h"
+    assert (tmp_path / "ticks" / "bitcoin_usd" / "volume_kind").read_text() == "rolling_24h"
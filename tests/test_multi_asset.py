@@ -0,0 +1,44 @@
+import pytest
+
+import vega_full
+
+
+@pytest.mark.parametrize("text, coin", [
+    ("bitcoin का भाव बताओ", "bitcoin"),
+    ("बिटकॉइन price kya hai", "bitcoin"),
+    ("btc खरीदूँ क्या", "bitcoin"),
+    ("एथेरियम ka rate", "ethereum"),
+    ("should i buy सोलाना", "solana"),
+    ("डॉजकॉइन abhi kitne ka hai", "dogecoin"),
+    ("doge बेचूँ?", "dogecoin"),
+    ("dogecoin aur बिटकॉइन", "bitcoin"),  # several coins: watchlist order decides
+    ("सोना कितने का है", None),
+    ("market kaisa hai", None),
+])
+def test_coin_from_text_on_mixed_script_input(text, coin):
+    assert vega_full.coin_from_text(text.lower()) == coin
+
+
+def test_every_alias_names_its_own_coin():
+    for coin, (ticker, aliases) in vega_full.WATCHLIST.items():
+        assert ticker.isupper()
+        for alias in aliases:
+            assert alias == alias.lower()
+            assert vega_full.coin_from_text(f"{alias} ka price") == coin
+
+
+@pytest.mark.parametrize("text, coin", [
+    ("एथेरियम का price", "ethereum"), ("Solana खरीदूँ?", "solana"), ("DOGE ka bhav", "dogecoin"),
+])
+def test_mixed_script_requests_route_to_trade_advice_for_that_coin(text, coin):
+    assert vega_full.INTENT_MATCHER.match(text) == ("TRADE_ADVICE", coin)
+
+
+def test_trade_advice_quotes_the_requested_coin(monkeypatch):
+    market = vega_full.MarketData(vega_full.FakePriceFeed(), coins=vega_full.WATCHLIST, currencies=["usd"])
+    monkeypatch.setattr(vega_full, "MARKET", market)
+    reply = vega_full.trading_suggestion("solana")
+    assert reply.startswith("SOL price $1")
+    assert market.counters["fetches"] == 1
+    assert vega_full.trading_suggestion("dogecoin").startswith("DOGE price $0.1")
+    assert market.counters["fetches"] == 1  # one batch served every watchlist coin
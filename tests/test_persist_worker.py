@@ -0,0 +1,66 @@
+import threading
+
+import vega_full
+
+
+def test_ops_apply_synchronously_until_started(tmp_path):
+    worker = vega_full.PersistWorker()
+    path = tmp_path / "a.log"
+    worker.submit_line(str(path), "one\n")
+    assert path.read_text() == "one\n"
+
+
+def test_shutdown_flushes_everything_still_queued(tmp_path, monkeypatch):
+    log = vega_full.EventLog(str(tmp_path / "events"))
+    monkeypatch.setattr(vega_full, "EVENT_LOG", log)
+    worker = vega_full.PersistWorker(flush_seconds=60, flush_batch=10_000)
+    worker.start()
+    lines, state = tmp_path / "a.log", tmp_path / "state.json"
+    for n in range(5):
+        worker.submit_line(str(lines), f"{n}\n")
+        worker.submit_json(str(state), {"n": n})
+        worker.submit_event("usage", {"n": n})
+    assert not lines.exists()  # batched behind the 60 s timer
+    assert vega_full.load_json(str(state), None) is None
+    assert worker.shutdown(timeout=5)
+    assert not worker.running()
+    assert lines.read_text() == "0\n1\n2\n3\n4\n"
+    assert vega_full.load_json(str(state), None) == {"n": 4}  # rewrites coalesce, last one wins
+    assert [r["n"] for r in log.iter_events("usage")] == list(range(5))
+    log.close()
+
+
+def test_load_json_sees_a_queued_rewrite(tmp_path, monkeypatch):
+    worker = vega_full.PersistWorker(flush_seconds=60, flush_batch=10_000)
+    monkeypatch.setattr(vega_full, "PERSIST", worker)
+    worker.start()
+    state = str(tmp_path / "state.json")
+    worker.submit_json(state, {"n": 1})
+    assert vega_full.load_json(state, None) == {"n": 1}
+    assert worker.flush(timeout=5)
+    assert worker.pending_json(state) == (False, None)
+    assert worker.shutdown(timeout=5)
+
+
+def test_calls_run_after_earlier_writes(tmp_path):
+    worker = vega_full.PersistWorker(flush_seconds=60, flush_batch=10_000)
+    worker.start()
+    path, seen, done = tmp_path / "a.log", [], threading.Event()
+    worker.submit_line(str(path), "x\n")
+    worker.submit_call(lambda: (seen.append(path.read_text()), done.set()))
+    assert done.wait(5)
+    assert seen == ["x\n"]
+    assert worker.shutdown(timeout=5)
+
+
+def test_a_full_batch_flushes_before_the_timer(tmp_path):
+    worker = vega_full.PersistWorker(flush_seconds=60, flush_batch=3)
+    worker.start()
+    path = tmp_path / "a.log"
+    for n in range(3):
+        worker.submit_line(str(path), f"{n}\n")
+    deadline = vega_full.time.monotonic() + 5
+    while not path.exists() and vega_full.time.monotonic() < deadline:
+        vega_full.time.sleep(0.01)
+    assert path.read_text() == "0\n1\n2\n"
+    assert worker.shutdown(timeout=5)
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import vega_full
+
+
+def test_bench_replay_restores_real_services(tmp_path, capsys):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("समय क्या है\ntake a screenshot\nbitcoin price\n", encoding="utf-8")
+    engine, stdin, local = vega_full.TTS.engine, sys.stdin, vega_full.RUNNER.local
+    rate, stages = vega_full.bench_replay(str(corpus), rounds=1)
+    out = capsys.readouterr().out
+    assert "3 utterances from" in out
+    assert "termux-screenshot" in out  # device commands reached the fake executor
+    assert rate > 0 and stages.report()
+    assert vega_full.TTS.engine is engine
+    assert vega_full.RUNNER.device is None and vega_full.RUNNER.local is local
+    assert sys.stdin is stdin
+    assert vega_full.HTTP._sessions == {}
+
+
+def test_default_corpus_reads_replay_source_dir(tmp_path, monkeypatch):
+    log = vega_full.EventLog(str(tmp_path / "events"))
+    log.append_many([("usage", {"command": "समय क्या है"}), ("feedback", {"command": "ignored"})])
+    log.close()
+    monkeypatch.setattr(vega_full, "REPLAY_SOURCE_DIR", str(tmp_path))
+    assert vega_full.load_replay_corpus() == (["समय क्या है"], str(tmp_path / "events"))
+    monkeypatch.setattr(vega_full, "REPLAY_SOURCE_DIR", str(tmp_path / "missing"))
+    assert vega_full.load_replay_corpus()[1] == "built-in samples"
+
+
+def test_screenshots_stay_under_the_log_dir(tmp_path):
+    assert vega_full.SCREENSHOT_DIR == os.path.join(vega_full.LOG_DIR, "screenshots")
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("take a screenshot\n", encoding="utf-8")
+    vega_full.bench_replay(str(corpus), rounds=1)
+    assert os.path.isdir(vega_full.SCREENSHOT_DIR)  # created on first use, not at import
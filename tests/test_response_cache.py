@@ -0,0 +1,52 @@
+import pytest
+
+import vega_full
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(vega_full, "PERSIST", vega_full.PersistWorker())  # not started: sqlite writes apply inline
+
+    def make(**kw):
+        return vega_full.ResponseCache(str(tmp_path / "hf_cache.sqlite"), **kw)
+    return make
+
+
+def test_keys_cover_model_prompt_and_parameters():
+    key = vega_full.ResponseCache.make_key
+    assert key("m", "hi", {"a": 1, "b": 2}) == key("m", "hi", {"b": 2, "a": 1})
+    assert key("m", "hi", {"a": 1}) != key("m", "hi", {"a": 2})
+    assert key("m", "hi", {}) != key("n", "hi", {})
+
+
+def test_lru_evicts_the_least_recently_used_and_sqlite_serves_it(cache):
+    c = cache(max_items=2)
+    c.put("a", "A")
+    c.put("b", "B")
+    assert c.get("a") == "A"  # a is now the most recent
+    c.put("c", "C")
+    assert list(c._mem) == ["a", "c"]
+    assert c.get("b") == "B"
+    assert c.stats()["disk_hits"] == 1
+    assert list(c._mem) == ["c", "b"]  # b is back in memory, a fell out
+
+
+def test_a_new_process_rehydrates_from_sqlite(cache):
+    cache().put("k", "reply")
+    fresh = cache()
+    assert fresh.stats()["memory_items"] == 0
+    assert fresh.get("k") == "reply"
+    assert fresh.get("k") == "reply"
+    assert fresh.stats() == {"hits": 2, "disk_hits": 1, "misses": 0, "hit_rate": 1.0, "memory_items": 1}
+
+
+def test_expired_entries_miss_and_are_purged(cache, monkeypatch):
+    c = cache(ttl=10)
+    c.put("k", "reply")
+    now = vega_full.time.time()
+    monkeypatch.setattr(vega_full.time, "time", lambda: now + 11)
+    assert c.get("k") is None
+    assert cache().get("k") is None
+    c.purge()
+    assert c.stats()["memory_items"] == 0
+    assert c._conn().execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
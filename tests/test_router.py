@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import vega_full
+
+
+@pytest.fixture
+def router(monkeypatch):
+    stats, saved, feedback = vega_full.StageStats(), [], []
+    monkeypatch.setattr(vega_full, "STAGES", stats)
+    monkeypatch.setattr(vega_full, "save_memory", lambda user, reply: saved.append((user, reply)))
+    monkeypatch.setattr(vega_full, "log_feedback", lambda cmd, status, details="": feedback.append((status, details)))
+    r = vega_full.IntentRouter(workers=2)
+    r.register_fallback()(lambda text, meta: "fallback:" + meta)
+    r.stats, r.saved, r.feedback = stats, saved, feedback
+    return r
+
+
+def counts(stats):
+    return {name: h.n for name, h in stats._hists.items()}
+
+
+def test_registered_intent_is_handled_and_remembered(router):
+    router.register("TIME")(lambda text, meta: "12:00")
+    assert router.dispatch("TIME", "time kya hai", None) == "12:00"
+    assert router.saved == [("time kya hai", "12:00")]
+    assert counts(router.stats) == {"handler": 1, "handler:TIME": 1, "persist": 1}
+
+
+def test_fallthrough_hands_the_text_to_the_fallback(router):
+    router.register("OPEN_APP")(lambda text, meta: vega_full.FALLTHROUGH)
+    assert router.dispatch("OPEN_APP", "open sesame", "sesame") == "fallback:open sesame"
+    assert router.saved == [("open sesame", "fallback:open sesame")]
+    assert counts(router.stats) == {"handler": 2, "handler:OPEN_APP": 1, "handler:UNKNOWN": 1, "persist": 1}
+
+
+def test_unrouted_intent_goes_straight_to_the_fallback(router):
+    assert router.dispatch("UNKNOWN", "good morning", None) == "fallback:good morning"
+    assert counts(router.stats) == {"handler": 1, "handler:UNKNOWN": 1, "persist": 1}
+
+
+def test_none_result_is_not_remembered(router):
+    router.register("LOCK")(lambda text, meta: None)
+    assert router.dispatch("LOCK", "lock", None) is None
+    assert router.saved == []
+    assert "persist" not in counts(router.stats)
+
+
+def test_slow_blocking_handler_stops_the_wait_and_saves_later(router):
+    release = threading.Event()
+
+    def slow(text, meta):
+        release.wait(5)
+        return "late reply"
+    router.register("TRADE_ADVICE", blocking=True, timeout=0.05)(slow)
+    assert router.dispatch("TRADE_ADVICE", "btc price", "bitcoin") is None
+    assert router.feedback == [("fail", "timeout:TRADE_ADVICE")]
+    assert router.saved == []
+    release.set()
+    deadline = vega_full.time.monotonic() + 5
+    while not router.saved and vega_full.time.monotonic() < deadline:
+        vega_full.time.sleep(0.01)
+    assert router.saved == [("btc price", "late reply")]
+    assert counts(router.stats)["handler:TRADE_ADVICE"] == 1
+
+
+def test_stage_stats_time_reset_and_report():
+    stats = vega_full.StageStats()
+    with stats.timed("stt"):
+        vega_full.time.sleep(0.01)
+    stats.record("handler:TIME", 2.0)
+    stats.record("handler", 2.0)
+    assert stats._hists["stt"].max >= 10.0
+    lines = stats.report().splitlines()
+    assert [line.split()[0] for line in lines[1:]] == ["stt", "handler", "handler:TIME"]  # ORDER first
+    old = stats.reset()
+    assert counts(old) == {"stt": 1, "handler:TIME": 1, "handler": 1}
+    assert counts(stats) == {}
@@ -0,0 +1,53 @@
+import vega_full
+
+
+def test_unchanged_payload_is_not_rewritten(tmp_path):
+    path = str(tmp_path / "state.json")
+    assert vega_full.save_json(path, {"a": 1}) is True
+    assert vega_full.save_json(path, {"a": 1}) is False
+    assert vega_full.save_json(path, {"a": 2}) is True
+
+
+def test_a_hand_edit_is_overwritten_by_the_next_save(tmp_path):
+    path = tmp_path / "state.json"
+    vega_full.save_json(str(path), {"a": 1})
+    path.write_text('{"a": 1, "edited": true}', encoding="utf-8")
+    assert vega_full.save_json(str(path), {"a": 1}) is True
+    assert vega_full.load_json(str(path), None) == {"a": 1}
+
+
+def test_previous_version_is_kept_as_bak(tmp_path):
+    path = tmp_path / "state.json"
+    vega_full.save_json(str(path), {"v": 1})
+    vega_full.save_json(str(path), {"v": 2})
+    assert vega_full.load_json(str(path) + ".bak", None) == {"v": 1}
+    assert not (tmp_path / "state.json.tmp").exists()
+
+
+def test_checksum_header_round_trips(tmp_path):
+    path = tmp_path / "memory.json"
+    vega_full.save_json(str(path), {"conversations": ["नमस्ते"]}, compact=True, checksum=True)
+    header = path.read_text(encoding="utf-8").split("\n", 1)[0]
+    assert header.startswith(f"{vega_full.JSON_HEADER} v{vega_full.JSON_FORMAT_VERSION} sha256=")
+    assert vega_full.load_json(str(path), None) == {"conversations": ["नमस्ते"]}
+
+
+def test_torn_main_file_falls_back_to_bak(tmp_path, capsys):
+    path = tmp_path / "memory.json"
+    vega_full.save_json(str(path), {"v": 1}, checksum=True)
+    vega_full.save_json(str(path), {"v": 2}, checksum=True)
+    path.write_text(path.read_text(encoding="utf-8")[:-3], encoding="utf-8")  # torn write
+    assert vega_full.load_json(str(path), None) == {"v": 1}
+    assert "restored last good snapshot" in capsys.readouterr().out
+
+
+def test_checksum_mismatch_falls_back_to_bak(tmp_path):
+    path = tmp_path / "memory.json"
+    vega_full.save_json(str(path), {"v": 1}, checksum=True)
+    vega_full.save_json(str(path), {"v": 2}, checksum=True)
+    path.write_text(path.read_text(encoding="utf-8").replace('"v": 2', '"v": 3'), encoding="utf-8")
+    assert vega_full.load_json(str(path), None) == {"v": 1}
+
+
+def test_missing_files_give_the_default(tmp_path):
+    assert vega_full.load_json(str(tmp_path / "nope.json"), {"d": 0}) == {"d": 0}
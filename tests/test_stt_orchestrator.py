@@ -0,0 +1,76 @@
+import time
+
+import vega_full
+
+
+class FakeBackend(vega_full.RecognizerBackend):
+    def __init__(self, name, text, confidence, delay=0.0, error=False):
+        self.name = name
+        self.text = text
+        self.confidence = confidence
+        self.delay = delay
+        self.error = error
+
+    def recognize(self, audio):
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError("backend down")
+        return self.text, self.confidence
+
+
+def race(*backends, **kw):
+    orch = vega_full.RecognizerOrchestrator(backends, min_confidence=0.6, timeout=kw.pop("timeout", 2.0), **kw)
+    start = time.perf_counter()
+    text = orch.recognize(audio=None)
+    return text, time.perf_counter() - start, orch
+
+
+def test_preferred_backend_wins_within_grace():
+    for _ in range(5):
+        text, _, orch = race(FakeBackend("google:hi-IN", "स्क्रीनशॉट लो", 0.9, delay=0.1),
+                             FakeBackend("google:en-US", "screenshot lo", 0.9, delay=0.0), grace=0.5)
+        assert text == "स्क्रीनशॉट लो"
+        assert orch.stats["google:hi-IN"]["wins"] == 1
+
+
+def test_first_backend_confident_returns_without_waiting():
+    text, elapsed, _ = race(FakeBackend("google:hi-IN", "समय", 0.9), FakeBackend("vosk", "samay", 0.9, delay=1.0), grace=0.5)
+    assert text == "समय"
+    assert elapsed < 0.5
+
+
+def test_later_backend_wins_after_grace():
+    text, elapsed, orch = race(FakeBackend("google:hi-IN", "समय", 0.9, delay=1.0),
+                               FakeBackend("google:en-US", "samay", 0.9), grace=0.2)
+    assert text == "samay"
+    assert 0.15 <= elapsed < 0.9
+    assert orch.stats["google:en-US"]["wins"] == 1
+
+
+def test_unconfident_preferred_result_does_not_block_confident_one():
+    text, _, _ = race(FakeBackend("google:hi-IN", "गड़बड़", 0.2), FakeBackend("google:en-US", "battery", 0.9, delay=0.05))
+    assert text == "battery"
+
+
+def test_most_confident_when_none_reach_threshold():
+    text, _, _ = race(FakeBackend("google:hi-IN", "a", 0.3), FakeBackend("google:en-US", "b", 0.5), FakeBackend("vosk", "c", 0.1))
+    assert text == "b"
+
+
+def test_errors_and_empty_results():
+    text, _, orch = race(FakeBackend("google:hi-IN", "", None), FakeBackend("vosk", "x", 0.9, error=True))
+    assert text == ""
+    assert orch.stats["vosk"]["errors"] == 1
+    assert orch.stats["google:hi-IN"]["calls"] == 1
+
+
+def test_timeout_returns_best_so_far():
+    text, elapsed, _ = race(FakeBackend("google:hi-IN", "late", 0.9, delay=1.5),
+                            FakeBackend("vosk", "weak", 0.3), timeout=0.3, grace=0.1)
+    assert text == "weak"
+    assert elapsed < 1.0
+
+
+def test_missing_confidence_uses_default():
+    text, _, _ = race(FakeBackend("google:hi-IN", "no conf", None))
+    assert text == "no conf"  # STT_DEFAULT_CONFIDENCE >= min_confidence
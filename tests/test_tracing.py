@@ -0,0 +1,92 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import vega_full
+
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    monkeypatch.setattr(vega_full, "PERSIST", vega_full.PersistWorker())  # not started: lines are written inline
+    t = vega_full.Tracer(path=str(tmp_path / "trace.jsonl"), enabled=True, buffer=100)
+    monkeypatch.setattr(vega_full, "TRACER", t)
+    return t
+
+
+def by_name(tracer):
+    return {r["name"]: r for r in tracer.recent}
+
+
+def test_spans_nest_and_share_the_trace_id(tracer):
+    with tracer.span("utterance", text="hi"):
+        with tracer.span("normalize") as norm:
+            norm.set(intent="TIME")
+        with tracer.span("handler:TIME"):
+            with tracer.span("persist"):
+                pass
+    spans = by_name(tracer)
+    root = spans["utterance"]
+    assert root["parent"] is None and root["attrs"] == {"text": "hi"}
+    assert spans["normalize"]["parent"] == root["span"] and spans["normalize"]["attrs"] == {"intent": "TIME"}
+    assert spans["persist"]["parent"] == spans["handler:TIME"]["span"]
+    assert {r["trace"] for r in tracer.recent} == {root["trace"]}
+    assert [r["name"] for r in tracer.recent] == ["normalize", "persist", "handler:TIME", "utterance"]  # finish order
+    assert tracer.current_trace_id() is None
+
+
+def test_durations_cover_the_children(tracer):
+    with tracer.span("outer"):
+        vega_full.time.sleep(0.01)
+        with tracer.span("inner"):
+            vega_full.time.sleep(0.02)
+    spans = by_name(tracer)
+    outer, inner = spans["outer"], spans["inner"]
+    assert inner["dur_us"] >= 20_000
+    assert outer["dur_us"] >= inner["dur_us"] + 10_000
+    assert outer["start_us"] <= inner["start_us"]
+    assert inner["start_us"] + inner["dur_us"] <= outer["start_us"] + outer["dur_us"]
+
+
+def test_root_starts_a_new_trace_and_errors_are_recorded(tracer):
+    with tracer.span("a"):
+        with pytest.raises(ValueError):
+            with tracer.span("b", root=True):
+                raise ValueError("boom")
+    spans = by_name(tracer)
+    assert spans["b"]["parent"] is None and spans["b"]["trace"] != spans["a"]["trace"]
+    assert spans["b"]["attrs"] == {"error": "ValueError: boom"}
+
+
+def test_pool_work_keeps_its_parent_through_submit_in_context(tracer):
+    def work(name):
+        with tracer.span(name):
+            pass
+    with ThreadPoolExecutor(1) as pool:
+        with tracer.span("utterance"):
+            vega_full.submit_in_context(pool, work, "child").result()
+            pool.submit(work, "orphan").result()
+    spans = by_name(tracer)
+    assert spans["child"]["parent"] == spans["utterance"]["span"]
+    assert spans["orphan"]["parent"] is None
+
+
+def test_traced_decorator_and_the_jsonl_file(tracer):
+    @vega_full.traced("work")
+    def work(x):
+        return x * 2
+    assert work(21) == 42
+    with open(tracer.path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["name"] for r in records] == ["work"]
+    chrome = vega_full.chrome_trace(records)
+    assert [e["ph"] for e in chrome["traceEvents"]] == ["M", "X"]
+    assert chrome["traceEvents"][1]["dur"] == records[0]["dur_us"]
+
+
+def test_disabled_tracer_hands_out_the_null_span(tracer):
+    tracer.enabled = False
+    with tracer.span("x") as span:
+        span.set(a=1)
+    assert span is vega_full._NULL_SPAN
+    assert len(tracer.recent) == 0
@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pytest
+
+import vega_full
+
+
+def speaker(seconds_per_char=0.0, **kw):
+    engine = vega_full.FakeTTSEngine(seconds_per_char=seconds_per_char)
+    kw.setdefault("cache_dir", tempfile.mkdtemp(prefix="vega_tts_"))
+    return engine, vega_full.Speaker(engine, **kw)
+
+
+def wait_for(cond, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_speaks_inline_before_start():
+    engine, tts = speaker()
+    tts.speak("नमस्ते")
+    tts.speak("")
+    assert engine.spoken == ["नमस्ते"]
+    assert tts.stats()["spoken"] == 1
+
+
+def test_urgent_jumps_the_queue_and_equal_priority_is_fifo():
+    engine, tts = speaker(seconds_per_char=0.05)
+    tts.start()
+    tts.speak("blocker")  # ~0.35 s; the rest queue up behind it
+    wait_for(lambda: engine.spoken)
+    for text in ("n1", "n2"):
+        tts.speak(text)
+    for text in ("u1", "u2"):
+        tts.speak(text, priority=vega_full.TTS_URGENT)
+    tts.speak("n3")
+    tts.drain(timeout=5)
+    assert engine.spoken == ["blocker", "u1", "u2", "n1", "n2", "n3"]
+
+
+def test_interrupt_cuts_current_phrase_and_drops_queued():
+    engine, tts = speaker(seconds_per_char=0.05)
+    tts.start()
+    tts.speak("a very long reply that is still playing")  # ~2 s
+    wait_for(lambda: engine.spoken)
+    tts.speak("stale 1")
+    tts.speak("stale 2", priority=vega_full.TTS_URGENT)
+    start = time.monotonic()
+    tts.speak("stop", priority=vega_full.TTS_URGENT, interrupt=True)
+    tts.drain(timeout=5)
+    assert time.monotonic() - start < 1.0
+    assert engine.spoken == ["a very long reply that is still playing", "stop"]
+    stats = tts.stats()
+    assert stats["interrupted"] == 1
+    assert stats["dropped"] == 2
+    assert stats["queued"] == 0
+
+
+def test_interrupt_alone_stops_playback():
+    engine, tts = speaker(seconds_per_char=0.05)
+    tts.start()
+    tts.speak("a very long reply that is still playing")
+    tts.speak("next")
+    wait_for(lambda: engine.spoken)
+    tts.interrupt()
+    tts.drain(timeout=5)
+    assert engine.spoken == ["a very long reply that is still playing"]
+    assert tts.stats()["interrupted"] == 1
+    assert tts.stats()["dropped"] == 1
+    tts.speak("after")  # later phrases play normally
+    tts.drain(timeout=5)
+    assert engine.spoken[-1] == "after"
+
+
+def test_speak_is_safe_from_many_threads():
+    engine, tts = speaker()
+    tts.start()
+    threads = [threading.Thread(target=lambda i=i: [tts.speak("t%d-%d" % (i, j)) for j in range(20)]) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    tts.drain(timeout=5)
+    assert sorted(engine.spoken) == sorted("t%d-%d" % (i, j) for i in range(4) for j in range(20))
+    for i in range(4):  # each caller's phrases keep their order
+        mine = [s for s in engine.spoken if s.startswith("t%d-" % i)]
+        assert mine == ["t%d-%d" % (i, j) for j in range(20)]
+
+
+def test_repeated_phrase_is_rendered_once_and_replayed_from_cache():
+    engine, tts = speaker(cache_after=2)
+    for _ in range(4):
+        tts.speak("फोन लॉक हो गया")
+    assert engine.spoken == ["फोन लॉक हो गया"] * 4
+    assert engine.rendered == ["फोन लॉक हो गया"]  # after the second live synthesis
+    assert engine.played == ["फोन लॉक हो गया"] * 2
+    stats = tts.stats()
+    assert (stats["rendered"], stats["cache_hits"], stats["cached"]) == (1, 2, 1)
+
+
+def test_long_replies_are_never_cached():
+    engine, tts = speaker(cache_after=1)
+    reply = "x" * (vega_full.TTS_CACHE_MAX_CHARS + 1)
+    tts.speak(reply)
+    tts.speak(reply)
+    assert engine.rendered == [] and tts.stats()["cached"] == 0
+
+
+def test_cache_evicts_least_recently_used():
+    engine, tts = speaker(cache_after=1, cache_max=2)
+    for text in ("one", "two"):
+        tts.speak(text)
+    time.sleep(0.02)
+    tts.speak("one")  # cache hit refreshes its last use
+    time.sleep(0.02)
+    tts.speak("three")
+    names = sorted(os.listdir(tts.cache_dir))
+    assert names == sorted(os.path.basename(tts._cache_path(t)) for t in ("one", "three"))
+
+
+def test_engine_without_rendering_speaks_live():
+    class LiveOnly(vega_full.FakeTTSEngine):
+        renders = False
+
+    engine = LiveOnly()
+    tts = vega_full.Speaker(engine, cache_dir=tempfile.mkdtemp(prefix="vega_tts_"), cache_after=1)
+    for _ in range(3):
+        tts.speak("नमस्ते")
+    assert engine.spoken == ["नमस्ते"] * 3 and engine.rendered == [] and engine.played == []
+
+
+def test_interrupt_cuts_cached_playback():
+    engine, tts = speaker(seconds_per_char=0.05, cache_after=1)
+    phrase = "a cached reply that takes a while"
+    tts.speak(phrase)  # inline: renders it
+    tts.start()
+    tts.speak(phrase)
+    wait_for(lambda: engine.played)
+    tts.interrupt()
+    tts.drain(timeout=5)
+    assert tts.stats()["interrupted"] == 1
+
+
+@pytest.mark.skipif(shutil.which("espeak-ng") is None, reason="needs espeak-ng")
+def test_espeak_renders_a_wav(tmp_path):
+    path = str(tmp_path / "x.wav")
+    assert vega_full.EspeakTTSEngine().render("namaste", path)
+    with open(path, "rb") as f:
+        assert f.read(4) == b"RIFF"
+
+
+def test_auto_engine_prefers_one_that_can_render(monkeypatch):
+    installed = {"espeak-ng", "play-audio"}
+    monkeypatch.setattr(vega_full.shutil, "which", lambda name: name if name in installed else None)
+    assert vega_full.make_tts_engine("auto").renders
+    installed.discard("play-audio")
+    assert vega_full.make_tts_engine("auto").name == "termux"
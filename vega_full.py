@@ -18,9 +18,129 @@ IMPORTANT:
 
 """
 
-import os, time, json, threading, subprocess, requests, re, sys, shutil
+import time
 
-from collections import Counter
+_T0 = time.perf_counter()  # origin for the --startup-profile breakdown
+
+import os, json, threading, subprocess, atexit, re, sys, shlex, random, shutil, queue, copy, hashlib, sqlite3, urllib.parse, zlib, math, wave, bisect, signal, contextlib, contextvars, functools, itertools, io, tempfile, csv
+
+from array import array
+
+from concurrent.futures import ThreadPoolExecutor, Future, wait as futures_wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+import asyncio
+
+from collections import Counter, deque, OrderedDict
+
+import importlib
+
+# ---------------- Startup profile & lazy imports ----------------
+
+class StartupProfile:
+
+    """Startup wall-clock breakdown relative to _T0: mark() closes a phase on the importing thread,
+
+    phase() times a named step on any thread (lazy imports, warm-up, first listen)."""
+
+    def __init__(self, t0):
+
+        self.t0 = t0
+
+        self._last = t0
+
+        self._lock = threading.Lock()
+
+        self.rows = []
+
+        self.first_listen = None
+
+    def _add(self, name, start, end):
+
+        with self._lock:
+
+            self.rows.append((start - self.t0, end - start, threading.current_thread().name, name))
+
+    def mark(self, name):
+
+        now = time.perf_counter()
+
+        self._add(name, self._last, now)
+
+        self._last = now
+
+    @contextlib.contextmanager
+
+    def phase(self, name):
+
+        start = time.perf_counter()
+
+        try:
+
+            yield
+
+        finally:
+
+            self._add(name, start, time.perf_counter())
+
+    def report(self):
+
+        with self._lock:
+
+            rows = sorted(self.rows)
+
+        lines = [f"{'start ms':>9}{'took ms':>9}  {'thread':<16}phase"]
+
+        for start, dur, thread, name in rows:
+
+            lines.append(f"{start * 1000:9.1f}{dur * 1000:9.1f}  {thread:<16}{name}")
+
+        if self.first_listen is not None:
+
+            lines.append(f"time to first listen: {self.first_listen * 1000:.1f} ms")
+
+        return "\n".join(lines)
+
+STARTUP = StartupProfile(_T0)
+
+class _LazyModule:
+
+    """Stands in for a heavy module and imports it on first attribute access, off the startup path."""
+
+    def __init__(self, name, hint=None):
+
+        self._name = name
+
+        self._hint = hint
+
+        self._mod = None
+
+    def _load(self):
+
+        if self._mod is None:
+
+            with STARTUP.phase("import " + self._name):
+
+                try:
+
+                    self._mod = importlib.import_module(self._name)
+
+                except ImportError:
+
+                    if self._hint:
+
+                        print(f"[vega] Missing dependency: {self._name}. Install with: {self._hint}")
+
+                    raise
+
+        return self._mod
+
+    def __getattr__(self, attr):
+
+        return getattr(self._load(), attr)
+
+requests = _LazyModule("requests", "pip install requests")
+
+STARTUP.mark("stdlib imports")
 
 # ---------------- User settings ----------------
 
@@ -36,9 +156,21 @@ HF_MODEL = "gpt2"
 
 HF_API_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
 
-# Directories & files (auto-created)
+# Directories & files (auto-created); VEGA_LOG_DIR overrides, --bench-replay defaults to a scratch dir
+
+LOG_DIR = os.environ.get("VEGA_LOG_DIR", "/sdcard/vega_logs")
+
+REPLAY_SOURCE_DIR = LOG_DIR  # --bench-replay's default corpus: the usage log here, read before the switch below
 
-LOG_DIR = "/sdcard/vega_logs"
+if "--bench-replay" in sys.argv:
+
+    HF_API_KEY = HF_API_KEY or "hf_replay"  # HF requests go to StubHttp, never to the network
+
+    if "VEGA_LOG_DIR" not in os.environ:
+
+        LOG_DIR = tempfile.mkdtemp(prefix="vega_bench_")  # a benchmark never writes into the phone's logs
+
+        atexit.register(shutil.rmtree, LOG_DIR, True)  # registered first, so it runs after every other exit hook
 
 os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -52,22 +184,282 @@ APP_MAP_FILE = os.path.join(LOG_DIR, "app_mapping.json")
 
 MEMORY_FILE = os.path.join(LOG_DIR, "vega_memory.json")
 
+MEMORY_LOG = os.path.join(LOG_DIR, "vega_memory.log.jsonl")
+
 AUDIT_LOG = os.path.join(LOG_DIR, "audit.log")
 
+EVENT_DIR = os.path.join(LOG_DIR, "events")
+
+HF_CACHE_FILE = os.path.join(LOG_DIR, "hf_cache.sqlite3")
+
+LOCAL_INTENT_FILE = os.path.join(LOG_DIR, "intent_model.json")
+
 APPROVED_CMDS_FILE = os.path.join(LOG_DIR, "approved_commands.json")
 
 WHITELIST_FILE = os.path.join(LOG_DIR, "whitelist.json")
 
-SCREENSHOT_DIR = "/sdcard/vega_screenshots"
-
-os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+SCREENSHOT_DIR = os.environ.get("VEGA_SCREENSHOT_DIR", os.path.join(LOG_DIR, "screenshots"))  # created on first use
 
 # Behavior
 
 LISTEN_SECONDS = 7
 
+AUDIO_RETRY_MAX = 60.0  # s: audio source errors (no microphone, STT down) back off up to this
+
+VOSK_MODEL_PATH = "vosk-model-small-hi-0.22"  # Updated path as per download
+
+VOSK_SAMPLE_RATE = 16000
+
+# Text-to-speech: engine ("auto", "termux", "espeak", "fake"), WAV player for cached phrases, cache policy.
+
+# "auto" picks espeak-ng when it and the player are installed (pkg install espeak play-audio): only an engine
+
+# that renders to a file can use the phrase cache; termux-tts-speak cannot, so with it every phrase is live.
+
+TTS_ENGINE = "auto"
+
+TTS_PLAYER = ["play-audio"]
+
+TTS_CACHE_DIR = os.path.join(LOG_DIR, "tts_cache")
+
+TTS_CACHE_AFTER = 2        # render a phrase into the cache once it has been spoken this many times
+
+TTS_CACHE_MAX = 200        # cached WAV files kept (oldest use evicted first)
+
+TTS_CACHE_MAX_CHARS = 120  # long free-form replies are not worth caching
+
+TTS_URGENT, TTS_NORMAL = 0, 1
+
+TTS_ECHO_TAIL = 0.5  # s the microphone stays gated after playback ends (player latency, room echo)
+
+# Tracing: off unless --trace or the TRACE command turns it on
+
+TRACE_ENABLED = False
+
+TRACE_FILE = os.path.join(LOG_DIR, "traces.jsonl")
+
+TRACE_CHROME_FILE = os.path.join(LOG_DIR, "trace_chrome.json")
+
+TRACE_BUFFER = 5000  # recent spans kept in memory for the Chrome-trace dump
+
+# Device commands: run over one long-lived helper shell instead of a fresh process each
+
+DEVICE_SHELL = ["sh"]
+
+DEVICE_COMMANDS = ("am", "dumpsys", "input", "cmd", "pm", "settings", "monkey")  # plus every termux-*
+
+DEVICE_TIMEOUT = 10  # the helper runs one command at a time: a hung one holds up the queue at most this long
+
+DEVICE_ONESHOT_COMMANDS = ("termux-camera-photo", "termux-screenshot")  # slow: own process, never on the helper
+
+DEVICE_ONESHOT_TIMEOUT = 60
+
+WAKE_LOCK_REFRESH = 600  # re-assert the wake lock this often even when we believe it is held
+
+# Device state snapshot: staleness bounds and background refresh periods (seconds), volume steps.
+
+# Each refresh period stays under its max age, so reads are served from memory between ticks.
+
+BATTERY_MAX_AGE = 60
+
+BATTERY_REFRESH = 45
+
+VOLUME_MAX_AGE = 300
+
+DEVICE_STATE_REFRESH = 240  # volume
+
+VOLUME_STEP = 3
+
+VOLUME_MAX = 15  # used until termux-volume has reported the real per-stream maximum
+
+# Async core: max concurrent handler tasks per event kind, timer periods
+
+CORE_LIMITS = {"audio": 2, "terminal": 1, "tick": 1}
+
+KEEPALIVE_SECONDS = 10
+
+PROMPT_TIMEOUT = 120
+
+ANALYZE_DELAY = 15  # seconds after startup before the history analyze runs (off the first-listen path)
+
+# Speech recognition backends raced on each utterance, listed in order of preference: a result
+
+# >= STT_MIN_CONFIDENCE wins unless a preferred backend also gets there within STT_GRACE s
+
+STT_BACKENDS = ["google:hi-IN", "google:en-US", "vosk"]
+
+STT_GRACE = 0.3
+
+STT_MIN_CONFIDENCE = 0.6
+
+STT_DEFAULT_CONFIDENCE = 0.7   # used when a backend returns text without a confidence
+
+STT_RACE_TIMEOUT = 8.0
+
+# Continuous capture + energy VAD (16 kHz mono 16-bit, 30 ms frames)
+
+CAPTURE_RATE = 16000
+
+CAPTURE_FRAME_MS = 30
+
+VAD_CALIBRATION_MS = 600    # initial noise-floor estimate, done once per capture session
+
+VAD_RATIO = 2.5             # speech when frame RMS > noise floor * ratio
+
+VAD_MIN_RMS = 150
+
+VAD_NOISE_ADAPT = 0.05      # EMA weight for updating the floor from non-speech frames
+
+VAD_START_FRAMES = 3
+
+VAD_HANGOVER_MS = 700
+
+VAD_PREROLL_MS = 300
+
+VAD_MIN_SPEECH_MS = 250
+
 RETRY_ON_FAIL = 2
 
+RUN_TIMEOUT = 300  # s for non-device commands; device commands default to DEVICE_TIMEOUT
+
+# safe_run policy: backoff between attempts, per-label circuit breaker, memoized read-only commands
+
+RETRY_BASE_DELAY = 0.3
+
+RETRY_MAX_DELAY = 5.0
+
+BREAKER_THRESHOLD = 3     # consecutive failed runs before a label fails fast
+
+BREAKER_COOLDOWN = 60.0   # seconds a tripped label stays open before one trial run
+
+RUN_CACHE_TTL = {("dumpsys", "battery"): 5.0}  # command prefix -> seconds a successful result is reused
+
+RUN_METRICS_FILE = os.path.join(LOG_DIR, "run_metrics.json")
+
+# Event log (feedback + usage): segment rotation, fsync batching, compaction retention
+
+EVENT_SEGMENT_BYTES = 1024 * 1024
+
+EVENT_SEGMENT_SECONDS = 24 * 3600
+
+EVENT_FSYNC_EVERY = 20
+
+EVENT_FSYNC_SECONDS = 5.0
+
+EVENT_MAX_SEGMENTS = 8
+
+EVENT_RETAIN = {"feedback": 5000, "usage": 5000}
+
+# HTTP client pools: keep-alive sessions per host, retries with backoff, per-host timeouts
+
+HTTP_POOL_SIZE = 4
+
+HTTP_RETRIES = 2
+
+HTTP_BACKOFF = 0.3
+
+HTTP_DEFAULT_TIMEOUT = 15
+
+HTTP_TIMEOUTS = {"api-inference.huggingface.co": 30, "api.coingecko.com": 10}
+
+HTTP_READ_RETRIES = {"api-inference.huggingface.co": 0}  # a 30 s read timeout is not retried on the voice path
+
+COINGECKO_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+# Market data: background poller, quote staleness bounds, columnar tick store
+
+# watchlist: CoinGecko id -> (ticker, spoken aliases); aliases are substring-matched, so no 3-letter
+
+# tickers that hide inside ordinary words ("eth" in "something", "sol" in "console")
+
+WATCHLIST = {
+
+"bitcoin": ("BTC", ["bitcoin","btc","बिटकॉइन"]),
+
+"ethereum": ("ETH", ["ethereum","एथेरियम"]),
+
+"solana": ("SOL", ["solana","सोलाना"]),
+
+"dogecoin": ("DOGE", ["dogecoin","doge","डॉजकॉइन"])
+
+}
+
+TRADE_CURRENCY = "usd"
+
+MARKET_CURRENCIES = [TRADE_CURRENCY]  # quoted on every poll; add one (e.g. "inr") only for a path that reads it
+
+MARKET_POLL_SECONDS = 60
+
+PRICE_MAX_AGE = 90         # quotes younger than this are answered from memory
+
+PRICE_STALE_MAX_AGE = 900  # feed down: serve (and flag) a cached quote up to this age
+
+TICKSTORE_DIR = os.path.join(LOG_DIR, "tickstore")
+
+# Indicator engine (periods in ticks, i.e. poll intervals) and ATR stop/target multiples
+
+SMA_PERIOD = 20           # also the Bollinger band window
+
+BAND_K = 2.0
+
+EMA_FAST, EMA_SLOW = 12, 26
+
+RSI_PERIOD = 14
+
+ATR_PERIOD = 14
+
+ATR_STOP_MULT = 1.5
+
+ATR_TARGET_MULT = 3.0
+
+INDICATOR_WARMUP_SECONDS = 2 * 24 * 3600  # tick history replayed into the engines at startup
+
+# Backtest: rows per streamed chunk, fee per side in %
+
+BACKTEST_CHUNK = 65536
+
+BACKTEST_FEE_PCT = 0.1
+
+# HF response cache: in-memory LRU size, entry lifetime (memory + sqlite tier)
+
+HF_CACHE_MAX = 256
+
+HF_CACHE_TTL = 7 * 24 * 3600
+
+# Local intent classifier (hashed char n-grams + softmax) consulted before the HF normalizer
+
+LOCAL_INTENT_DIMS = 1 << 14
+
+LOCAL_INTENT_NGRAMS = (2, 3, 4)
+
+LOCAL_INTENT_MIN_CONF = 0.85
+
+LOCAL_INTENT_MIN_EXAMPLES = 20
+
+LOCAL_INTENT_EPOCHS = 8
+
+LOCAL_INTENT_LR = 0.5
+
+# Conversation memory: ring size and how many appends between snapshots
+
+MEMORY_MAX = 500
+
+MEMORY_SNAPSHOT_EVERY = 50
+
+# Write-behind persistence (bounded queue, flush on timer or batch size)
+
+PERSIST_QUEUE_MAX = 1000
+
+PERSIST_FLUSH_SECONDS = 0.5
+
+PERSIST_FLUSH_BATCH = 64
+
+# Checksummed JSON files start with this header line: "#vega-json v1 sha256=<hex>"
+
+JSON_HEADER = "#vega-json"
+
+JSON_FORMAT_VERSION = 1
+
 # Quick dangerous keywords block (first-pass)
 
 DANGEROUS_KEYWORDS = [
@@ -90,1058 +482,7148 @@ DEFAULT_APP_MAP = {
 
 # ---------------- Utilities ----------------
 
+_LAST_DIGEST = {}  # path -> (sha256 of the payload last written by this process, (mtime_ns, size) it left)
+
+def _read_json_file(path):
+
+    with open(path, "r", encoding="utf-8") as f:
+
+        text = f.read()
+
+    if text.startswith(JSON_HEADER):
+
+        header, _, payload = text.partition("\n")
+
+        fields = dict(p.split("=", 1) for p in header.split()[2:] if "=" in p)
+
+        if header.split()[1:2] != [f"v{JSON_FORMAT_VERSION}"]:
+
+            raise ValueError(f"unsupported format {header!r}")
+
+        if hashlib.sha256(payload.encode("utf-8")).hexdigest() != fields.get("sha256"):
+
+            raise ValueError("checksum mismatch")
+
+        return json.loads(payload)
+
+    return json.loads(text)
+
 def load_json(path, default):
 
-    try:
+    pending, data = PERSIST.pending_json(path)
 
-        if os.path.exists(path):
+    if pending:
 
-            with open(path, "r") as f:
+        return copy.deepcopy(data)
 
-                return json.load(f)
+    # a torn/corrupt file falls back to the last good snapshot (.bak) instead of the empty default
 
-    except Exception:
+    for candidate in (path, path + ".bak"):
 
-        pass
+        try:
+
+            if os.path.exists(candidate):
+
+                data = _read_json_file(candidate)
+
+                if candidate != path:
+
+                    print(f"[vega] {path} unreadable — restored last good snapshot")
+
+                return data
+
+        except Exception:
+
+            pass
 
     return default
 
-def save_json(path, data):
+def save_json(path, data, compact=False, checksum=False):
 
-    with open(path, "w") as f:
+    # atomic: write temp file, fsync, keep the previous version as .bak, rename into place
 
-        json.dump(data, f, indent=2)
+    if compact:
 
-# create small files if missing
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
 
-if not os.path.exists(FEEDBACK_FILE): save_json(FEEDBACK_FILE, [])
+    else:
 
-if not os.path.exists(USAGE_FILE): save_json(USAGE_FILE, [])
+        payload = json.dumps(data, indent=2)
 
-if not os.path.exists(SUGGESTED_FIXES): save_json(SUGGESTED_FIXES, [])
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-if not os.path.exists(APP_MAP_FILE): save_json(APP_MAP_FILE, DEFAULT_APP_MAP.copy())
+    stamp = _file_stamp(path)
 
-if not os.path.exists(MEMORY_FILE): save_json(MEMORY_FILE, {"conversations":[]})
+    if stamp is not None and _LAST_DIGEST.get(path) == (digest, stamp):
 
-# default approved commands + whitelist (safe defaults; edit before use)
+        return False  # unchanged since our last checkpoint, and nobody edited the file since
 
-if not os.path.exists(APPROVED_CMDS_FILE):
+    if checksum:
 
-    save_json(APPROVED_CMDS_FILE, {
+        payload = f"{JSON_HEADER} v{JSON_FORMAT_VERSION} sha256={digest}\n{payload}"
 
-        "ping": ["ping","-c","4","{target}"],
+    tmp = path + ".tmp"
 
-        "http_head": ["curl","-I","{target}"],
+    with open(tmp, "w", encoding="utf-8") as f:
 
-        "port_scan": ["nmap","-sT","-p","1-1024","{target}"]
+        f.write(payload)
 
-    })
+        f.flush()
 
-if not os.path.exists(WHITELIST_FILE):
+        os.fsync(f.fileno())
 
-    save_json(WHITELIST_FILE, {
+    if os.path.exists(path):
 
-        "198.51.100.23": {"owner":"security@acme.example","token":"invite-ACME-2025-08","notes":"ACME invited pentest 2025-08-09 scope: 198.51.100.23 only"},
+        os.replace(path, path + ".bak")
 
-        "lab.local": {"owner":"me","token":"local-lab","notes":"local lab only"}
+    os.replace(tmp, path)
 
-    })
+    _LAST_DIGEST[path] = (digest, _file_stamp(path))
 
-# ---------------- logging & audit ----------------
+    return True
 
-def audit_log(entry: dict):
+def _file_stamp(path):
 
-    rec = {"ts": time.time(), "human_time": time.ctime(), **entry}
+    try:
 
-    with open(AUDIT_LOG, "a") as f:
+        st = os.stat(path)
 
-        f.write(json.dumps(rec) + "\n")
+    except OSError:
 
-def log_feedback(cmd,status,details=""):
+        return None
 
-    arr = load_json(FEEDBACK_FILE, [])
+    return st.st_mtime_ns, st.st_size
 
-    arr.append({"time":time.time(),"human_time":time.ctime(),"command":cmd,"status":status,"details":details})
+# ---------------- Latency stats ----------------
 
-    save_json(FEEDBACK_FILE,arr)
+class LatencyHistogram:
 
-def log_usage(cmd):
+    """Log-spaced latency buckets in ms (x1.25 apart, 0.05 ms .. ~4 min); percentiles report the
 
-    arr = load_json(USAGE_FILE, [])
+    bucket upper bound, so they are within one bucket (~25%) of the true value."""
 
-    arr.append({"time":time.time(),"command":cmd,"time_ts":time.time()})
+    BOUNDS = [0.05 * 1.25 ** i for i in range(70)]
 
-    save_json(USAGE_FILE,arr)
+    def __init__(self):
 
-def save_memory(user, assistant):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
 
-    mem = load_json(MEMORY_FILE, {"conversations":[]})
+        self.n = 0
 
-    mem["conversations"].append({"time":time.time(),"human_time":time.ctime(),"user":user,"assistant":assistant})
+        self.max = 0.0
 
-    mem["conversations"] = mem["conversations"][-500:]
+    def record(self, ms):
 
-    save_json(MEMORY_FILE, mem)
+        self.counts[bisect.bisect_left(self.BOUNDS, ms)] += 1
 
-# ---------------- TTS helper ----------------
+        self.n += 1
 
-def speak_hindi(text):
+        if ms > self.max:
 
-    try:
+            self.max = ms
 
-        subprocess.run(["termux-tts-speak","-l","hi", text], check=False)
+    def percentile(self, p):
 
-    except Exception:
+        if not self.n:
 
-        pass
+            return 0.0
 
-    print(f"{ASSISTANT_NAME}: {text}")
+        target = max(1, math.ceil(self.n * p / 100.0))
 
-# ---------------- safe subprocess wrapper ----------------
+        seen = 0
 
-def safe_run(cmd_list, label=None, retries=RETRY_ON_FAIL, timeout=300):
+        for i, c in enumerate(self.counts):
 
-    attempt=0
+            seen += c
 
-    while attempt<=retries:
+            if seen >= target:
 
-        try:
+                return min(self.BOUNDS[i], self.max) if i < len(self.BOUNDS) else self.max
 
-            proc = subprocess.run(cmd_list, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout)
+        return self.max
 
-            log_feedback(label or " ".join(cmd_list),"success",f"attempt {attempt+1}")
+class StageStats:
 
-            return True, proc.stdout
+    """Per-stage histograms: stt, normalize, handler (plus handler:<INTENT>), tts, persist."""
 
-        except subprocess.CalledProcessError as e:
+    ORDER = ["utterance", "stt", "normalize", "handler", "tts", "persist"]
 
-            attempt+=1
+    def __init__(self):
 
-            if attempt>retries:
+        self._hists = {}
 
-                log_feedback(label or " ".join(cmd_list),"fail",str(e))
+        self._lock = threading.Lock()
 
-                return False, (e.stderr if hasattr(e,"stderr") else str(e))
+    def record(self, stage, ms):
 
-            time.sleep(0.6)
+        with self._lock:
 
-        except Exception as e:
+            h = self._hists.get(stage)
 
-            return False, str(e)
+            if h is None:
 
-    return False, "failed"
+                h = self._hists[stage] = LatencyHistogram()
 
-# ---------------- Termux / Device actions ----------------
+            h.record(ms)
 
-def take_screenshot():
+    @contextlib.contextmanager
 
-    filepath = os.path.join(SCREENSHOT_DIR, f"screenshot_{int(time.time())}.png")
+    def timed(self, stage):
 
-    ok, out = safe_run(["termux-screenshot", filepath], "termux_screenshot")
+        t0 = time.perf_counter()
 
-    if ok:
+        try:
 
-        speak_hindi("स्क्रीनशॉट ले लिया गया")
+            yield
 
-    else:
+        finally:
 
-        speak_hindi("स्क्रीनशॉट लेने में समस्या आई — मैन्युअल ले लो")
+            self.record(stage, (time.perf_counter() - t0) * 1000.0)
+
+    def reset(self):
+
+        """Start over; returns what was recorded so far as its own StageStats."""
+
+        old = StageStats()
+
+        with self._lock:
+
+            old._hists, self._hists = self._hists, {}
+
+        return old
+
+    def report(self):
+
+        with self._lock:
+
+            names = [s for s in self.ORDER if s in self._hists] + sorted(s for s in self._hists if s not in self.ORDER)
+
+            rows = [f"{'stage':<24}{'n':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)"]
+
+            for s in names:
+
+                h = self._hists[s]
+
+                rows.append(f"{s:<24}{h.n:>7}{h.percentile(50):>10.1f}{h.percentile(95):>10.1f}{h.percentile(99):>10.1f}{h.max:>10.1f}")
+
+        return "\n".join(rows)
+
+STAGES = StageStats()
+
+# ---------------- Tracing ----------------
+
+class _NullSpan:
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc):
+
+        return False
+
+    def set(self, **attrs):
+
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+_CURRENT_SPAN = contextvars.ContextVar("vega_span", default=None)
+
+class Span:
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attrs", "wall", "start", "_token")
+
+    def __init__(self, tracer, name, parent, attrs):
+
+        self.tracer = tracer
+
+        self.name = name
+
+        self.attrs = attrs
+
+        self.span_id = next(tracer._ids)
+
+        if parent is None:
+
+            self.trace_id = os.urandom(8).hex()
+
+            self.parent_id = None
+
+        else:
+
+            self.trace_id = parent.trace_id
+
+            self.parent_id = parent.span_id
+
+    def set(self, **attrs):
+
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+
+        self.wall = time.time()
+
+        self.start = time.perf_counter_ns()
+
+        self._token = _CURRENT_SPAN.set(self)
+
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+
+        dur = time.perf_counter_ns() - self.start
+
+        _CURRENT_SPAN.reset(self._token)
+
+        if exc_type is not None:
+
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+
+        self.tracer._finish(self, dur)
+
+        return False
+
+class Tracer:
+
+    """Per-utterance traces. span() nests through contextvars, so children started via
+
+    submit_in_context()/asyncio.to_thread keep their parent; a span with no parent (or root=True)
+
+    starts a new trace id. Finished spans are appended to TRACE_FILE as JSONL through PERSIST and
+
+    kept in a ring buffer for dump_chrome(). Disabled, span() returns a shared no-op."""
+
+    def __init__(self, path=TRACE_FILE, enabled=TRACE_ENABLED, buffer=TRACE_BUFFER):
+
+        self.path = path
+
+        self.enabled = enabled
+
+        self.recent = deque(maxlen=buffer)
+
+        self._ids = itertools.count(1)
+
+    def span(self, name, root=False, **attrs):
+
+        if not self.enabled:
+
+            return _NULL_SPAN
+
+        return Span(self, name, None if root else _CURRENT_SPAN.get(), attrs)
+
+    def current_trace_id(self):
+
+        span = _CURRENT_SPAN.get()
+
+        return span.trace_id if span is not None else None
+
+    def _finish(self, span, dur_ns):
+
+        rec = {"trace": span.trace_id, "span": span.span_id, "parent": span.parent_id, "name": span.name,
+
+               "ts": round(span.wall, 6), "start_us": span.start // 1000, "dur_us": dur_ns // 1000,
+
+               "pid": os.getpid(), "thread": threading.current_thread().name}
+
+        if span.attrs:
+
+            rec["attrs"] = span.attrs
+
+        self.recent.append(rec)
+
+        PERSIST.submit_line(self.path, json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    def dump_chrome(self, path=TRACE_CHROME_FILE, records=None):
+
+        records = list(self.recent) if records is None else records
+
+        save_json(path, chrome_trace(records), compact=True)
+
+        return len(records)
+
+def chrome_trace(records):
+
+    """Span records (ours or abhi_x4's, same schema) -> Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+
+    events, tids = [], {}
+
+    for r in records:
+
+        key = (r.get("pid", 0), r.get("thread", ""))
+
+        if key not in tids:
+
+            tids[key] = len(tids) + 1
+
+            events.append({"name": "thread_name", "ph": "M", "pid": key[0], "tid": tids[key], "args": {"name": key[1]}})
+
+        args = dict(r.get("attrs") or {}, trace=r["trace"])
+
+        events.append({"name": r["name"], "ph": "X", "ts": r["start_us"], "dur": r["dur_us"], "pid": key[0], "tid": tids[key], "args": args})
+
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def convert_trace_file(src, dest=None):
+
+    with open(src, encoding="utf-8") as f:
+
+        records = [json.loads(line) for line in f if line.strip()]
+
+    dest = dest or os.path.splitext(src)[0] + "_chrome.json"
+
+    save_json(dest, chrome_trace(records), compact=True)
+
+    print(f"{len(records)} spans -> {dest}")
+
+TRACER = Tracer()
+
+def traced(name):
+
+    def deco(fn):
+
+        @functools.wraps(fn)
+
+        def wrapper(*args, **kwargs):
+
+            if not TRACER.enabled:
+
+                return fn(*args, **kwargs)
+
+            with TRACER.span(name):
+
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+def submit_in_context(pool, fn, *args):
+
+    # executor threads do not inherit contextvars; carry the current span across
+
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+# ---------------- Write-behind persistence ----------------
+
+class PersistWorker:
+
+    """Single background writer for everything under vega_logs. Callers enqueue and return at
+
+    once; the worker coalesces JSON rewrites per file (last write wins), batches appended lines
+
+    and events, and flushes every PERSIST_FLUSH_SECONDS or PERSIST_FLUSH_BATCH ops.
+
+    Until start() is called (imports, one-off scripts) every op is applied synchronously."""
+
+    def __init__(self, maxsize=PERSIST_QUEUE_MAX, flush_seconds=PERSIST_FLUSH_SECONDS, flush_batch=PERSIST_FLUSH_BATCH):
+
+        self.flush_seconds = flush_seconds
+
+        self.flush_batch = flush_batch
+
+        self._q = queue.Queue(maxsize)
+
+        self._latest = {}  # path -> data not yet on disk, so load_json sees queued rewrites
+
+        self._latest_lock = threading.Lock()
+
+        self._thread = None
+
+    def start(self):
+
+        if self._thread is None or not self._thread.is_alive():
+
+            self._thread = threading.Thread(target=self._run, name="vega-persist", daemon=True)
+
+            self._thread.start()
+
+    def running(self):
+
+        return self._thread is not None and self._thread.is_alive()
+
+    def _put(self, op):
+
+        if self.running():
+
+            self._q.put(op)  # blocks when full: backpressure instead of unbounded memory
+
+            return
+
+        kind = op[0]
+
+        if kind == "call":
+
+            op[1]()
+
+        else:
+
+            self._apply({op[1]: (op[2], op[3])} if kind == "json" else {},
+
+                        {op[1]: [op[2]]} if kind == "line" else {},
+
+                        [(op[1], op[2])] if kind == "event" else [])
+
+    def submit_json(self, path, data, **opts):
+
+        """Queue a full rewrite of `path` (opts go to save_json); the caller hands over ownership of `data`."""
+
+        with self._latest_lock:
+
+            self._latest[path] = data
+
+        self._put(("json", path, data, opts))
+
+    def submit_line(self, path, line):
+
+        self._put(("line", path, line))
+
+    def submit_event(self, kind, record):
+
+        self._put(("event", kind, record))
+
+    def submit_call(self, fn):
+
+        """Run fn on the worker after everything queued before it has been written."""
+
+        self._put(("call", fn))
+
+    def pending_json(self, path):
+
+        with self._latest_lock:
+
+            if path in self._latest:
+
+                return True, self._latest[path]
+
+        return False, None
+
+    def flush(self, timeout=5.0):
+
+        if not self.running():
+
+            return True
+
+        done = threading.Event()
+
+        self._q.put(("flush", done))
+
+        return done.wait(timeout)
+
+    def shutdown(self, timeout=5.0):
+
+        if not self.running():
+
+            return True
+
+        done = threading.Event()
+
+        self._q.put(("stop", done))
+
+        ok = done.wait(timeout)
+
+        self._thread.join(timeout)
+
+        return ok
+
+    def _apply(self, jsons, lines, events):
+
+        if events:
+
+            try:
+
+                EVENT_LOG.append_many(events)
+
+            except Exception as e:
+
+                print("[vega] persist error (events):", e)
+
+        for path, chunk in lines.items():
+
+            try:
+
+                with open(path, "a") as f:
+
+                    f.write("".join(chunk))
+
+            except Exception as e:
+
+                print(f"[vega] persist error ({path}):", e)
+
+        for path, (data, opts) in jsons.items():
+
+            try:
+
+                save_json(path, data, **opts)
+
+            except Exception as e:
+
+                print(f"[vega] persist error ({path}):", e)
+
+            with self._latest_lock:
+
+                if self._latest.get(path) is data:
+
+                    del self._latest[path]
+
+    def _run(self):
+
+        jsons, lines, events = {}, {}, []
+
+        count, deadline = 0, None
+
+        while True:
+
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+            try:
+
+                op = self._q.get(timeout=wait)
+
+            except queue.Empty:
+
+                op = None
+
+            kind = op[0] if op else "timer"
+
+            if kind == "json":
+
+                jsons[op[1]] = (op[2], op[3])
+
+            elif kind == "line":
+
+                lines.setdefault(op[1], []).append(op[2])
+
+            elif kind == "event":
+
+                events.append((op[1], op[2]))
+
+            if kind in ("json", "line", "event"):
+
+                count += 1
+
+                if deadline is None:
+
+                    deadline = time.monotonic() + self.flush_seconds
+
+                if count < self.flush_batch:
+
+                    continue
+
+            self._apply(jsons, lines, events)
+
+            jsons, lines, events = {}, {}, []
+
+            count, deadline = 0, None
+
+            if kind == "call":
+
+                try:
+
+                    op[1]()
+
+                except Exception as e:
+
+                    print("[vega] persist error (call):", e)
+
+            elif kind in ("flush", "stop"):
+
+                op[1].set()
+
+                if kind == "stop":
+
+                    return
+
+PERSIST = PersistWorker()
+
+# ---------------- Event log (append-only JSONL) ----------------
+
+class EventLog:
+
+    """Append-only JSONL log split into numbered segments (seg_00000001.jsonl, ...).
+
+    Records carry a "type" field so feedback and usage share one log. Writes are flushed
+
+    immediately but fsync'd in batches; segments rotate by size/age and old ones get compacted."""
+
+    def __init__(self, directory, segment_bytes=EVENT_SEGMENT_BYTES, segment_seconds=EVENT_SEGMENT_SECONDS,
+
+                 fsync_every=EVENT_FSYNC_EVERY, fsync_seconds=EVENT_FSYNC_SECONDS,
+
+                 max_segments=EVENT_MAX_SEGMENTS, retain=None):
+
+        self.directory = directory
+
+        self.segment_bytes = segment_bytes
+
+        self.segment_seconds = segment_seconds
+
+        self.fsync_every = fsync_every
+
+        self.fsync_seconds = fsync_seconds
+
+        self.max_segments = max_segments
+
+        self.retain = dict(retain or EVENT_RETAIN)
+
+        self._lock = threading.RLock()
+
+        self._fh = None
+
+        self._index = 0
+
+        self._opened_at = 0.0
+
+        self._unsynced = 0
+
+        self._last_sync = time.time()
+
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_path(self, index):
+
+        return os.path.join(self.directory, f"seg_{index:08d}.jsonl")
+
+    def segments(self):
+
+        out = []
+
+        for name in os.listdir(self.directory):
+
+            if name.startswith("seg_") and name.endswith(".jsonl"):
+
+                try:
+
+                    out.append(int(name[4:-6]))
+
+                except ValueError:
+
+                    pass
+
+        return sorted(out)
+
+    def _open(self):
+
+        if self._fh is None:
+
+            segs = self.segments()
+
+            self._index = segs[-1] if segs else 1
+
+            path = self._segment_path(self._index)
+
+            try:
+
+                with open(path, "rb") as f:
+
+                    f.seek(-1, os.SEEK_END)
+
+                    torn = f.read(1) != b"\n"
+
+            except OSError:  # missing or empty
+
+                torn = False
+
+            self._fh = open(path, "a", encoding="utf-8")
+
+            if torn:
+
+                self._fh.write("\n")  # end a line torn by a crash so the next record starts clean
+
+            self._opened_at = time.time()
+
+        return self._fh
+
+    def _sync_locked(self):
+
+        if self._fh is not None and self._unsynced:
+
+            self._fh.flush()
+
+            os.fsync(self._fh.fileno())
+
+        self._unsynced = 0
+
+        self._last_sync = time.time()
+
+    def _rotate_locked(self):
+
+        self._sync_locked()
+
+        self._fh.close()
+
+        self._index += 1
+
+        self._fh = open(self._segment_path(self._index), "a", encoding="utf-8")
+
+        self._opened_at = time.time()
+
+        if len(self.segments()) > self.max_segments:
+
+            self._compact_locked()
+
+    def append(self, kind, record):
+
+        self.append_many([(kind, record)])
+
+    def append_many(self, items):
+
+        with self._lock:
+
+            fh = self._open()
+
+            for kind, record in items:
+
+                fh.write(json.dumps({"type": kind, **record}, ensure_ascii=False) + "\n")
+
+            fh.flush()
+
+            self._unsynced += len(items)
+
+            if self._unsynced >= self.fsync_every or time.time() - self._last_sync >= self.fsync_seconds:
+
+                self._sync_locked()
+
+            if fh.tell() >= self.segment_bytes or time.time() - self._opened_at >= self.segment_seconds:
+
+                self._rotate_locked()
+
+    def sync(self):
+
+        with self._lock:
+
+            self._sync_locked()
+
+    def close(self):
+
+        with self._lock:
+
+            if self._fh is not None:
+
+                self._sync_locked()
+
+                self._fh.close()
+
+                self._fh = None
+
+    def _iter_segment(self, index):
+
+        try:
+
+            with open(self._segment_path(index), "r", encoding="utf-8") as f:
+
+                for line in f:
+
+                    try:
+
+                        yield json.loads(line)
+
+                    except ValueError:
+
+                        continue  # torn last line after a crash
+
+        except OSError:
+
+            return
+
+    def iter_events(self, kind=None):
+
+        """Yield records oldest-first, optionally only those of one type. Never loads the whole log."""
+
+        with self._lock:
+
+            if self._fh is not None:
+
+                self._fh.flush()
+
+            segs = self.segments()
+
+        for index in segs:
+
+            for rec in self._iter_segment(index):
+
+                if kind is None or rec.get("type") == kind:
+
+                    yield rec
+
+    def tail(self, kind=None, n=10):
+
+        return list(deque(self.iter_events(kind), maxlen=n))
+
+    def compact(self):
+
+        with self._lock:
+
+            if self._open().tell():
+
+                self._rotate_locked()
+
+            self._compact_locked()
+
+    def _compact_locked(self):
+
+        # merge every closed segment into one, keeping the newest `retain[type]` records per type
+
+        old = [i for i in self.segments() if i != self._index]
+
+        if not old:
+
+            return
+
+        counts = Counter()
+
+        for index in old:
+
+            for rec in self._iter_segment(index):
+
+                counts[rec.get("type")] += 1
+
+        skip = {k: max(0, c - self.retain.get(k, c)) for k, c in counts.items()}
+
+        target = self._segment_path(old[-1])
+
+        tmp = target + ".tmp"
+
+        with open(tmp, "w", encoding="utf-8") as out:
+
+            for index in old:
+
+                for rec in self._iter_segment(index):
+
+                    k = rec.get("type")
+
+                    if skip.get(k, 0) > 0:
+
+                        skip[k] -= 1
+
+                        continue
+
+                    out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+            out.flush()
+
+            os.fsync(out.fileno())
+
+        os.replace(tmp, target)
+
+        for index in old[:-1]:
+
+            try:
+
+                os.remove(self._segment_path(index))
+
+            except OSError:
+
+                pass
+
+    def import_legacy(self, path, kind):
+
+        """One-time migration of an old read-modify-write JSON list file into the log."""
+
+        if not os.path.exists(path):
+
+            return 0
+
+        arr = load_json(path, [])
+
+        if isinstance(arr, list) and arr:
+
+            self.append_many([(kind, rec) for rec in arr if isinstance(rec, dict)])
+
+            self.sync()
+
+        os.replace(path, path + ".migrated")
+
+        return len(arr) if isinstance(arr, list) else 0
+
+EVENT_LOG = EventLog(EVENT_DIR)
+
+def bootstrap_files():
+
+    # one directory listing instead of an exists() per file; steady state writes nothing
+
+    present = set(os.listdir(LOG_DIR))
+
+    if os.path.basename(FEEDBACK_FILE) in present:
+
+        EVENT_LOG.import_legacy(FEEDBACK_FILE, "feedback")
+
+    if os.path.basename(USAGE_FILE) in present:
+
+        EVENT_LOG.import_legacy(USAGE_FILE, "usage")
+
+    # create small files if missing; approved commands + whitelist are safe defaults, edit before use
+
+    defaults = [
+
+        (SUGGESTED_FIXES, [], {}),
+
+        (APP_MAP_FILE, DEFAULT_APP_MAP.copy(), {}),
+
+        (MEMORY_FILE, {"conversations":[]}, {"compact": True, "checksum": True}),
+
+        (APPROVED_CMDS_FILE, {
+
+            "ping": ["ping","-c","4","{target}"],
+
+            "http_head": ["curl","-I","{target}"],
+
+            "port_scan": ["nmap","-sT","-p","1-1024","{target}"]
+
+        }, {}),
+
+        (WHITELIST_FILE, {
+
+            "198.51.100.23": {"owner":"security@acme.example","token":"invite-ACME-2025-08","notes":"ACME invited pentest 2025-08-09 scope: 198.51.100.23 only"},
+
+            "lab.local": {"owner":"me","token":"local-lab","notes":"local lab only"}
+
+        }, {}),
+
+    ]
+
+    for path, data, opts in defaults:
+
+        if os.path.basename(path) not in present:
+
+            save_json(path, data, **opts)
+
+bootstrap_files()
+
+STARTUP.mark("event log + bootstrap")
+
+# ---------------- Conversation memory ----------------
+
+class ConversationStore:
+
+    """Process-resident conversation memory (deque ring). Reads are served from memory; each
+
+    append adds one line to an append log and every `snapshot_every` appends the ring is
+
+    snapshotted and the log trimmed. load() = snapshot + replay of newer log lines, one pass."""
+
+    def __init__(self, snapshot_path, log_path, maxlen=MEMORY_MAX, snapshot_every=MEMORY_SNAPSHOT_EVERY):
+
+        self.snapshot_path = snapshot_path
+
+        self.log_path = log_path
+
+        self.snapshot_every = snapshot_every
+
+        self._items = deque(maxlen=maxlen)
+
+        self._lock = threading.Lock()
+
+        self._seq = 0
+
+        self._since_snapshot = 0
+
+    def load(self):
+
+        snap = load_json(self.snapshot_path, {"conversations": []})
+
+        with self._lock:
+
+            self._items.clear()
+
+            self._items.extend(snap.get("conversations", []))
+
+            self._seq = snap.get("seq", 0)
+
+            self._since_snapshot = 0
+
+            try:
+
+                with open(self.log_path, "r", encoding="utf-8") as f:
+
+                    for line in f:
+
+                        try:
+
+                            rec = json.loads(line)
+
+                        except ValueError:
+
+                            continue
+
+                        seq = rec.pop("seq", 0)
+
+                        if seq > self._seq:
+
+                            self._items.append(rec)
+
+                            self._seq = seq
+
+                            self._since_snapshot += 1
+
+            except OSError:
+
+                pass
+
+        return self
+
+    def append(self, entry):
+
+        with self._lock:
+
+            self._seq += 1
+
+            self._items.append(entry)
+
+            PERSIST.submit_line(self.log_path, json.dumps({"seq": self._seq, **entry}, ensure_ascii=False) + "\n")
+
+            self._since_snapshot += 1
+
+            due = self._since_snapshot >= self.snapshot_every
+
+        if due:
+
+            self.snapshot()
+
+    def snapshot(self):
+
+        with self._lock:
+
+            seq = self._seq
+
+            data = {"seq": seq, "conversations": list(self._items)}
+
+            self._since_snapshot = 0
+
+        PERSIST.submit_json(self.snapshot_path, data, compact=True, checksum=True)
+
+        PERSIST.submit_call(lambda: self._trim_log(seq))
+
+    def _trim_log(self, upto):
+
+        # runs on the persist worker after the snapshot is on disk: drop log lines it already covers
+
+        keep = []
+
+        try:
+
+            with open(self.log_path, "r", encoding="utf-8") as f:
+
+                for line in f:
+
+                    try:
+
+                        if json.loads(line).get("seq", 0) > upto:
+
+                            keep.append(line)
+
+                    except (ValueError, AttributeError):
+
+                        continue  # torn/garbled line: load() skips it too, so it is dropped here
+
+        except OSError:
+
+            return
+
+        tmp = self.log_path + ".tmp"
+
+        with open(tmp, "w", encoding="utf-8") as f:
+
+            f.writelines(keep)
+
+        os.replace(tmp, self.log_path)
+
+    def recent(self, n=10):
+
+        with self._lock:
+
+            return list(self._items)[-n:]
+
+    def since(self, seq):
+
+        """Entries appended after sequence number `seq` (as far as the ring still holds) + current seq."""
+
+        with self._lock:
+
+            n = max(0, self._seq - seq)
+
+            return (list(self._items)[-n:] if n else []), self._seq
+
+    def __len__(self):
+
+        return len(self._items)
+
+    def __iter__(self):
+
+        with self._lock:
+
+            return iter(list(self._items))
+
+CONVERSATIONS = ConversationStore(MEMORY_FILE, MEMORY_LOG).load()
+
+STARTUP.mark("conversation memory")
+
+# ---------------- logging & audit ----------------
+
+def audit_log(entry: dict):
+
+    rec = {"ts": time.time(), "human_time": time.ctime(), **entry}
+
+    PERSIST.submit_line(AUDIT_LOG, json.dumps(rec) + "\n")
+
+def log_feedback(cmd,status,details=""):
+
+    PERSIST.submit_event("feedback", {"time":time.time(),"human_time":time.ctime(),"command":cmd,"status":status,"details":details})
+
+def log_usage(cmd):
+
+    PERSIST.submit_event("usage", {"time":time.time(),"command":cmd,"time_ts":time.time()})
+
+def save_memory(user, assistant):
+
+    CONVERSATIONS.append({"time":time.time(),"human_time":time.ctime(),"user":user,"assistant":assistant})
+
+def shutdown_service(code=0):
+
+    # drain queued writes before the hard exit (os._exit skips atexit and daemon threads)
+
+    TTS.shutdown(timeout=5)
+
+    MARKET.stop()
+
+    DEVICE.close()
+
+    RUNNER.export()
+
+    CONVERSATIONS.snapshot()
+
+    if CAPTURE is not None:
+
+        CAPTURE.stop()
+
+    PERSIST.submit_json(os.path.join(LOG_DIR, "shutdown.json"), {"time": time.time()})
+
+    PERSIST.shutdown()
+
+    EVENT_LOG.close()
+
+    os._exit(code)
+
+# ---------------- TTS helper ----------------
+
+class _Playback:
+
+    """Stand-in for a player process: finishes after `seconds` or when killed."""
+
+    def __init__(self, seconds=0.0):
+
+        self._until = time.monotonic() + seconds
+
+        self._killed = False
+
+    def poll(self):
+
+        return 0 if self._killed or time.monotonic() >= self._until else None
+
+    def kill(self):
+
+        self._killed = True
+
+class TermuxTTSEngine:
+
+    """Android TTS via termux-tts-speak; it cannot write audio files, so nothing is cached."""
+
+    name = "termux"
+
+    renders = False
+
+    def say(self, text):
+
+        return subprocess.Popen(["termux-tts-speak", "-l", "hi", text])
+
+    def render(self, text, path):
+
+        return False
+
+    def play(self, path):
+
+        return None
+
+class EspeakTTSEngine:
+
+    """espeak-ng renders each repeated phrase to a WAV once; TTS_PLAYER replays it from the cache."""
+
+    name = "espeak"
+
+    renders = True
+
+    def __init__(self, voice="hi", player=None):
+
+        self.voice = voice
+
+        self.player = list(player or TTS_PLAYER)
+
+    def say(self, text):
+
+        return subprocess.Popen(["espeak-ng", "-v", self.voice, text], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def render(self, text, path):
+
+        r = subprocess.run(["espeak-ng", "-v", self.voice, "-w", path, text], check=False, capture_output=True, timeout=30)
+
+        return r.returncode == 0 and os.path.exists(path)
+
+    def play(self, path):
+
+        return subprocess.Popen(self.player + [path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+class FakeTTSEngine:
+
+    """Test engine: records every phrase heard (spoken), which of them came from a cached file
+
+    (played) and which were rendered; takes seconds_per_char per character."""
+
+    name = "fake"
+
+    renders = True
+
+    def __init__(self, seconds_per_char=0.0):
+
+        self.seconds_per_char = seconds_per_char
+
+        self.spoken = []
+
+        self.played = []
+
+        self.rendered = []
+
+    def say(self, text):
+
+        self.spoken.append(text)
+
+        return _Playback(len(text) * self.seconds_per_char)
+
+    def render(self, text, path):
+
+        self.rendered.append(text)
+
+        with open(path, "w", encoding="utf-8") as f:
+
+            f.write(text)
+
+        return True
+
+    def play(self, path):
+
+        with open(path, encoding="utf-8") as f:
+
+            text = f.read()
+
+        self.spoken.append(text)
+
+        self.played.append(text)
+
+        return _Playback(len(text) * self.seconds_per_char)
+
+def make_tts_engine(name):
+
+    if name == "auto":
+
+        name = "espeak" if shutil.which("espeak-ng") and shutil.which(TTS_PLAYER[0]) else "termux"
+
+    if name == "espeak":
+
+        return EspeakTTSEngine()
+
+    if name == "fake":
+
+        return FakeTTSEngine()
+
+    return TermuxTTSEngine()
+
+class Speaker:
+
+    """Background playback queue. speak() returns at once; lower priority plays first and
+
+    interrupt=True cuts the current phrase and drops everything queued before it. Phrases
+
+    spoken TTS_CACHE_AFTER times are rendered once (if the engine can) and replayed from disk."""
+
+    def __init__(self, engine, cache_dir=TTS_CACHE_DIR, cache_after=TTS_CACHE_AFTER, cache_max=TTS_CACHE_MAX):
+
+        self.engine = engine
+
+        self.cache_dir = cache_dir
+
+        self.cache_after = cache_after
+
+        self.cache_max = cache_max
+
+        self._q = queue.PriorityQueue()
+
+        self._lock = threading.Lock()
+
+        self._seq = 0
+
+        self._gen = 0  # bumped by interrupt(); playback and queued items from older generations stop
+
+        self._active = 0  # phrases playing right now
+
+        self._quiet_since = float("-inf")  # monotonic time the last phrase ended
+
+        self._counts = Counter()
+
+        self._thread = None
+
+        self.counters = Counter()
+
+    def start(self):
+
+        if self._thread is None:
+
+            self._thread = threading.Thread(target=self._run, name="vega-tts", daemon=True)
+
+            self._thread.start()
+
+        return self
+
+    def speak(self, text, priority=TTS_NORMAL, interrupt=False):
+
+        if not text:
+
+            return
+
+        with self._lock:
+
+            if interrupt:
+
+                self._gen += 1
+
+            self._seq += 1
+
+            item = (priority, self._seq, self._gen, text, contextvars.copy_context() if TRACER.enabled else None)
+
+        if self._thread is None:  # not started yet: speak inline
+
+            self._play(item[2], text)
+
+            return
+
+        self._q.put(item)
+
+    def interrupt(self):
+
+        with self._lock:
+
+            self._gen += 1
+
+    def _run(self):
+
+        while True:
+
+            _, _, gen, text, ctx = self._q.get()
+
+            try:
+
+                if gen == self._gen:
+
+                    if ctx is not None:
+
+                        ctx.run(self._play, gen, text)
+
+                    else:
+
+                        self._play(gen, text)
+
+                else:
+
+                    self.counters["dropped"] += 1
+
+            except Exception as e:
+
+                print("[vega] tts error:", e)
+
+            finally:
+
+                self._q.task_done()
+
+    def _cache_path(self, text):
+
+        key = hashlib.sha1(f"{self.engine.name}:{text}".encode("utf-8")).hexdigest()
+
+        return os.path.join(self.cache_dir, key + ".wav")
+
+    def _play(self, gen, text):
+
+        with self._lock:
+
+            self._active += 1
+
+        try:
+
+            with TRACER.span("tts", chars=len(text)):
+
+                self._play_one(gen, text)
+
+        finally:
+
+            with self._lock:
+
+                self._active -= 1
+
+                self._quiet_since = time.monotonic()
+
+    def speaking(self, tail=TTS_ECHO_TAIL):
+
+        """True while a phrase plays and for `tail` seconds after: the capture gate, so the
+
+        assistant does not transcribe (and obey) its own replies."""
+
+        return self._active > 0 or time.monotonic() - self._quiet_since < tail
+
+    def _play_one(self, gen, text):
+
+        engine = self.engine  # replay_services() may swap it mid-phrase
+
+        path = self._cache_path(text) if engine.renders and len(text) <= TTS_CACHE_MAX_CHARS else None
+
+        try:
+
+            if path and os.path.exists(path):
+
+                os.utime(path)  # mtime doubles as last-use for eviction
+
+                handle = engine.play(path)
+
+                self.counters["cache_hits"] += 1
+
+            else:
+
+                handle = engine.say(text)
+
+        except Exception as e:
+
+            print("[vega] tts error:", e)
+
+            return
+
+        self.counters["spoken"] += 1
+
+        t0 = time.perf_counter()
+
+        while handle is not None and handle.poll() is None:
+
+            if gen != self._gen:
+
+                handle.kill()
+
+                self.counters["interrupted"] += 1
+
+                return
+
+            time.sleep(0.02)
+
+        STAGES.record("tts", (time.perf_counter() - t0) * 1000.0)
+
+        if path and not os.path.exists(path):
+
+            if len(self._counts) > 4 * self.cache_max:  # one-off replies: forget them
+
+                self._counts.clear()
+
+            self._counts[text] += 1
+
+            if self._counts[text] >= self.cache_after:
+
+                self._render(engine, text, path)
+
+    def _render(self, engine, text, path):
+
+        del self._counts[text]
+
+        try:
+
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            if engine.render(text, path):
+
+                self.counters["rendered"] += 1
+
+                self._evict()
+
+        except Exception as e:
+
+            print("[vega] tts render failed:", e)
+
+    def _evict(self):
+
+        files = [os.path.join(self.cache_dir, n) for n in os.listdir(self.cache_dir) if n.endswith(".wav")]
+
+        if len(files) <= self.cache_max:
+
+            return
+
+        files.sort(key=os.path.getmtime)
+
+        for p in files[:len(files) - self.cache_max]:
+
+            try:
+
+                os.remove(p)
+
+            except OSError:
+
+                pass
+
+    def drain(self, timeout=None):
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        while self._q.unfinished_tasks and (deadline is None or time.time() < deadline):
+
+            time.sleep(0.05)
+
+    def shutdown(self, timeout=5):
+
+        if self._thread is not None:
+
+            self.drain(timeout)
+
+    def stats(self):
+
+        cached = len([n for n in os.listdir(self.cache_dir) if n.endswith(".wav")]) if os.path.isdir(self.cache_dir) else 0
+
+        return dict(self.counters, engine=self.engine.name, queued=self._q.qsize(), cached=cached)
+
+TTS = Speaker(make_tts_engine(TTS_ENGINE))
+
+def speak_hindi(text, priority=TTS_NORMAL, interrupt=False):
+
+    print(f"{ASSISTANT_NAME}: {text}")
+
+    TTS.speak(text, priority=priority, interrupt=interrupt)
+
+# ---------------- Device command executor ----------------
+
+def is_device_command(cmd_list):
+
+    name = os.path.basename(str(cmd_list[0])) if cmd_list else ""
+
+    return name.startswith("termux-") or name in DEVICE_COMMANDS
+
+class DeviceNotRun(RuntimeError):
+
+    """The command never started: its helper restarted, or it was still queued at its deadline.
+
+    Says nothing about the command itself, so CommandRunner keeps it off the circuit breaker."""
+
+class DeviceExecutor:
+
+    """Device commands (termux-*, am, dumpsys, ...) over one long-lived helper shell. submit()
+
+    writes the command to the helper's stdin and returns a Future, so commands pipeline back to
+
+    back without forking this process each time; every command is followed by a sentinel line
+
+    with its exit status and stderr size. A command that overruns its timeout kills the helper's
+
+    whole process group, so the hung command dies with it (failing whatever was queued behind
+
+    it with DeviceNotRun), and the next submit starts a fresh one; a queued command whose own
+
+    deadline passes fails with DeviceNotRun without waiting for the head. Slow commands
+
+    (DEVICE_ONESHOT_COMMANDS: camera, screenshot) run as their own process so they never hold up
+
+    the helper. ensure() skips idempotent state commands (the wake lock) while the recorded
+
+    state already matches."""
+
+    def __init__(self, shell=None, oneshot=None):
+
+        self.shell = list(shell or DEVICE_SHELL)
+
+        self.oneshot = tuple(DEVICE_ONESHOT_COMMANDS if oneshot is None else oneshot)
+
+        self._oneshot_pool = None
+
+        self._lock = threading.Lock()
+
+        self._proc = None
+
+        self._pending = deque()  # (future, deadline, cmd_list, errfile) in the order the helper runs them
+
+        self._ids = itertools.count(1)
+
+        self._state = {}  # key -> (value, set_at)
+
+        self._errdir = None
+
+        self._watchdog = None
+
+        self.counters = Counter()
+
+    def _start_locked(self):
+
+        self._sentinel = f"__vega_done_{os.urandom(6).hex()}__"
+
+        if self._errdir is None:
+
+            self._errdir = tempfile.mkdtemp(prefix="vega_device_")
+
+        # own session: the helper and every command it runs share a process group we can kill
+
+        proc = subprocess.Popen(self.shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+
+                                start_new_session=True)
+
+        self._proc = proc
+
+        self.counters["helper_starts"] += 1
+
+        threading.Thread(target=self._read, args=(proc, self._sentinel.encode()), name="vega-device", daemon=True).start()
+
+        if self._watchdog is None:
+
+            self._watchdog = threading.Thread(target=self._watch, name="vega-device-watch", daemon=True)
+
+            self._watchdog.start()
+
+    def _detach_locked(self, proc, head_exc):
+
+        # fail everything queued on `proc`; the head gets head_exc, the rest a restart error
+
+        if self._proc is not proc:
+
+            return
+
+        self._proc = None
+
+        first = True
+
+        while self._pending:
+
+            fut, _, cmd, _ = self._pending.popleft()
+
+            if not fut.done():
+
+                fut.set_exception(head_exc if first else DeviceNotRun(f"device helper restarted before {cmd[0]} ran"))
+
+            first = False
+
+        try:
+
+            os.killpg(proc.pid, signal.SIGKILL)  # killing only the shell would orphan a hung command
+
+        except OSError:
+
+            try:
+
+                proc.kill()
+
+            except OSError:
+
+                pass
+
+    def submit(self, cmd_list, timeout=None):
+
+        cmd_list = [str(a) for a in cmd_list]
+
+        if os.path.basename(cmd_list[0]) in self.oneshot:
+
+            return self._submit_oneshot(cmd_list, timeout or DEVICE_ONESHOT_TIMEOUT)
+
+        timeout = timeout or DEVICE_TIMEOUT
+
+        fut = Future()
+
+        with self._lock:
+
+            if self._proc is None or self._proc.poll() is not None:
+
+                self._start_locked()
+
+            # stderr goes to a per-command file so pipelined commands never share one
+
+            errfile = os.path.join(self._errdir, f"{next(self._ids)}.err")
+
+            script = (f"{' '.join(shlex.quote(a) for a in cmd_list)} </dev/null 2>{shlex.quote(errfile)}; "
+
+                      f"printf '\\n{self._sentinel} %d\\n' $?\n")
+
+            self._pending.append((fut, (time.monotonic() + timeout, timeout), cmd_list, errfile))
+
+            try:
+
+                self._proc.stdin.write(script.encode("utf-8"))
+
+                self._proc.stdin.flush()
+
+            except OSError as e:
+
+                self._detach_locked(self._proc, e)
+
+        self.counters["commands"] += 1
+
+        return fut
+
+    def _submit_oneshot(self, cmd_list, timeout):
+
+        with self._lock:
+
+            if self._oneshot_pool is None:
+
+                self._oneshot_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vega-device-oneshot")
+
+            pool = self._oneshot_pool
+
+        self.counters["commands"] += 1
+
+        self.counters["oneshot"] += 1
+
+        return pool.submit(self._oneshot, cmd_list, timeout)
+
+    def _oneshot(self, cmd_list, timeout):
+
+        try:
+
+            proc = subprocess.Popen(cmd_list, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+
+                                    start_new_session=True)
+
+        except OSError as e:  # same answer the helper shell gives for a missing command
+
+            return subprocess.CompletedProcess(cmd_list, 127, "", str(e))
+
+        try:
+
+            out, err = proc.communicate(timeout=timeout)
+
+        except subprocess.TimeoutExpired:
+
+            self.counters["timeouts"] += 1
+
+            try:
+
+                os.killpg(proc.pid, signal.SIGKILL)
+
+            except OSError:
+
+                proc.kill()
+
+            proc.communicate()
+
+            raise
+
+        return subprocess.CompletedProcess(cmd_list, proc.returncode, out.decode("utf-8", "replace"), err.decode("utf-8", "replace"))
+
+    def _read(self, proc, sentinel):
+
+        out = proc.stdout
+
+        buf = []
+
+        while True:
+
+            line = out.readline()
+
+            if not line:
+
+                break
+
+            if not line.startswith(sentinel):
+
+                buf.append(line)
+
+                continue
+
+            rc = int(line.split()[1])
+
+            stdout = b"".join(buf)[:-1]  # drop the newline the sentinel printf put in front of itself
+
+            buf = []
+
+            with self._lock:
+
+                if self._proc is not proc or not self._pending:
+
+                    break
+
+                fut, _, cmd, errfile = self._pending.popleft()
+
+            err = b""
+
+            try:
+
+                if os.path.getsize(errfile):
+
+                    with open(errfile, "rb") as f:
+
+                        err = f.read()
+
+                os.remove(errfile)
+
+            except OSError:
+
+                pass
+
+            if not fut.done():
+
+                fut.set_result(subprocess.CompletedProcess(cmd, int(rc), stdout.decode("utf-8", "replace"), err.decode("utf-8", "replace")))
+
+        with self._lock:
+
+            self._detach_locked(proc, RuntimeError("device helper exited"))
+
+    def _watch(self):
+
+        while True:
+
+            time.sleep(0.1)
+
+            with self._lock:
+
+                if self._proc is None or not self._pending:
+
+                    continue
+
+                now = time.monotonic()
+
+                for i, (fut, deadline, cmd, _) in enumerate(self._pending):
+
+                    if fut.done() or now <= deadline[0]:
+
+                        continue
+
+                    if i == 0:  # running: only killing the helper stops it
+
+                        self.counters["timeouts"] += 1
+
+                        self._detach_locked(self._proc, subprocess.TimeoutExpired(cmd, deadline[1]))
+
+                        break
+
+                    # still queued: fail the caller now; the helper skips it when its turn comes
+
+                    self.counters["queue_timeouts"] += 1
+
+                    fut.set_exception(DeviceNotRun(f"{cmd[0]} still queued after {deadline[1]}s"))
+
+    def run(self, cmd_list, timeout=None, check=True):
+
+        """subprocess.run(check=True, text=True) over the helper: CompletedProcess, or
+
+        CalledProcessError / TimeoutExpired like the real thing."""
+
+        res = self.submit(cmd_list, timeout).result()
+
+        if check and res.returncode != 0:
+
+            raise subprocess.CalledProcessError(res.returncode, cmd_list, res.stdout, res.stderr)
+
+        return res
+
+    def arun(self, cmd_list, timeout=None):
+
+        return asyncio.wrap_future(self.submit(cmd_list, timeout))
+
+    def ensure(self, key, value, cmd_list, refresh=None, timeout=None):
+
+        """Run an idempotent state command only when `key` is not already `value` (or the
+
+        record is older than `refresh` seconds). Returns the Future, or None when deduped."""
+
+        with self._lock:
+
+            cur = self._state.get(key)
+
+            if cur is not None and cur[0] == value and (refresh is None or time.monotonic() - cur[1] < refresh):
+
+                self.counters["deduped"] += 1
+
+                return None
+
+            self._state[key] = (value, time.monotonic())
+
+        fut = self.submit(cmd_list, timeout)
+
+        def forget_on_failure(f):
+
+            if f.exception() is not None or f.result().returncode != 0:
+
+                self.invalidate(key)
+
+        fut.add_done_callback(forget_on_failure)
+
+        return fut
+
+    def invalidate(self, key):
+
+        with self._lock:
+
+            self._state.pop(key, None)
+
+    def close(self):
+
+        with self._lock:
+
+            proc = self._proc
+
+            if proc is not None:
+
+                self._detach_locked(proc, RuntimeError("device executor closed"))
+
+            errdir, self._errdir = self._errdir, None
+
+            pool, self._oneshot_pool = self._oneshot_pool, None
+
+        if pool is not None:
+
+            pool.shutdown(wait=False)
+
+        if errdir is not None:
+
+            shutil.rmtree(errdir, ignore_errors=True)
+
+class FakeDeviceExecutor(DeviceExecutor):
+
+    """Linux/test stand-in: nothing is executed. Commands run in order on one worker thread,
+
+    sleep `latency` and return canned stdout keyed by command name."""
+
+    def __init__(self, latency=0.0, canned=None):
+
+        super().__init__()
+
+        self.latency = latency
+
+        self.canned = dict(canned or {"dumpsys": "level: 87\nstatus: 2\n", "termux-volume": '[{"stream": "music", "volume": 7, "max_volume": 15}]'})
+
+        self.calls = Counter()
+
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vega-fake-device")
+
+    def _fake(self, cmd_list):
+
+        if self.latency:
+
+            time.sleep(self.latency)
+
+        return subprocess.CompletedProcess(cmd_list, 0, self.canned.get(os.path.basename(cmd_list[0]), ""), "")
+
+    def submit(self, cmd_list, timeout=None):
+
+        cmd_list = [str(a) for a in cmd_list]
+
+        self.calls[os.path.basename(cmd_list[0])] += 1
+
+        self.counters["commands"] += 1
+
+        return self._pool.submit(self._fake, cmd_list)
+
+    def close(self):
+
+        self._pool.shutdown(wait=False)
+
+DEVICE = DeviceExecutor()
+
+def bench_device_executor(n=200):
+
+    """Per-command cost: a fresh subprocess.run vs the helper shell (serial and pipelined)."""
+
+    cmd = [shutil.which("true") or "true"]
+
+    ex = DeviceExecutor()
+
+    ex.run(cmd)  # helper start is a one-time cost
+
+    timings = {}
+
+    start = time.perf_counter()
+
+    for _ in range(n):
+
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+    timings["subprocess.run"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for _ in range(n):
+
+        ex.run(cmd)
+
+    timings["helper, serial"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for fut in [ex.submit(cmd) for _ in range(n)]:
+
+        fut.result()
+
+    timings["helper, pipelined"] = time.perf_counter() - start
+
+    ex.close()
+
+    print(f"{n} x {cmd[0]}")
+
+    for name, secs in timings.items():
+
+        print(f"  {name:<18} {secs / n * 1000:7.3f} ms/command")
+
+    return timings
+
+# ---------------- safe subprocess wrapper ----------------
+
+class CircuitBreaker:
+
+    """closed -> open after `threshold` consecutive failures; after `cooldown` one trial run is let
+
+    through (half-open) and its outcome closes or re-opens the breaker. Callers arriving while the
+
+    trial runs still fail fast; a trial that never reports back frees the slot after `cooldown`.
+
+    Not thread-safe by itself: CommandRunner calls it under its lock."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+
+        self.threshold = threshold
+
+        self.cooldown = cooldown
+
+        self.failures = 0
+
+        self.opened_at = None
+
+        self.probe_at = None  # when the half-open trial run was let through
+
+    def allow(self, now):
+
+        if self.opened_at is None:
+
+            return True
+
+        if now - self.opened_at < self.cooldown:
+
+            return False
+
+        if self.probe_at is not None and now - self.probe_at < self.cooldown:
+
+            return False
+
+        self.probe_at = now
+
+        return True
+
+    def retry_in(self, now):
+
+        if self.opened_at is None:
+
+            return 0.0
+
+        return max(0.0, self.cooldown - (now - max(self.opened_at, self.probe_at or self.opened_at)))
+
+    def release(self):
+
+        """The run never happened (DeviceNotRun): free the trial slot without a verdict."""
+
+        self.probe_at = None
+
+    def record(self, ok, now):
+
+        """Returns True when this result trips the breaker open."""
+
+        self.probe_at = None
+
+        if ok:
+
+            self.failures, self.opened_at = 0, None
+
+            return False
+
+        self.failures += 1
+
+        if self.failures >= self.threshold:
+
+            tripped = self.opened_at is None
+
+            self.opened_at = now
+
+            return tripped
+
+        return False
+
+class CommandRunner:
+
+    """safe_run's execution policy. Attempts back off exponentially with full jitter; a non-zero
+
+    exit and a timeout both count as failures and are logged (exit 126/127, command missing, is
+
+    not retried). Each label has a CircuitBreaker so a command that keeps failing fails fast
+
+    instead of being spawned again, and metrics (calls, ok, fail, timeouts, retries,
+
+    short-circuits, not-run device commands, cache hits, latency). Commands matching RUN_CACHE_TTL are read-only and a
+
+    successful result is reused for that many seconds."""
+
+    def __init__(self, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY, threshold=BREAKER_THRESHOLD,
+
+                 cooldown=BREAKER_COOLDOWN, cache_ttl=None, sleep=time.sleep, device=None, local=None):
+
+        self.base_delay = base_delay
+
+        self.max_delay = max_delay
+
+        self.threshold = threshold
+
+        self.cooldown = cooldown
+
+        self.cache_ttl = dict(RUN_CACHE_TTL if cache_ttl is None else cache_ttl)
+
+        self.sleep = sleep
+
+        self.device = device  # None: the shared DEVICE helper shell
+
+        self.local = local or subprocess  # runs everything that is not a device command
+
+        self._lock = threading.Lock()
+
+        self._breakers = {}
+
+        self._cache = {}  # tuple(cmd) -> (expires_at, stdout)
+
+        self.metrics = {}  # label -> Counter
+
+        self.latency = {}  # label -> LatencyHistogram
+
+    def backoff(self, attempt):
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _ttl(self, cmd_list):
+
+        for prefix, ttl in self.cache_ttl.items():
+
+            if tuple(cmd_list[:len(prefix)]) == prefix:
+
+                return ttl
+
+        return None
+
+    def _count(self, label, **inc):
+
+        with self._lock:
+
+            m = self.metrics.get(label)
+
+            if m is None:
+
+                m = self.metrics[label] = Counter()
+
+            m.update(inc)
+
+    def _exec(self, cmd_list, timeout):
+
+        if is_device_command(cmd_list):
+
+            return (self.device or DEVICE).run(cmd_list, timeout=timeout)  # None: the executor's per-lane default
+
+        return self.local.run(cmd_list, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+
+                              timeout=timeout or RUN_TIMEOUT)
+
+    def run(self, cmd_list, label=None, retries=RETRY_ON_FAIL, timeout=None):
+
+        label = label or " ".join(cmd_list)
+
+        key = tuple(cmd_list)
+
+        ttl = self._ttl(cmd_list)
+
+        now = time.monotonic()
+
+        with self._lock:
+
+            hit = self._cache.get(key) if ttl else None
+
+            breaker = self._breakers.get(label)
+
+            if breaker is None:
+
+                breaker = self._breakers[label] = CircuitBreaker(self.threshold, self.cooldown)
+
+            fresh = hit is not None and hit[0] > now
+
+            allowed = fresh or breaker.allow(now)  # a cache hit must not use up the half-open trial
+
+            retry_in = breaker.retry_in(now)
+
+        if fresh:
+
+            self._count(label, calls=1, cache_hits=1)
+
+            return True, hit[1]
+
+        if not allowed:
+
+            self._count(label, calls=1, short_circuited=1)
+
+            log_feedback(label, "short_circuit", f"retry in {retry_in:.0f}s")
+
+            return False, f"{label}: circuit open after repeated failures (retry in {retry_in:.0f}s)"
+
+        self._count(label, calls=1)
+
+        start = time.perf_counter()
+
+        attempt, ok, out, err = 0, False, "", None
+
+        while True:
+
+            not_run = False
+
+            try:
+
+                proc = self._exec(cmd_list, timeout)
+
+                ok, out = True, proc.stdout
+
+                break
+
+            except subprocess.CalledProcessError as e:
+
+                err, out = e, (e.stderr if getattr(e, "stderr", None) else str(e))
+
+                retryable = e.returncode not in (126, 127)
+
+            except subprocess.TimeoutExpired as e:
+
+                err, out, retryable = e, f"timeout after {e.timeout}s", True
+
+                self._count(label, timeouts=1)
+
+            except DeviceNotRun as e:
+
+                err, out, retryable, not_run = e, str(e), True, True
+
+            except Exception as e:
+
+                err, out, retryable = e, str(e), False
+
+            if not retryable or attempt >= retries:
+
+                break
+
+            self.sleep(self.backoff(attempt))
+
+            attempt += 1
+
+            self._count(label, retries=1)
+
+        ms = (time.perf_counter() - start) * 1000.0
+
+        with self._lock:
+
+            self.latency.setdefault(label, LatencyHistogram()).record(ms)
+
+            if not_run:  # another command's fault: no verdict on this label
+
+                breaker.release()
+
+                tripped = False
+
+            else:
+
+                tripped = breaker.record(ok, time.monotonic())
+
+            if ok and ttl:
+
+                self._cache[key] = (time.monotonic() + ttl, out)
+
+        if ok:
+
+            self._count(label, ok=1)
+
+            log_feedback(label, "success", f"attempt {attempt+1}")
+
+        elif not_run:
+
+            self._count(label, not_run=1)
+
+            log_feedback(label, "not_run", str(err))
+
+        else:
+
+            self._count(label, fail=1)
+
+            log_feedback(label, "fail", str(err))
+
+        if tripped:
+
+            print(f"[vega] {label} failed {self.threshold}x in a row — pausing it for {self.cooldown:.0f}s")
+
+            log_feedback(label, "circuit_open", f"{self.threshold} consecutive failures")
+
+        return ok, out
+
+    def snapshot(self):
+
+        with self._lock:
+
+            out = {}
+
+            for label, m in self.metrics.items():
+
+                h = self.latency.get(label)
+
+                out[label] = dict(m, p50_ms=round(h.percentile(50), 1) if h else 0.0, p95_ms=round(h.percentile(95), 1) if h else 0.0,
+
+                                  breaker="open" if self._breakers.get(label) and self._breakers[label].opened_at else "closed")
+
+            return out
+
+    def report(self):
+
+        rows = [f"{'label':<28}{'calls':>6}{'ok':>5}{'fail':>5}{'tmo':>5}{'retry':>6}{'short':>6}{'cache':>6}{'p50':>8}{'p95':>8}  breaker"]
+
+        for label, m in sorted(self.snapshot().items()):
+
+            rows.append(f"{label[:27]:<28}{m.get('calls', 0):>6}{m.get('ok', 0):>5}{m.get('fail', 0):>5}{m.get('timeouts', 0):>5}"
+
+                        f"{m.get('retries', 0):>6}{m.get('short_circuited', 0):>6}{m.get('cache_hits', 0):>6}{m['p50_ms']:>8.1f}{m['p95_ms']:>8.1f}  {m['breaker']}")
+
+        return "\n".join(rows)
+
+    def export(self, path=RUN_METRICS_FILE):
+
+        PERSIST.submit_json(path, {"time": time.time(), "labels": self.snapshot()})
+
+RUNNER = CommandRunner()
+
+def safe_run(cmd_list, label=None, retries=RETRY_ON_FAIL, timeout=None):
+
+    with TRACER.span("safe_run", label=label or cmd_list[0]):
+
+        return RUNNER.run(cmd_list, label, retries, timeout)
+
+# ---------------- Termux / Device actions ----------------
+
+def take_screenshot():
+
+    filepath = os.path.join(SCREENSHOT_DIR, f"screenshot_{int(time.time())}.png")
+
+    try:
+
+        os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+
+        ok, out = safe_run(["termux-screenshot", filepath], "termux_screenshot")
+
+    except OSError as e:
+
+        ok, out = False, str(e)
+
+    if ok:
+
+        speak_hindi("स्क्रीनशॉट ले लिया गया")
+
+    else:
+
+        speak_hindi("स्क्रीनशॉट लेने में समस्या आई — मैन्युअल ले लो")
+
+def camera_photo():
+
+    photo_path = f"/sdcard/camera_{int(time.time())}.jpg"
+
+    ok, out = safe_run(["termux-camera-photo", photo_path], "camera_photo")
+
+    if ok:
+
+        speak_hindi("फोटो ले ली गई")
+
+    else:
+
+        speak_hindi("कैमरा खोलने में समस्या आई")
+
+def set_volume(level, stream="music"):
+
+    ok, out = safe_run(["termux-volume", stream, str(level)], f"volume_{level}")
+
+    if ok:
+
+        DEVICE_STATE.record_volume(stream, level)
+
+        full = (DEVICE_STATE.get_volume(stream, max_age=float("inf"), refresh=False) or {}).get("max_volume", VOLUME_MAX)
+
+        if level == 0:
+
+            speak_hindi("वॉल्यूम म्यूट कर दिया गया")
+
+        elif level >= full:
+
+            speak_hindi("वॉल्यूम पूरा बढ़ा दिया गया")
+
+        else:
+
+            speak_hindi("वॉल्यूम सेट कर दिया गया")
+
+    else:
+
+        speak_hindi("वॉल्यूम बदलने में समस्या आई")
+
+def lock_device():
+
+    ok, out = safe_run(["termux-lock"], "lock_device")
+
+    if ok:
+
+        speak_hindi("फोन लॉक हो गया")
+
+    else:
+
+        speak_hindi("लॉक करने में समस्या आई")
+
+def unlock_device():
+
+    ok, out = safe_run(["termux-wake-unlock"], "unlock_device")
+
+    DEVICE.invalidate("wake_lock")  # the next keepalive tick takes it again
+
+    if ok:
+
+        speak_hindi("फोन अनलॉक हो गया")
+
+    else:
+
+        speak_hindi("अनलॉक करने में समस्या आई")
+
+def open_app(app_name_raw):
+
+    app_map = load_json(APP_MAP_FILE, DEFAULT_APP_MAP.copy())
+
+    app_key = app_name_raw.strip().lower()
+
+    if app_key in app_map:
+
+        pkg = app_map[app_key]
+
+        if safe_run(["am", "start", "-n", f"{pkg}/.MainActivity"], f"open_app_{app_key}")[0]:
+
+            speak_hindi(f"{app_name_raw} खोल दिया")
+
+            return True
+
+    log_feedback(f"open_app:{app_key}", "fail", "mapping_missing_or_open_failed")
+
+    suggested = load_json(SUGGESTED_FIXES, [])
+
+    suggested.append({"time": time.time(), "command": f"open_app:{app_key}", "suggestion": "check package name or pronunciation"})
+
+    PERSIST.submit_json(SUGGESTED_FIXES, suggested)
+
+    speak_hindi(f"{app_name_raw} नहीं खुल पाया — मैंने suggestion रखा है, टर्मिनल में CONFIRM करके placeholder जोड़ो")
+
+    return False
+
+# ---------------- Device state ----------------
+
+def parse_dumpsys_battery(out):
+
+    snap = {}
+
+    for line in out.splitlines():
+
+        key, sep, val = line.strip().partition(":")
+
+        if not sep:
+
+            continue
+
+        key, val = key.strip().lower(), val.strip()
+
+        if key == "level" and val.isdigit():
+
+            snap["level"] = int(val)
+
+        elif key == "status":
+
+            snap["status"] = int(val) if val.isdigit() else val
+
+        elif key.endswith("powered") and val == "true":
+
+            snap["plugged"] = True
+
+    snap["charging"] = snap.get("status") == 2 or snap.get("plugged", False)  # 2 = BATTERY_STATUS_CHARGING
+
+    return snap
+
+class DeviceState:
+
+    """Cached device snapshot: battery (level, charging) and volume per stream. Reads come from
+
+    memory while younger than their max age and are refreshed on the spot otherwise; the core
+
+    refreshes the battery every BATTERY_REFRESH s and volume every DEVICE_STATE_REFRESH s, and
+
+    set_volume records what it set."""
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+
+        self.battery = {}
+
+        self.volume = {}  # stream -> {"volume": n, "max_volume": m}
+
+        self.updated = {"battery": float("-inf"), "volume": float("-inf")}
+
+    def _fresh(self, field, max_age):
+
+        return time.monotonic() - self.updated[field] <= max_age
+
+    def refresh_battery(self):
+
+        ok, out = safe_run(["dumpsys", "battery"], "battery", retries=0, timeout=10)
+
+        snap = parse_dumpsys_battery(out) if ok else {}
+
+        if "level" not in snap:
+
+            return False
+
+        with self._lock:
+
+            self.battery = snap
+
+            self.updated["battery"] = time.monotonic()
+
+        return True
+
+    def refresh_volume(self):
+
+        ok, out = safe_run(["termux-volume"], "volume_read", retries=0, timeout=10)
+
+        try:
+
+            streams = json.loads(out) if ok else None
+
+        except ValueError:
+
+            streams = None
+
+        if not isinstance(streams, list):
+
+            return False
+
+        with self._lock:
+
+            for s in streams:
+
+                if isinstance(s, dict) and "stream" in s:
+
+                    self.volume[s["stream"]] = {"volume": int(s.get("volume", 0)), "max_volume": int(s.get("max_volume", VOLUME_MAX))}
+
+            self.updated["volume"] = time.monotonic()
+
+        return True
+
+    def refresh(self):
+
+        self.refresh_battery()
+
+        self.refresh_volume()
+
+    def get_battery(self, max_age=BATTERY_MAX_AGE):
+
+        if not self._fresh("battery", max_age):
+
+            self.refresh_battery()
+
+        with self._lock:
+
+            return dict(self.battery) if self.battery else None
+
+    def get_volume(self, stream="music", max_age=VOLUME_MAX_AGE, refresh=True):
+
+        if refresh and (not self._fresh("volume", max_age) or stream not in self.volume):
+
+            self.refresh_volume()
+
+        with self._lock:
+
+            entry = self.volume.get(stream)
+
+            return dict(entry) if entry else None
+
+    def record_volume(self, stream, level):
+
+        with self._lock:
+
+            self.volume.setdefault(stream, {"max_volume": VOLUME_MAX})["volume"] = level
+
+DEVICE_STATE = DeviceState()
+
+def step_volume(delta, stream="music"):
+
+    cur = DEVICE_STATE.get_volume(stream)
+
+    if cur is None:  # volume unreadable: fall back to the fixed loud/quiet levels
+
+        return set_volume(VOLUME_MAX if delta > 0 else 3, stream)
+
+    return set_volume(max(0, min(cur["max_volume"], cur.get("volume", 0) + delta)), stream)
+
+# ---------------- HTTP client ----------------
+
+class HttpClient:
+
+    """Shared HTTP layer: one keep-alive requests.Session per host with a bounded connection
+
+    pool and urllib3 retries (exponential backoff on connect errors and 429/5xx).
+
+    Timeouts come from HTTP_TIMEOUTS by host unless the caller passes one; read-timeout retries
+
+    are budgeted per host (HTTP_READ_RETRIES), so a slow host costs one timeout, not retries+1."""
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES, backoff=HTTP_BACKOFF,
+
+                 timeouts=None, default_timeout=HTTP_DEFAULT_TIMEOUT, read_retries=None):
+
+        self.pool_size = pool_size
+
+        self.retries = retries
+
+        self.backoff = backoff
+
+        self.timeouts = dict(HTTP_TIMEOUTS if timeouts is None else timeouts)
+
+        self.default_timeout = default_timeout
+
+        self.read_retries = dict(HTTP_READ_RETRIES if read_retries is None else read_retries)
+
+        self.requests_by_host = Counter()
+
+        self._sessions = {}
+
+        self._lock = threading.Lock()
+
+    def _make_session(self, host=""):
+
+        s = requests.Session()
+
+        from requests.adapters import HTTPAdapter
+
+        from urllib3.util.retry import Retry
+
+        retry_kw = {"total": self.retries, "connect": self.retries, "read": self.read_retries.get(host, self.retries),
+
+                    "backoff_factor": self.backoff, "status_forcelist": (429, 500, 502, 503, 504),
+
+                    "raise_on_status": False}
+
+        try:
+
+            retry = Retry(allowed_methods=None, **retry_kw)  # None = retry POST too (HF inference is idempotent)
+
+        except TypeError:
+
+            retry = Retry(method_whitelist=False, **retry_kw)  # urllib3 < 1.26
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        s.mount("http://", adapter)
+
+        s.mount("https://", adapter)
+
+        return s
+
+    def mount(self, host, session):
+
+        """Serve `host` from `session` (anything with request(method, url, **kw)) until close()."""
+
+        with self._lock:
+
+            old, self._sessions[host] = self._sessions.get(host), session
+
+        if old is not None:
+
+            old.close()
+
+    def session(self, host):
+
+        with self._lock:
+
+            s = self._sessions.get(host)
+
+            if s is None:
+
+                s = self._sessions[host] = self._make_session(host)
+
+            return s
+
+    def request(self, method, url, **kw):
+
+        host = urllib.parse.urlsplit(url).hostname or ""
+
+        kw.setdefault("timeout", self.timeouts.get(host, self.default_timeout))
+
+        self.requests_by_host[host] += 1
+
+        return self.session(host).request(method, url, **kw)
+
+    def get(self, url, **kw):
+
+        return self.request("GET", url, **kw)
+
+    def post(self, url, **kw):
+
+        return self.request("POST", url, **kw)
+
+    def close(self):
+
+        with self._lock:
+
+            for s in self._sessions.values():
+
+                s.close()
+
+            self._sessions.clear()
+
+HTTP = HttpClient()
+
+def bench_http_pool(n=50, handshake_ms=30):
+
+    """Compare one-shot requests.get against the pooled client on a local stand-in server that
+
+    charges `handshake_ms` per new TCP connection (roughly what TCP+TLS setup costs on mobile data)."""
+
+    import http.server
+
+    new_conns = Counter()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        protocol_version = "HTTP/1.1"
+
+        disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+        def setup(self):
+
+            super().setup()
+
+            new_conns["total"] += 1
+
+            time.sleep(handshake_ms / 1000.0)
+
+        def do_GET(self):
+
+            body = b'{"bitcoin": {"usd": 1.0, "usd_24h_change": 0.0}}'
+
+            self.send_response(200)
+
+            self.send_header("Content-Type", "application/json")
+
+            self.send_header("Content-Length", str(len(body)))
+
+            self.end_headers()
+
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v3/simple/price"
+
+    client = HttpClient()
+
+    results = {}
+
+    try:
+
+        for name, fetch in (("requests.get", lambda: requests.get(url, timeout=5)), ("HttpClient", lambda: client.get(url))):
+
+            new_conns.clear()
+
+            start = time.perf_counter()
+
+            for _ in range(n):
+
+                fetch().json()
+
+            results[name] = ((time.perf_counter() - start) / n * 1000, new_conns["total"])
+
+    finally:
+
+        client.close()
+
+        server.shutdown()
+
+    print(f"{n} GETs against local stand-in server ({handshake_ms} ms per new connection):")
+
+    for name, (ms, conns) in results.items():
+
+        print(f"  {name:<13} {ms:7.2f} ms/request  {conns:3d} connections opened")
+
+    return results
+
+# ---------------- HF response cache ----------------
+
+class ResponseCache:
+
+    """Content-addressed cache for model replies: key = sha256(model, prompt, parameters).
+
+    Tier 1 is an in-memory LRU (OrderedDict), tier 2 a sqlite table; both honour the TTL.
+
+    Disk writes are queued on the persist worker so a hit or a store never waits on fsync."""
+
+    def __init__(self, path, max_items=HF_CACHE_MAX, ttl=HF_CACHE_TTL):
+
+        self.path = path
+
+        self.max_items = max_items
+
+        self.ttl = ttl
+
+        self.hits = 0
+
+        self.disk_hits = 0
+
+        self.misses = 0
+
+        self._mem = OrderedDict()  # key -> (expires_at, value)
+
+        self._lock = threading.Lock()
+
+        self._db = None
+
+    @staticmethod
+
+    def make_key(model, prompt, params):
+
+        raw = json.dumps([model, prompt, params], sort_keys=True, ensure_ascii=False)
+
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _conn(self):
+
+        if self._db is None:
+
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+
+        return self._db
+
+    def _remember(self, key, expires, value):
+
+        self._mem[key] = (expires, value)
+
+        self._mem.move_to_end(key)
+
+        while len(self._mem) > self.max_items:
+
+            self._mem.popitem(last=False)
+
+    def get(self, key):
+
+        now = time.time()
+
+        with self._lock:
+
+            item = self._mem.get(key)
+
+            if item and item[0] > now:
+
+                self._mem.move_to_end(key)
+
+                self.hits += 1
+
+                return item[1]
+
+            try:
+
+                row = self._conn().execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+
+            except sqlite3.Error:
+
+                row = None
+
+            if row and row[1] > now:
+
+                self._remember(key, row[1], row[0])
+
+                self.hits += 1
+
+                self.disk_hits += 1
+
+                return row[0]
+
+            self.misses += 1
+
+            return None
+
+    def put(self, key, value):
+
+        expires = time.time() + self.ttl
+
+        with self._lock:
+
+            self._remember(key, expires, value)
+
+        PERSIST.submit_call(lambda: self._store(key, value, expires))
+
+    def _store(self, key, value, expires):
+
+        with self._lock:
+
+            db = self._conn()
+
+            db.execute("INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+
+            db.commit()
+
+    def purge(self):
+
+        with self._lock:
+
+            now = time.time()
+
+            for key in [k for k, (exp, _) in self._mem.items() if exp <= now]:
+
+                del self._mem[key]
+
+            db = self._conn()
+
+            db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+
+            db.commit()
+
+    def stats(self):
+
+        total = self.hits + self.misses
+
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+
+                "hit_rate": round(self.hits / total, 3) if total else 0.0, "memory_items": len(self._mem)}
+
+HF_CACHE = ResponseCache(HF_CACHE_FILE)
+
+STARTUP.mark("http client + hf cache")
+
+# ---------------- HuggingFace helper ----------------
+
+@traced("hf_query")
+
+def hf_query(prompt, max_tokens=200, use_cache=True):
+
+    if not HF_API_KEY:
+
+        return None, "no_token"
+
+    headers = {"Authorization": f"Bearer {HF_API_KEY}"}
+
+    payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.1}}
+
+    key = ResponseCache.make_key(HF_MODEL, prompt, payload["parameters"]) if use_cache else None
+
+    if key:
+
+        cached = HF_CACHE.get(key)
+
+        if cached is not None:
+
+            return cached, None
+
+    out, err = _hf_post(headers, payload)
+
+    if key and out and not err:
+
+        HF_CACHE.put(key, out)
+
+    return out, err
+
+@traced("hf_post")
+
+def _hf_post(headers, payload):
+
+    try:
+
+        resp = HTTP.post(HF_API_URL, headers=headers, json=payload)
+
+    except Exception as e:
+
+        return None, f"request_failed:{e}"
+
+    if resp.status_code == 200:
+
+        try:
+
+            out = resp.json()
+
+            if isinstance(out, list) and len(out) and "generated_text" in out[0]:
+
+                return out[0]["generated_text"].strip(), None
+
+            if isinstance(out, dict) and "generated_text" in out:
+
+                return out["generated_text"].strip(), None
+
+            if isinstance(out, str):
+
+                return out.strip(), None
+
+            return str(out)[:1000], None
+
+        except Exception as e:
+
+            return None, f"parse_error:{e}"
+
+    else:
+
+        return None, f"HF error {resp.status_code}: {resp.text}"
+
+# ---------------- Normalizer & safety ----------------
+
+# keyword tables in priority order: the first rule with any keyword present in the text wins
+
+INTENT_RULES = [
+
+("SCREENSHOT", ["screenshot","स्क्रीनशॉट","screen shot"]),
+
+("LOCK", ["lock","लॉक"]),
+
+("UNLOCK", ["unlock","अनलॉक"]),
+
+("CAMERA", ["camera","कैमरा","photo","फोटो"]),
+
+("VOLUME", ["volume","वॉल्यूम","आवाज़","आवाज"]),  # resolved through VOLUME_RULES, else falls through
+
+("TIME", ["time","समय","टाइम"]),
+
+("BATTERY", ["battery","बैटरी"]),
+
+("OPEN_APP", ["खोलो","open"]),
+
+("TRADE_ADVICE", [alias for _, aliases in WATCHLIST.values() for alias in aliases]),
+
+("AUTHORIZED_SCAN", ["scan","port scan","run scan","run port"])
+
+]
+
+VOLUME_RULES = [
+
+("VOLUME_UP", ["increase","बढ़ा","फुल","ऊपर","up"]),
+
+("VOLUME_DOWN", ["decrease","घटा","कम","down"]),
+
+("VOLUME_MUTE", ["mute","म्यूट"])
+
+]
+
+def coin_from_text(t):
+
+    """First watchlist coin with an alias in the (lowercased) text, else None."""
+
+    for coin, (_, aliases) in WATCHLIST.items():
+
+        if any(alias in t for alias in aliases):
+
+            return coin
+
+    return None
+
+SCAN_TARGET_RE = re.compile(r"((?:\d{1,3}\.){3}\d{1,3})|([a-z0-9\.-]+\.[a-z]{2,})")
+
+class IntentMatcher:
+
+    """All keyword tables (dangerous + intents, Hindi and English) compiled into one regex.
+
+    A lookahead alternation, longest keyword first, reports the keyword starting at every
+
+    position in a single findall() call; shorter keywords that are prefixes of a hit are implied,
+
+    so the hit set equals the old chain of `x in t` scans ("unlock" still implies "lock")."""
+
+    def __init__(self, dangerous=DANGEROUS_KEYWORDS, rules=INTENT_RULES, volume_rules=VOLUME_RULES):
+
+        self.dangerous = [kw.lower() for kw in dangerous]
+
+        names = ["DANGEROUS"] + [name for name, _ in rules] + [name for name, _ in volume_rules]
+
+        self._bit = {name: 1 << i for i, name in enumerate(names)}
+
+        masks = {}
+
+        for kw in self.dangerous:
+
+            masks[kw] = masks.get(kw, 0) | self._bit["DANGEROUS"]
+
+        for name, kws in list(rules) + list(volume_rules):
+
+            for kw in kws:
+
+                masks[kw.lower()] = masks.get(kw.lower(), 0) | self._bit[name]
+
+        rank = {}
+
+        for i, kw in enumerate(self.dangerous):
+
+            rank.setdefault(kw, i)
+
+        keywords = sorted(masks, key=len, reverse=True)
+
+        self._hits = {}  # keyword -> (rule bitmask incl. implied prefixes, first dangerous index or None)
+
+        for kw in keywords:
+
+            implied = [k for k in keywords if kw.startswith(k)]
+
+            mask = 0
+
+            for k in implied:
+
+                mask |= masks[k]
+
+            ranks = [rank[k] for k in implied if k in rank]
+
+            self._hits[kw] = (mask, min(ranks) if ranks else None)
+
+        # the leading first-character class lets the regex engine skip non-candidate positions quickly
+
+        first = "".join(sorted({re.escape(kw[0]) for kw in keywords}))
+
+        self._rx = re.compile(f"(?=[{first}])(?=(" + "|".join(re.escape(kw) for kw in keywords) + "))")
+
+        self._rules = [(self._bit[name], name) for name, _ in rules]
+
+        self._volume = [(self._bit[name], name) for name, _ in volume_rules]
+
+        self._resolved = {}
+
+    def scan(self, t):
+
+        """One pass over lowercased text -> (bitmask of rules hit, index of first dangerous keyword or None)."""
+
+        mask, danger = 0, None
+
+        hits = self._hits
+
+        for kw in self._rx.findall(t):
+
+            kmask, krank = hits[kw]
+
+            mask |= kmask
+
+            if krank is not None and (danger is None or krank < danger):
+
+                danger = krank
+
+        return mask, danger
+
+    def match(self, text):
+
+        """Classify with the local tables; None means no rule hit (caller falls back to HF)."""
+
+        t = text.lower()
+
+        mask, danger = self.scan(t)
+
+        if not mask:
+
+            return None
+
+        if danger is not None:
+
+            return "DANGEROUS", self.dangerous[danger]
+
+        name = self._resolved.get(mask, 0)
+
+        if name == 0:
+
+            name = self._resolved[mask] = self._resolve(mask)
+
+        if name is None:
+
+            return None
+
+        if name == "OPEN_APP":
+
+            return name, text.replace("खोलो","").replace("open","").strip()
+
+        if name == "TRADE_ADVICE":
+
+            return name, coin_from_text(t)
+
+        if name == "AUTHORIZED_SCAN":
+
+            m = SCAN_TARGET_RE.search(t)
+
+            return name, (m.group(0) if m else None)
+
+        return name, None
+
+    def _resolve(self, mask):
+
+        # priority walk over the rule tables; memoized per bitmask by match()
+
+        for bit, name in self._rules:
+
+            if not mask & bit:
+
+                continue
+
+            if name == "VOLUME":
+
+                for vbit, vname in self._volume:
+
+                    if mask & vbit:
+
+                        return vname
+
+                continue
+
+            return name
+
+        return None
+
+INTENT_MATCHER = IntentMatcher()
+
+def contains_dangerous_intent(text):
+
+    mask, danger = INTENT_MATCHER.scan(text.lower())
+
+    if danger is not None:
+
+        return True, INTENT_MATCHER.dangerous[danger]
+
+    return False, None
+
+# ---------------- Local intent classifier ----------------
+
+# assistant action recorded by save_memory -> intent label (OPEN_APP/scan need a target, never learned)
+
+ACTION_LABELS = {"screenshot": "SCREENSHOT", "lock": "LOCK", "unlock": "UNLOCK", "camera": "CAMERA",
+
+                 "volume_up": "VOLUME_UP", "volume_down": "VOLUME_DOWN", "volume_mute": "VOLUME_MUTE",
+
+                 "time": "TIME", "battery": "BATTERY", "hf_fail": "UNKNOWN"}
+
+TRADE_REPLY_RE = re.compile(r"[A-Z]+ price ")
+
+def action_to_label(action):
+
+    if not isinstance(action, str) or action == "blocked_dangerous" or action.startswith("open_app:"):
+
+        return None
+
+    if action in ACTION_LABELS:
+
+        return ACTION_LABELS[action]
+
+    if TRADE_REPLY_RE.match(action) or action.startswith("Market data unavailable"):
+
+        return "TRADE_ADVICE"
+
+    return "UNKNOWN"  # anything else is a free-form HF reply
+
+class _IntentModel:
+
+    """One immutable published version of the classifier: readers take a reference, training
+
+    builds the next version and swaps it in."""
+
+    __slots__ = ("classes", "bias", "weights")
+
+    def __init__(self, classes=(), bias=(), weights=None):
+
+        self.classes = tuple(classes)
+
+        self.bias = tuple(bias)
+
+        self.weights = weights or {}  # feature index -> [weight per class]; never mutated once published
+
+class LocalIntentClassifier:
+
+    """Multinomial logistic regression over hashed character n-grams, pure Python.
+
+    Weights are a sparse map feature -> per-class list, so inference is ~one dict lookup per
+
+    n-gram (tens of microseconds). A NumPy gather-and-sum over a dense matrix measured no faster
+
+    (~15 us vs ~13 us to score ~10 classes; n-gram extraction dominates), so there is no NumPy
+
+    path here, unlike the indicator engine and tick store. Trained from conversation memory, where the recorded assistant
+
+    action labels each utterance, weighted by how often the phrase appears in the usage log.
+
+    predict() never takes the lock: partial_fit() trains on a copy and publishes a new model."""
+
+    def __init__(self, path, dims=LOCAL_INTENT_DIMS, ngrams=LOCAL_INTENT_NGRAMS):
+
+        self.path = path
+
+        self.dims = dims
+
+        self.ngrams = tuple(ngrams)
+
+        self.model = _IntentModel()
+
+        self.examples = 0
+
+        self.trained_seq = 0
+
+        self._gram_index = {}
+
+        self._lock = threading.Lock()  # serialises writers (partial_fit, load, save)
+
+    @property
+
+    def classes(self):
+
+        return list(self.model.classes)
+
+    def load(self):
+
+        data = load_json(self.path, None)
+
+        if isinstance(data, dict) and data.get("dims") == self.dims:
+
+            with self._lock:
+
+                self.model = _IntentModel(data["classes"], data["bias"], {int(k): v for k, v in data["weights"].items()})
+
+                self.examples = data.get("examples", 0)
+
+                self.trained_seq = data.get("trained_seq", 0)
+
+        return self
+
+    def save(self):
+
+        with self._lock:
+
+            m = self.model
+
+            data = {"dims": self.dims, "classes": list(m.classes), "bias": list(m.bias),
+
+                    "weights": {str(k): [round(w, 5) for w in v] for k, v in m.weights.items()},
+
+                    "examples": self.examples, "trained_seq": self.trained_seq}
+
+        PERSIST.submit_json(self.path, data, compact=True, checksum=True)
+
+    def _index(self, gram):
+
+        f = zlib.crc32(gram.encode("utf-8")) % self.dims  # stable across runs, unlike hash()
+
+        if len(self._gram_index) > 50000:
+
+            self._gram_index = {}  # rebind, never clear(): other threads may be reading the old one
+
+        self._gram_index[gram] = f
+
+        return f
+
+    def features(self, text):
+
+        """Binary n-gram presence, L2-normalised: (feature indices, shared feature value)."""
+
+        t = f" {' '.join(text.lower().split())} "
+
+        get = self._gram_index.get
+
+        idx = set()
+
+        for n in self.ngrams:
+
+            for i in range(len(t) - n + 1):
+
+                g = t[i:i + n]
+
+                f = get(g)
+
+                idx.add(self._index(g) if f is None else f)
+
+        return list(idx), 1.0 / math.sqrt(len(idx) or 1)
+
+    @staticmethod
+
+    def _softmax(scores):
+
+        top = max(scores)
+
+        exps = [math.exp(s - top) for s in scores]
+
+        total = sum(exps)
+
+        return [e / total for e in exps]
+
+    def _probs(self, feats, classes, bias, weights):
+
+        idx, x = feats
+
+        rows = [weights[f] for f in idx if f in weights]
+
+        if rows:
+
+            scores = [b + x * s for b, s in zip(bias, map(sum, zip(*rows)))]
+
+        else:
+
+            scores = list(bias)
+
+        return self._softmax(scores)
+
+    def partial_fit(self, samples, epochs=LOCAL_INTENT_EPOCHS, lr=LOCAL_INTENT_LR):
+
+        """SGD on (text, label, weight) samples, continuing from the current weights."""
+
+        with self._lock:
+
+            m = self.model
+
+            classes, bias = list(m.classes), list(m.bias)
+
+            weights = {f: list(w) for f, w in m.weights.items()}
+
+            data = []
+
+            for text, label, weight in samples:
+
+                if label not in classes:
+
+                    classes.append(label)
+
+                    bias.append(0.0)
+
+                    for w in weights.values():
+
+                        w.append(0.0)
+
+                data.append((self.features(text), classes.index(label), weight))
+
+            k = len(classes)
+
+            for epoch in range(epochs):
+
+                step = lr / (1 + epoch)
+
+                for feats, y, weight in data:
+
+                    probs = self._probs(feats, classes, bias, weights)
+
+                    grads = [step * weight * ((1.0 if j == y else 0.0) - probs[j]) for j in range(k)]
+
+                    idx, x = feats
+
+                    for j in range(k):
+
+                        bias[j] += grads[j]
+
+                    for f in idx:
+
+                        w = weights.get(f)
+
+                        if w is None:
+
+                            w = weights[f] = [0.0] * k
+
+                        for j in range(k):
+
+                            w[j] += grads[j] * x
+
+            self.model = _IntentModel(classes, bias, weights)
+
+            self.examples += len(data)
+
+    def predict(self, text, min_conf=LOCAL_INTENT_MIN_CONF):
+
+        """(intent, meta) when confident enough, else None (caller falls back to HF)."""
+
+        m = self.model
+
+        if self.examples < LOCAL_INTENT_MIN_EXAMPLES or len(m.classes) < 2:
+
+            return None
+
+        probs = self._probs(self.features(text), m.classes, m.bias, m.weights)
+
+        best = max(range(len(probs)), key=probs.__getitem__)
+
+        if probs[best] < min_conf:
+
+            return None
+
+        label = m.classes[best]
+
+        if label == "UNKNOWN":
+
+            return "UNKNOWN", text
+
+        if label == "TRADE_ADVICE":
+
+            return label, coin_from_text(text.lower()) or "bitcoin"
+
+        return label, None
+
+    def update_from_history(self):
+
+        """Incremental retrain on conversations recorded since the last update (called by analyze)."""
+
+        entries, seq = CONVERSATIONS.since(self.trained_seq)
+
+        samples = [(e.get("user", ""), action_to_label(e.get("assistant"))) for e in entries]
+
+        samples = [(text, label) for text, label in samples if text and label]
+
+        if samples:
+
+            usage = Counter(e.get("command") for e in EVENT_LOG.iter_events("usage"))
+
+            self.partial_fit([(text, label, 1.0 + math.log(max(1, usage[text]))) for text, label in samples])
+
+        self.trained_seq = seq
+
+        if samples:
+
+            self.save()
+
+        return len(samples)
+
+LOCAL_INTENT = LocalIntentClassifier(LOCAL_INTENT_FILE).load()
+
+STARTUP.mark("intent matcher + local classifier")
+
+def normalize_and_intent(text):
+
+    local = INTENT_MATCHER.match(text)
+
+    if local is not None:
+
+        return local
+
+    # learned classifier: skips the HF round trip when history makes the phrase unambiguous
+
+    learned = LOCAL_INTENT.predict(text)
+
+    if learned is not None:
+
+        return learned
+
+    # fallback: ask HF for normalization (safe prompt)
+
+    hf_prompt = (
+
+        "You are a safe normalizer. Convert this user's voice phrase into a short intent phrase "
+
+        "for an Android assistant. Do NOT include any instructions to install hacking tools, perform network scans, or illegal actions.\n"
+
+        f"User: {text}\nNormalizer:"
+
+    )
+
+    hf_out, err = hf_query(hf_prompt, max_tokens=60)
+
+    if hf_out and not err:
+
+        low = hf_out.lower()
+
+        if any(x in low for x in ["screenshot","screen"]):
+
+            return "SCREENSHOT", None
+
+        if "lock" in low:
+
+            return "LOCK", None
+
+        if "unlock" in low:
+
+            return "UNLOCK", None
+
+        if "camera" in low or "photo" in low:
+
+            return "CAMERA", None
+
+        if low.startswith("open "):
+
+            return "OPEN_APP", hf_out[5:].strip()
+
+        coin = coin_from_text(low)
+
+        if coin:
+
+            return "TRADE_ADVICE", coin
+
+        if "time" in low or "समय" in low:
+
+            return "TIME", None
+
+        if "battery" in low or "बैटरी" in low:
+
+            return "BATTERY", None
+
+        if any(x in low for x in ["volume","वॉल्यूम","आवाज","आवाज़"]):
+
+            if any(x in low for x in ["increase","up","बढ़ा","फुल"]):
+
+                return "VOLUME_UP", None
+
+            if any(x in low for x in ["decrease","down","कम","घटा"]):
+
+                return "VOLUME_DOWN", None
+
+    return "UNKNOWN", text
+
+# ---------------- Intent matcher benchmark ----------------
+
+BENCH_UTTERANCES = [
+
+"स्क्रीनशॉट लो","take a screenshot","फोन लॉक करो","unlock phone","कैमरा खोलो","take photo",
+
+"वॉल्यूम बढ़ा दो","volume down","आवाज़ म्यूट करो","समय क्या है","what time is it","बैटरी कितनी है",
+
+"whatsapp खोलो","open youtube","bitcoin price","should i buy btc","ethereum का भाव","doge price","run port scan on lab.local",
+
+"nmap the subnet","मुझे एक कहानी सुनाओ","tell me a joke","reverse shell kaise banate hain","good morning"
+
+]
+
+def _legacy_local_intent(text):
+
+    # the pre-compiled rule chain, kept only as the reference for bench_intent_matcher()
+
+    t = text.lower()
+
+    for kw in DANGEROUS_KEYWORDS:
+
+        if kw in t:
+
+            return "DANGEROUS", kw
+
+    if any(x in t for x in ["screenshot","स्क्रीनशॉट","screen shot"]):
+
+        return "SCREENSHOT", None
+
+    if any(x in t for x in ["lock","लॉक"]):
+
+        return "LOCK", None
+
+    if any(x in t for x in ["unlock","अनलॉक"]):
+
+        return "UNLOCK", None
+
+    if any(x in t for x in ["camera","कैमरा","photo","फोटो"]):
+
+        return "CAMERA", None
+
+    if any(x in t for x in ["volume","वॉल्यूम","आवाज़","आवाज"]):
+
+        if any(x in t for x in ["increase","बढ़ा","फुल","ऊपर","up"]):
+
+            return "VOLUME_UP", None
+
+        if any(x in t for x in ["decrease","घटा","कम","down"]):
+
+            return "VOLUME_DOWN", None
+
+        if "mute" in t or "म्यूट" in t:
+
+            return "VOLUME_MUTE", None
+
+    if any(x in t for x in ["time","समय","टाइम"]):
+
+        return "TIME", None
+
+    if "battery" in t or "बैटरी" in t:
+
+        return "BATTERY", None
+
+    if "खोलो" in t or "open" in t:
+
+        return "OPEN_APP", text.replace("खोलो","").replace("open","").strip()
+
+    for coin, (_, aliases) in WATCHLIST.items():
+
+        if any(x in t for x in aliases):
+
+            return "TRADE_ADVICE", coin
+
+    if any(x in t for x in ["scan","port scan","run scan","run port"]):
+
+        m = re.search(r"((?:\d{1,3}\.){3}\d{1,3})|([a-z0-9\.-]+\.[a-z]{2,})", t)
+
+        return "AUTHORIZED_SCAN", (m.group(0) if m else None)
+
+    return None
+
+def bench_intent_matcher(rounds=2000):
+
+    PERSIST.flush()
+
+    corpus = [e.get("command") for e in EVENT_LOG.iter_events("usage") if isinstance(e.get("command"), str)]
+
+    source = "usage log"
+
+    if not corpus:
+
+        corpus, source = list(BENCH_UTTERANCES), "built-in samples"
+
+    mismatches = [u for u in corpus if INTENT_MATCHER.match(u) != _legacy_local_intent(u)]
+
+    rounds = max(1, rounds // max(1, len(corpus) // len(BENCH_UTTERANCES)))
+
+    timings = {}
+
+    for name, fn in (("legacy chain", _legacy_local_intent), ("compiled matcher", INTENT_MATCHER.match)):
+
+        start = time.perf_counter()
+
+        for _ in range(rounds):
+
+            for u in corpus:
+
+                fn(u)
+
+        timings[name] = (time.perf_counter() - start) / (rounds * len(corpus)) * 1e6
+
+    print(f"corpus: {len(corpus)} utterances from {source}, {rounds} rounds")
+
+    for name, us in timings.items():
+
+        print(f"  {name:<17} {us:8.2f} us/utterance")
+
+    print(f"  speedup           {timings['legacy chain'] / timings['compiled matcher']:8.2f}x")
+
+    print(f"  mismatches        {len(mismatches)}" + (f" e.g. {mismatches[:3]}" if mismatches else ""))
+
+    return timings, mismatches
+
+# ---------------- Voice listening ----------------
+
+sr = _LazyModule("speech_recognition", "pip install SpeechRecognition")  # imported by the first listen
+
+# ---------------- Streaming capture + VAD ----------------
+
+class MicrophoneSource:
+
+    """Raw 16-bit mono frames from the default input device (PyAudio via SpeechRecognition)."""
+
+    def __init__(self, rate=CAPTURE_RATE, frame_ms=CAPTURE_FRAME_MS):
+
+        self.rate = rate
+
+        self.frame_samples = rate * frame_ms // 1000
+
+        self._mic = None
+
+    def open(self):
+
+        self._mic = sr.Microphone(sample_rate=self.rate, chunk_size=self.frame_samples)
+
+        self._mic.__enter__()
+
+        return self
+
+    def read(self):
+
+        return self._mic.stream.read(self.frame_samples)
+
+    def close(self):
+
+        if self._mic is not None:
+
+            self._mic.__exit__(None, None, None)
+
+            self._mic = None
+
+class WavFileSource:
+
+    """Frames from a mono 16-bit WAV file, for replaying fixtures through the same pipeline.
+
+    read() returns b"" at end of file; realtime=True paces frames like a live microphone."""
+
+    def __init__(self, path, frame_ms=CAPTURE_FRAME_MS, realtime=False):
+
+        self.path = path
+
+        self.frame_ms = frame_ms
+
+        self.realtime = realtime
+
+        self.rate = CAPTURE_RATE
+
+        self.frame_samples = 0
+
+        self._wf = None
+
+    def open(self):
+
+        self._wf = wave.open(self.path, "rb")
+
+        if self._wf.getnchannels() != 1 or self._wf.getsampwidth() != 2:
+
+            raise ValueError(f"{self.path}: need mono 16-bit PCM")
+
+        self.rate = self._wf.getframerate()
+
+        self.frame_samples = self.rate * self.frame_ms // 1000
+
+        return self
+
+    def read(self):
+
+        if self.realtime:
+
+            time.sleep(self.frame_ms / 1000.0)
+
+        return self._wf.readframes(self.frame_samples)
+
+    def close(self):
+
+        if self._wf is not None:
+
+            self._wf.close()
+
+            self._wf = None
+
+class EnergyVAD:
+
+    """Frame-energy voice activity detector with an adaptive noise floor. The floor is calibrated
+
+    once from the first VAD_CALIBRATION_MS of audio, then tracked on non-speech frames.
+
+    feed() returns the PCM bytes of a finished utterance (pre-roll included) or None."""
+
+    def __init__(self, frame_ms=CAPTURE_FRAME_MS, max_seconds=LISTEN_SECONDS):
+
+        self.frame_ms = frame_ms
+
+        self.calibration_frames = max(1, VAD_CALIBRATION_MS // frame_ms)
+
+        self.hangover_frames = max(1, VAD_HANGOVER_MS // frame_ms)
+
+        self.min_speech_frames = max(1, VAD_MIN_SPEECH_MS // frame_ms)
+
+        self.max_frames = max(1, int(max_seconds * 1000) // frame_ms)
+
+        self.noise_floor = None
+
+        self._calib = []
+
+        self._preroll = deque(maxlen=max(1, VAD_PREROLL_MS // frame_ms))
+
+        self._speech = None  # frames of the utterance in progress
+
+        self._voiced = 0
+
+        self._silent = 0
+
+        self._run = 0
+
+    @staticmethod
+
+    def rms(frame):
+
+        samples = array("h")
+
+        samples.frombytes(frame[:len(frame) - len(frame) % 2])
+
+        if sys.byteorder != "little":
+
+            samples.byteswap()
+
+        return math.sqrt(sum(s * s for s in samples) / len(samples)) if samples else 0.0
+
+    def threshold(self):
+
+        return max(VAD_MIN_RMS, (self.noise_floor or 0.0) * VAD_RATIO)
+
+    def feed(self, frame):
+
+        energy = self.rms(frame)
+
+        if self.noise_floor is None:
+
+            self._calib.append(energy)
+
+            if len(self._calib) >= self.calibration_frames:
+
+                self.noise_floor = sum(self._calib) / len(self._calib)
+
+            self._preroll.append(frame)
+
+            return None
+
+        loud = energy > self.threshold()
+
+        if self._speech is None:
+
+            if not loud:
+
+                self.noise_floor += VAD_NOISE_ADAPT * (energy - self.noise_floor)
+
+                self._run = 0
+
+                self._preroll.append(frame)
+
+                return None
+
+            self._run += 1
+
+            self._preroll.append(frame)
+
+            if self._run < VAD_START_FRAMES:
+
+                return None
+
+            self._speech = list(self._preroll)
+
+            self._preroll.clear()
+
+            self._voiced, self._silent = self._run, 0
+
+            return None
+
+        self._speech.append(frame)
+
+        if loud:
+
+            self._voiced += 1
+
+            self._silent = 0
+
+        else:
+
+            self._silent += 1
+
+        if self._silent >= self.hangover_frames or len(self._speech) >= self.max_frames:
+
+            return self.finish()
+
+        return None
+
+    def finish(self):
+
+        """End the utterance in progress (end of input or hangover); None if it was too short."""
+
+        speech, voiced = self._speech, self._voiced
+
+        self._speech, self._voiced, self._silent, self._run = None, 0, 0, 0
+
+        if not speech or voiced < self.min_speech_frames:
+
+            return None
+
+        return b"".join(speech)
+
+    def reset(self):
+
+        """Forget the utterance in progress and the pre-roll; the noise floor is kept."""
+
+        self._speech, self._voiced, self._silent, self._run = None, 0, 0, 0
+
+        self._preroll.clear()
+
+class AudioCapture:
+
+    """Continuous capture thread: source -> VAD -> queue of sr.AudioData utterances.
+
+    The device is opened once and stays open; recognizers consume from next_utterance().
+
+    While gate() is true (the assistant is speaking) frames are read and dropped and the VAD
+
+    is reset, so playback picked up by the microphone never becomes an utterance."""
+
+    def __init__(self, source, queue_size=8, gate=None):
+
+        self.source = source
+
+        self.vad = EnergyVAD()
+
+        self.gate = gate
+
+        self.utterances = queue.Queue(queue_size)
+
+        self.finished = threading.Event()
+
+        self.error = None
+
+        self.gated_frames = 0
+
+        self._stop = threading.Event()
+
+        self._thread = None
+
+    def start(self):
+
+        self.source.open()  # raise here, on the caller, if the device is unavailable
+
+        self._thread = threading.Thread(target=self._run, name="vega-capture", daemon=True)
+
+        self._thread.start()
+
+        return self
+
+    def _emit(self, pcm):
+
+        if pcm is None:
+
+            return
+
+        audio = sr.AudioData(pcm, self.source.rate, 2)
+
+        try:
+
+            self.utterances.put_nowait(audio)
+
+        except queue.Full:
+
+            try:
+
+                self.utterances.get_nowait()  # recognizers fell behind: drop the oldest utterance
+
+            except queue.Empty:
+
+                pass
+
+            self.utterances.put_nowait(audio)
+
+    def _run(self):
+
+        gated = False
+
+        try:
+
+            while not self._stop.is_set():
+
+                frame = self.source.read()
+
+                if not frame:
+
+                    break
+
+                if self.gate is not None and self.gate():
+
+                    if not gated:
+
+                        self.vad.reset()
+
+                        gated = True
+
+                    self.gated_frames += 1
+
+                    continue
+
+                gated = False
+
+                self._emit(self.vad.feed(frame))
+
+            self._emit(self.vad.finish())
+
+        except Exception as e:
+
+            self.error = str(e)
+
+            print("[vega] audio capture stopped:", e)
+
+        finally:
+
+            self.source.close()
+
+            self.finished.set()
+
+    def running(self):
+
+        return self._thread is not None and self._thread.is_alive()
+
+    def next_utterance(self, timeout=LISTEN_SECONDS):
+
+        try:
+
+            return self.utterances.get(timeout=timeout)
+
+        except queue.Empty:
+
+            return None
+
+    def stop(self):
+
+        self._stop.set()
+
+CAPTURE = None
+
+_CAPTURE_LOCK = threading.Lock()
+
+_RECOGNIZER = None
+
+_RECOGNIZER_CALIBRATED = False
+
+def _recognizer():
+
+    global _RECOGNIZER
+
+    if _RECOGNIZER is None:
+
+        _RECOGNIZER = sr.Recognizer()
+
+    return _RECOGNIZER
+
+def start_capture():
+
+    global CAPTURE
+
+    with _CAPTURE_LOCK:
+
+        if CAPTURE is None or not CAPTURE.running():
+
+            try:
+
+                with STARTUP.phase("open microphone"):
+
+                    CAPTURE = AudioCapture(MicrophoneSource(), gate=TTS.speaking).start()
+
+            except Exception as e:
+
+                print("[vega] continuous capture unavailable, using per-utterance microphone:", e)
+
+                CAPTURE = None
+
+        if STARTUP.first_listen is None:
+
+            STARTUP.first_listen = time.perf_counter() - STARTUP.t0
+
+        return CAPTURE
+
+def _listen_blocking(timeout):
+
+    # fallback when the capture thread cannot own the device; calibrates only on first use
+
+    global _RECOGNIZER_CALIBRATED
+
+    while TTS.speaking():  # don't open the microphone on our own reply
+
+        time.sleep(0.05)
+
+    with sr.Microphone() as source:
+
+        if not _RECOGNIZER_CALIBRATED:
+
+            _recognizer().adjust_for_ambient_noise(source, duration=0.8)
+
+            _RECOGNIZER_CALIBRATED = True
+
+        try:
+
+            return _recognizer().listen(source, timeout=timeout, phrase_time_limit=timeout)
+
+        except sr.WaitTimeoutError:
+
+            return None
+
+def listen_utterance(timeout=LISTEN_SECONDS):
+
+    cap = start_capture()
+
+    if cap is None:
+
+        print("सुन रहा हूँ... (Google STT)")
+
+        return _listen_blocking(timeout)
+
+    return cap.next_utterance(timeout)
+
+# ---------------- Recognizer orchestration ----------------
+
+class RecognizerBackend:
+
+    """Pluggable STT backend: recognize(audio: sr.AudioData) -> (text, confidence 0..1 or None)."""
+
+    name = "backend"
+
+    def recognize(self, audio):
+
+        raise NotImplementedError
+
+class GoogleBackend(RecognizerBackend):
+
+    def __init__(self, language):
+
+        self.language = language
+
+        self.name = f"google:{language}"
+
+    def recognize(self, audio):
+
+        try:
+
+            res = _recognizer().recognize_google(audio, language=self.language, show_all=True)
+
+        except (sr.UnknownValueError, sr.RequestError):
+
+            return "", None
+
+        alts = res.get("alternative") if isinstance(res, dict) else None
+
+        if not alts:
+
+            return "", None
+
+        return alts[0].get("transcript", ""), alts[0].get("confidence")
+
+class VoskBackend(RecognizerBackend):
+
+    name = "vosk"
+
+    def __init__(self, recognizer=None):
+
+        self.recognizer = recognizer
+
+    def recognize(self, audio):
+
+        return (self.recognizer or VOSK).recognize_pcm_conf(audio.get_raw_data(convert_rate=VOSK_SAMPLE_RATE, convert_width=2))
+
+def make_backend(spec):
+
+    if spec.startswith("google:"):
+
+        return GoogleBackend(spec.split(":", 1)[1])
+
+    if spec == "vosk":
+
+        return VoskBackend()
+
+    raise ValueError(f"unknown STT backend {spec!r}")
+
+class RecognizerOrchestrator:
+
+    """Runs every backend concurrently on the same utterance. Backends are in preference order:
+
+    a confident result (>= min_confidence) from the first backend returns at once; one from a
+
+    later backend waits up to `grace` seconds for a preferred backend still running, and the
+
+    most preferred confident result wins, so the en-US transliteration cannot beat hi-IN by
+
+    thread timing alone. With no confident result, the most confident non-empty text wins
+
+    (ties by preference). Keeps per-backend call counts, errors, wins and recent latencies."""
+
+    def __init__(self, backends, min_confidence=STT_MIN_CONFIDENCE, timeout=STT_RACE_TIMEOUT, grace=STT_GRACE):
+
+        self.backends = list(backends)
+
+        self.min_confidence = min_confidence
+
+        self.timeout = timeout
+
+        self.grace = grace
+
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.backends)), thread_name_prefix="vega-stt")
+
+        self._lock = threading.Lock()
+
+        self.stats = {b.name: {"calls": 0, "errors": 0, "wins": 0, "latency": deque(maxlen=200)} for b in self.backends}
+
+    def _timed(self, backend, audio):
+
+        start = time.perf_counter()
+
+        try:
+
+            with TRACER.span("stt:" + backend.name):
+
+                text, conf = backend.recognize(audio)
+
+            err = False
+
+        except Exception:
+
+            text, conf, err = "", None, True
+
+        with self._lock:
+
+            st = self.stats[backend.name]
+
+            st["calls"] += 1
+
+            st["errors"] += err
+
+            st["latency"].append(time.perf_counter() - start)
+
+        return text or "", (STT_DEFAULT_CONFIDENCE if text and conf is None else (conf or 0.0))
+
+    def recognize(self, audio):
+
+        futures = {submit_in_context(self._pool, self._timed, b, audio): rank for rank, b in enumerate(self.backends)}
+
+        confident = {}  # rank -> text
+
+        fallback = None  # (confidence, -rank, text)
+
+        now = time.monotonic()
+
+        deadline, grace_end = now + self.timeout, None
+
+        pending = set(futures)
+
+        while pending:
+
+            done, pending = futures_wait(pending, timeout=max(0.0, min(deadline, grace_end or deadline) - now),
+
+                                         return_when=FIRST_COMPLETED)
+
+            now = time.monotonic()
+
+            for fut in done:
+
+                text, conf = fut.result()
+
+                rank = futures[fut]
+
+                if not text:
+
+                    continue
+
+                if conf >= self.min_confidence:
+
+                    confident[rank] = text
+
+                elif fallback is None or (conf, -rank) > fallback[:2]:
+
+                    fallback = (conf, -rank, text)
+
+            if confident:
+
+                top = min(confident)
+
+                if all(futures[f] > top for f in pending):
+
+                    break  # nothing preferred is still running
+
+                if grace_end is None:
+
+                    grace_end = min(deadline, now + self.grace)
+
+            if not done or now >= min(deadline, grace_end or deadline):
+
+                break
+
+        if confident:
+
+            rank = min(confident)
+
+            best, best_name = confident[rank], self.backends[rank].name
+
+        elif fallback is not None:
+
+            best, best_name = fallback[2], self.backends[-fallback[1]].name
+
+        else:
+
+            best, best_name = "", None
+
+        if best_name:
+
+            with self._lock:
+
+                self.stats[best_name]["wins"] += 1
+
+        return best
+
+    def report(self):
+
+        lines = []
+
+        with self._lock:
+
+            for name, st in self.stats.items():
+
+                lat = sorted(st["latency"])
+
+                p50 = lat[len(lat) // 2] * 1000 if lat else 0.0
+
+                rate = st["wins"] / st["calls"] if st["calls"] else 0.0
+
+                lines.append(f"{name:<14} calls {st['calls']:5d}  wins {st['wins']:5d} ({rate:5.1%})  errors {st['errors']:4d}  p50 {p50:7.1f} ms")
+
+        return "\n".join(lines)
+
+STT = RecognizerOrchestrator([make_backend(spec) for spec in STT_BACKENDS])
+
+def replay_wav(path):
+
+    """Run a WAV fixture through capture + VAD and print the utterances it segments."""
+
+    cap = AudioCapture(WavFileSource(path), queue_size=1000).start()
+
+    cap.finished.wait()
+
+    n = 0
+
+    while True:
+
+        audio = cap.next_utterance(timeout=0)
+
+        if audio is None:
+
+            break
+
+        n += 1
+
+        print(f"utterance {n}: {len(audio.frame_data) / 2 / audio.sample_rate:.2f}s")
+
+    print(f"{n} utterances, noise floor {cap.vad.noise_floor or 0:.1f} RMS, threshold {cap.vad.threshold():.1f}")
+
+    return n
+
+# Optional: Vosk offline STT fallback (if user installed vosk & model)
+
+class OfflineRecognizer:
+
+    """Long-lived Vosk recognizer. The model is loaded once (start_loading() at startup runs it in
+
+    the background) and the KaldiRecognizer is reset instead of rebuilt; audio comes from
+
+    AudioCapture, never from a stream of its own."""
+
+    def __init__(self, model_path=VOSK_MODEL_PATH, rate=VOSK_SAMPLE_RATE):
+
+        self.model_path = model_path
+
+        self.rate = rate
+
+        self.error = None
+
+        self._model = None
+
+        self._rec = None
+
+        self._loaded = threading.Event()
+
+        self._loader = None
+
+        self._lock = threading.Lock()
+
+    def start_loading(self):
+
+        if self._loader is None:
+
+            self._loader = threading.Thread(target=self._load, name="vega-vosk-load", daemon=True)
+
+            self._loader.start()
+
+        return self
+
+    def _load(self):
+
+        try:
+
+            from vosk import Model, KaldiRecognizer
+
+            if not os.path.exists(self.model_path):
+
+                self.error = f"model not found: {self.model_path}"
+
+                return
+
+            self._model = Model(self.model_path)
+
+            self._rec = KaldiRecognizer(self._model, self.rate)
+
+            if hasattr(self._rec, "SetWords"):
+
+                self._rec.SetWords(True)  # per-word confidences for the recognizer race
+
+        except Exception as e:
+
+            self.error = str(e)
+
+        finally:
+
+            self._loaded.set()
+
+    def ready(self):
+
+        return self._rec is not None
+
+    def _reset(self):
+
+        if hasattr(self._rec, "Reset"):
+
+            self._rec.Reset()
+
+        else:  # very old vosk builds: a fresh recognizer is still cheap next to the model
+
+            from vosk import KaldiRecognizer
+
+            self._rec = KaldiRecognizer(self._model, self.rate)
+
+    def recognize_pcm_conf(self, pcm):
+
+        """Recognize already-captured 16 kHz 16-bit PCM (an utterance from AudioCapture);
+
+        returns (text, mean word confidence or None)."""
+
+        self.start_loading()
+
+        if not self._loaded.is_set() or not self.ready() or not pcm:
+
+            return "", None
+
+        with self._lock:
+
+            self._reset()
+
+            self._rec.AcceptWaveform(pcm)
+
+            res = json.loads(self._rec.FinalResult())
+
+        words = [w.get("conf") for w in res.get("result", []) if isinstance(w, dict) and "conf" in w]
+
+        return res.get("text", ""), (sum(words) / len(words) if words else None)
+
+VOSK = OfflineRecognizer()
+
+# ---------------- Intent router ----------------
+
+FALLTHROUGH = object()  # handler result: not mine after all, let the free-text handler answer
+
+class IntentRouter:
+
+    """intent -> handler table. Handlers take (text, meta) and return the reply to remember
+
+    (None: nothing to save). blocking handlers run on the router pool; with a timeout the
+
+    utterance stops waiting after that many seconds and the reply is saved when it lands."""
+
+    def __init__(self, workers=4):
+
+        self.routes = {}
+
+        self.fallback = None
+
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vega-intent")
+
+    def register(self, *intents, blocking=False, timeout=None):
+
+        def deco(fn):
+
+            for intent in intents:
+
+                self.routes[intent] = (fn, blocking, timeout)
+
+            return fn
+
+        return deco
+
+    def register_fallback(self, blocking=False, timeout=None):
+
+        def deco(fn):
+
+            self.fallback = (fn, blocking, timeout)
+
+            return fn
+
+        return deco
+
+    def dispatch(self, intent, text, meta):
+
+        route = self.routes.get(intent)
+
+        result = self._call(intent, route, text, meta) if route else FALLTHROUGH
+
+        if result is FALLTHROUGH and self.fallback:
+
+            result = self._call("UNKNOWN", self.fallback, text, text)
+
+        self._remember(text, result)
+
+        return result
+
+    def _remember(self, text, result):
+
+        if result is not None and result is not FALLTHROUGH:
+
+            with STAGES.timed("persist"), TRACER.span("persist"):
+
+                save_memory(text, result)
+
+    def _call(self, intent, route, text, meta):
+
+        fn, blocking, timeout = route
+
+        t0 = time.perf_counter()
+
+        try:
+
+            with TRACER.span("handler:" + intent, blocking=blocking):
+
+                if not blocking:
+
+                    return fn(text, meta)
+
+                fut = submit_in_context(self._pool, fn, text, meta)
+
+                try:
+
+                    return fut.result(timeout)
+
+                except FutureTimeout:
+
+                    print(f"[vega] {intent} handler still running after {timeout}s — not waiting for it")
+
+                    log_feedback(text, "fail", f"timeout:{intent}")
+
+                    fut.add_done_callback(lambda f: f.exception() is None and self._remember(text, f.result()))
+
+                    return None
+
+        finally:
+
+            ms = (time.perf_counter() - t0) * 1000.0
+
+            STAGES.record("handler", ms)
+
+            STAGES.record("handler:" + intent, ms)
+
+ROUTER = IntentRouter()
+
+@ROUTER.register("DANGEROUS")
+
+def _on_dangerous(text, meta):
+
+    speak_hindi("माफ़ कीजिए — मैं यह काम करने में मदद नहीं कर सकता।", priority=TTS_URGENT)
+
+    log_feedback(text, "blocked", f"dangerous:{meta}")
+
+    return "blocked_dangerous"
+
+@ROUTER.register("SCREENSHOT", blocking=True, timeout=15)
+
+def _on_screenshot(text, meta):
+
+    take_screenshot()
+
+    return "screenshot"
+
+@ROUTER.register("LOCK", blocking=True, timeout=10)
+
+def _on_lock(text, meta):
+
+    lock_device()
+
+    return "lock"
+
+@ROUTER.register("UNLOCK", blocking=True, timeout=10)
+
+def _on_unlock(text, meta):
+
+    unlock_device()
+
+    return "unlock"
+
+@ROUTER.register("CAMERA", blocking=True, timeout=15)
+
+def _on_camera(text, meta):
+
+    camera_photo()
+
+    return "camera"
+
+@ROUTER.register("VOLUME_UP", blocking=True, timeout=10)
+
+def _on_volume_up(text, meta):
+
+    step_volume(VOLUME_STEP)
+
+    return "volume_up"
+
+@ROUTER.register("VOLUME_DOWN", blocking=True, timeout=10)
+
+def _on_volume_down(text, meta):
+
+    step_volume(-VOLUME_STEP)
+
+    return "volume_down"
+
+@ROUTER.register("VOLUME_MUTE", blocking=True, timeout=10)
+
+def _on_volume_mute(text, meta):
+
+    set_volume(0)
+
+    return "volume_mute"
+
+@ROUTER.register("TIME")
+
+def _on_time(text, meta):
+
+    speak_hindi(time.strftime("अभी समय है %H:%M:%S"))
+
+    return "time"
+
+@ROUTER.register("BATTERY", blocking=True, timeout=10)
+
+def _on_battery(text, meta):
+
+    battery = DEVICE_STATE.get_battery()
+
+    if battery:
+
+        speak_hindi(f"बैटरी {battery['level']}% है" + (" — चार्ज हो रही है" if battery.get("charging") else ""))
+
+    else:
+
+        speak_hindi("बैटरी लेवल नहीं मिला")
+
+    return "battery"
+
+@ROUTER.register("OPEN_APP", blocking=True, timeout=15)
+
+def _on_open_app(text, meta):
+
+    opened = open_app(meta)
+
+    return f"open_app:{meta}:{opened}"
+
+@ROUTER.register("TRADE_ADVICE", blocking=True, timeout=20)
+
+def _on_trade_advice(text, meta):
+
+    if meta not in WATCHLIST:
+
+        return FALLTHROUGH
+
+    sugg = trading_suggestion(meta)
+
+    speak_hindi(sugg)
+
+    return sugg
+
+@ROUTER.register("AUTHORIZED_SCAN", blocking=True)
+
+def _on_authorized_scan(text, meta):
+
+    tgt = meta
+
+    if not tgt:
+
+        speak_hindi("कृपया लक्ष्य बताइए — IP या domain.")
+
+        return None
+
+    if not is_valid_hostname_or_ip(tgt):
+
+        speak_hindi("लक्ष्य invalid है।")
+
+        return None
+
+    wl = load_json(WHITELIST_FILE, {})
+
+    if tgt not in wl:
+
+        speak_hindi("यह लक्ष्य whitelist में नहीं है — मालिक से invitation token लें।")
+
+        audit_log({"action":"scan_blocked","target":tgt,"reason":"not_whitelisted"})
+
+        return None
+
+    speak_hindi("Owner invite token terminal में डालिए।")
+
+    token = (TERMINAL.ask("Invite token: ", timeout=PROMPT_TIMEOUT) or "").strip()
+
+    if not verify_invite_token(tgt, token):
+
+        speak_hindi("Token invalid. Aborting.")
+
+        audit_log({"action":"token_invalid","target":tgt,"token_try": token})
+
+        return None
+
+    ok = require_typed_confirmation()
+
+    if not ok:
+
+        speak_hindi("Confirmation not received. Aborting.")
+
+        return None
+
+    ok, out = run_approved_action("port_scan", target=tgt)
+
+    if ok:
+
+        speak_hindi("Scan complete. Result saved to logs. Summary:")
+
+        speak_hindi(out[:300] if out else "No output")
+
+    else:
+
+        speak_hindi("Scan failed: " + str(out)[:200])
+
+    return None
+
+@ROUTER.register_fallback()
+
+def _on_free_text(text, meta):
+
+    # unknown -> ask HF for help (understanding / friendly reply)
+
+    speak_hindi("सोच रहा हूँ...") # quick feedback
+
+    hf_resp, err = hf_query(text, max_tokens=180)
+
+    if hf_resp:
+
+        print("HF:", hf_resp)
+
+        speak_hindi(hf_resp if len(hf_resp) < 300 else hf_resp[:300] + "...")
+
+        log_feedback(text, "success", "hf_reply")
+
+        return hf_resp
+
+    print("[vega] HF error:", err)
+
+    speak_hindi("समझ नहीं आया — क्या सरल शब्दों में बोलोगे?")
+
+    log_feedback(text, "fail", err if err else "hf_fail")
+
+    return "hf_fail"
+
+def handle_utterance(text):
+
+    print(f"तुम बोले: {text}")
+
+    log_usage(text)
+
+    with TRACER.span("utterance", text=text) as span:
+
+        with STAGES.timed("normalize"), TRACER.span("normalize") as norm:
+
+            intent, meta = normalize_and_intent(text)
+
+            norm.set(intent=intent)
+
+        span.set(intent=intent)
+
+        ROUTER.dispatch(intent, text, meta)
+
+# ---------------- Terminal commands ----------------
+
+def handle_terminal_command(cmd):
+
+    cmd = cmd.strip()
+
+    if not cmd:
+
+        return
+
+    C = cmd.upper()
+
+    if C == "CONFIRM":
+
+        suggested = load_json(SUGGESTED_FIXES, [])
+
+        if not suggested:
+
+            print("कोई suggested fixes नहीं है।")
+
+            return
+
+        first = suggested.pop(0)
+
+        PERSIST.submit_json(SUGGESTED_FIXES, suggested)
+
+        command = first.get("command", "")
+
+        if command.startswith("open_app:"):
+
+            app_name = command.split(":", 1)[1]
+
+            app_map = load_json(APP_MAP_FILE, DEFAULT_APP_MAP.copy())
+
+            app_map[app_name] = "com.example.placeholder"
+
+            PERSIST.submit_json(APP_MAP_FILE, app_map)
+
+            print(f"Placeholder mapping added for '{app_name}'. Edit {APP_MAP_FILE} to set real package.")
+
+            speak_hindi(f"{app_name} के लिए placeholder mapping जोड़ दिया — फ़ाइल एडिट करके सही package डाल देना")
+
+        else:
+
+            print("Applied safe non-destructive suggestion (logged).")
+
+    elif C == "ANALYZE":
+
+        analyze()
+
+        print("Analyze complete.")
+
+    elif C == "SHOWLOGS":
+
+        PERSIST.flush()
+
+        print("Recent feedback (last 10):")
+
+        for e in EVENT_LOG.tail("feedback", 10):
+
+            print(e)
+
+    elif C == "COMPACT":
+
+        PERSIST.flush()
+
+        EVENT_LOG.compact()
+
+        HF_CACHE.purge()
+
+        print("Event log compacted.")
+
+    elif C == "CACHESTATS":
+
+        print("HF cache:", HF_CACHE.stats())
+
+        print("TTS:", TTS.stats())
+
+        print("Market:", MARKET.stats())
+
+    elif C == "HUSH":
+
+        TTS.interrupt()
+
+    elif C == "STTSTATS":
+
+        print(STT.report())
+
+    elif C == "STATS":
+
+        print(STAGES.report())
+
+    elif C == "RUNSTATS":
+
+        print(RUNNER.report())
+
+        RUNNER.export()
+
+    elif C == "TRACE":
+
+        TRACER.enabled = not TRACER.enabled
+
+        print(f"Tracing {'on' if TRACER.enabled else 'off'} -> {TRACER.path}")
+
+    elif C == "TRACEDUMP":
+
+        print(f"{TRACER.dump_chrome()} spans -> {TRACE_CHROME_FILE}")
+
+    elif C in ("EXIT","QUIT"):
+
+        speak_hindi("सर्विस बंद कर रहा हूँ — बाय", interrupt=True)
+
+        shutdown_service()
+
+    else:
+
+        print("Commands: CONFIRM, ANALYZE, SHOWLOGS, COMPACT, CACHESTATS, STTSTATS, STATS, RUNSTATS, TRACE, TRACEDUMP, HUSH, EXIT")
+
+# ---------------- Async core ----------------
+
+class TerminalInput:
+
+    """Single owner of stdin. One reader thread hands each line to the oldest pending ask()
+
+    (invite token, typed confirmation) or, when nobody is asking, to the event bus as a command."""
+
+    def __init__(self):
+
+        self._pending = deque()
+
+        self._lock = threading.Lock()
+
+        self._thread = None
+
+    def start(self, on_line):
+
+        self._thread = threading.Thread(target=self._read, args=(on_line,), name="vega-stdin", daemon=True)
+
+        self._thread.start()
+
+    def _read(self, on_line):
+
+        while True:
+
+            try:
+
+                line = input()
+
+            except EOFError:
+
+                return
+
+            except Exception as e:
+
+                print("[vega] terminal read error:", e)
+
+                time.sleep(0.5)
+
+                continue
+
+            with self._lock:
+
+                fut = self._pending.popleft() if self._pending else None
+
+            if fut is not None:
+
+                fut.set_result(line)
+
+            else:
+
+                on_line(line)
+
+    def ask(self, prompt="", timeout=None):
+
+        """Block the calling handler until the operator types a line; None on timeout/EOF."""
+
+        if self._thread is None:  # no core running (one-off scripts): read stdin directly
+
+            try:
+
+                return input(prompt)
+
+            except EOFError:
+
+                return None
+
+        fut = Future()
+
+        with self._lock:
+
+            self._pending.append(fut)
+
+        if prompt:
+
+            print(prompt, end="", flush=True)
+
+        try:
+
+            return fut.result(timeout)
+
+        except FutureTimeout:
+
+            with self._lock:
+
+                if fut in self._pending:
+
+                    self._pending.remove(fut)
+
+            return None
+
+TERMINAL = TerminalInput()
+
+class EventBus:
+
+    """asyncio queue of (kind, payload) events; sources on other threads use publish_threadsafe()."""
+
+    def __init__(self, loop):
+
+        self.loop = loop
+
+        self.queue = asyncio.Queue()
+
+    def publish(self, kind, payload=None):
+
+        self.queue.put_nowait((kind, payload))
+
+    def publish_threadsafe(self, kind, payload=None):
+
+        self.loop.call_soon_threadsafe(self.publish, kind, payload)
+
+    async def get(self):
+
+        return await self.queue.get()
+
+def audio_source(bus, sleep=time.sleep):
+
+    # capture keeps running while handlers work, so the next command is heard immediately
+
+    delay = 1.0
+
+    while True:
+
+        try:
+
+            audio = listen_utterance()
+
+            delay = 1.0
+
+            if audio is not None:
+
+                bus.publish_threadsafe("audio", audio)
+
+        except ImportError as e:  # a missing package will not appear by retrying
+
+            print(f"[vega] voice input disabled ({e}); type commands in the terminal instead")
+
+            return
+
+        except Exception as e:
+
+            print(f"[vega] audio source exception (retrying in {delay:.0f}s):", e)
+
+            sleep(delay)
+
+            delay = min(delay * 2, AUDIO_RETRY_MAX)
+
+async def timer_source(bus, name, seconds):
+
+    while True:
+
+        await asyncio.sleep(seconds)
+
+        bus.publish("tick", name)
+
+def handle_audio(audio):
+
+    t0 = time.perf_counter()
+
+    with STAGES.timed("stt"), TRACER.span("stt"):
+
+        text = STT.recognize(audio)  # hi-IN, en-US and Vosk race on the same audio
+
+    if text:
+
+        handle_utterance(text)
+
+        STAGES.record("utterance", (time.perf_counter() - t0) * 1000.0)
+
+def handle_tick(name):
+
+    if name == "analyze":
+
+        analyze()
+
+    elif name == "battery":
+
+        DEVICE_STATE.refresh_battery()
+
+    elif name == "device_state":
+
+        DEVICE_STATE.refresh_volume()
+
+    elif name == "keepalive":
+
+        # keep awake (best-effort); only reaches the device when the lock is not known to be held
+
+        try:
+
+            DEVICE.ensure("wake_lock", True, ["termux-wake-lock"], refresh=WAKE_LOCK_REFRESH)
+
+        except Exception:
+
+            pass
+
+EVENT_HANDLERS = {"audio": handle_audio, "terminal": handle_terminal_command, "tick": handle_tick}
+
+async def _run_handler(kind, payload, limit):
+
+    async with limit:
+
+        try:
+
+            with TRACER.span("event:" + kind, root=True):
+
+                await asyncio.to_thread(EVENT_HANDLERS[kind], payload)
+
+        except Exception as e:
+
+            print(f"[vega] {kind} handler exception:", e)
+
+            log_feedback("internal_exception", "fail", str(e))
+
+async def run_core():
+
+    """Event loop: audio, terminal and timer sources feed one bus; each event runs as a task in
+
+    a worker thread, bounded per kind by CORE_LIMITS."""
+
+    loop = asyncio.get_running_loop()
+
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=sum(CORE_LIMITS.values()) + 2, thread_name_prefix="vega-handler"))
+
+    bus = EventBus(loop)
+
+    limits = {kind: asyncio.Semaphore(n) for kind, n in CORE_LIMITS.items()}
+
+    TERMINAL.start(lambda line: bus.publish_threadsafe("terminal", line))
+
+    threading.Thread(target=audio_source, args=(bus,), name="vega-audio", daemon=True).start()
+
+    tasks = {asyncio.create_task(timer_source(bus, "keepalive", KEEPALIVE_SECONDS)),
+
+             asyncio.create_task(timer_source(bus, "battery", BATTERY_REFRESH)),
+
+             asyncio.create_task(timer_source(bus, "device_state", DEVICE_STATE_REFRESH))}
+
+    loop.call_later(ANALYZE_DELAY, bus.publish, "tick", "analyze")
+
+    while True:
+
+        kind, payload = await bus.get()
+
+        if kind not in EVENT_HANDLERS:
+
+            continue
+
+        task = asyncio.create_task(_run_handler(kind, payload, limits[kind]))
+
+        tasks.add(task)
+
+        task.add_done_callback(tasks.discard)
+
+# ---------------- Analyzer (auto-suggest repairs) ----------------
+
+def analyze():
+
+    PERSIST.flush()
+
+    learned = LOCAL_INTENT.update_from_history()
+
+    if learned:
+
+        print(f"Local intent model updated with {learned} new examples.")
+
+    seen = 0
+
+    counts = Counter()
+
+    for d in EVENT_LOG.iter_events("feedback"):
+
+        seen += 1
+
+        if d.get("status") == "fail":
+
+            counts[d.get("command")] += 1
+
+    if not seen:
+
+        print("No feedback yet.")
+
+        return
+
+    if not counts:
+
+        print("No failures logged.")
+
+        return
+
+    most_common, cnt = counts.most_common(1)[0]
+
+    if cnt >= 3:
+
+        speak_hindi(f"ध्यान दें: '{most_common}' बार-बार फेल हो रहा है — टर्मिनल में CONFIRM करके placeholder जोड़ो")
+
+        suggested = load_json(SUGGESTED_FIXES, [])
+
+        suggested.append({"time": time.time(), "command": most_common, "hint": "possible mapping/permission issue"})
+
+        PERSIST.submit_json(SUGGESTED_FIXES, suggested)
+
+    else:
+
+        print("No recurring failures found.")
+
+# ---------------- Auxiliary functions ----------------
+
+def is_valid_hostname_or_ip(s):
+
+    return bool(re.match(r"^\d{1,3}(\.\d{1,3}){3}$", s) or re.match(r"^[a-z0-9\.-]{1,253}$", s, re.IGNORECASE))
+
+def verify_invite_token(target, token):
+
+    wl = load_json(WHITELIST_FILE, {})
+
+    if target in wl and "token" in wl[target]:
+
+        return wl[target]["token"] == token
+
+    return False
+
+def require_typed_confirmation(timeout_seconds=60):
+
+    print("Dangerous action requested. To proceed TYPE: CONFIRM: YES (and press Enter)")
+
+    speak_hindi("ध्यान दें: खतरनाक कार्रवाई के लिए टाइप करके पुष्टि करिए। टर्मिनल में CONFIRM: YES टाइप कीजिये।")
+
+    user = TERMINAL.ask(timeout=timeout_seconds)
+
+    return (user or "").strip() == "CONFIRM: YES"
+
+def run_approved_action(action_name, target=None, extra_args=None):
+
+    approved = load_json(APPROVED_CMDS_FILE, {})
+
+    if action_name not in approved:
+
+        return False, f"Action '{action_name}' not found"
+
+    base_cmd = approved[action_name].copy()
+
+    final_cmd = []
+
+    for part in base_cmd:
+
+        if "{target}" in part:
+
+            if not target:
+
+                return False, "No target provided"
+
+            if not is_valid_hostname_or_ip(target):
+
+                return False, "Invalid target format"
+
+            final_cmd.append(part.replace("{target}", target))
+
+        else:
+
+            final_cmd.append(part)
+
+    if extra_args:
+
+        final_cmd += extra_args
+
+    audit_log({"phase":"pre-exec","action":action_name,"cmd":final_cmd,"target":target})
+
+    ok,out = safe_run(final_cmd, label=f"approved:{action_name}")
+
+    audit_log({"phase":"post-exec","action":action_name,"cmd":final_cmd,"target":target,"success":ok,"stdout_snippet": (out or "")[:1000]})
+
+    return ok, out
+
+# ---------------- Indicators ----------------
+
+def _numpy():
+
+    try:
+
+        import numpy
+
+        return numpy
+
+    except ImportError:
+
+        return None
+
+class RollingWindow:
+
+    """Last n values in a ring buffer with running sum and sum of squares, so mean and standard
+
+    deviation cost O(1) per push. Values are stored relative to the first one pushed (keeps the
+
+    squares small), and the sums are recomputed exactly once per wrap to stop float drift."""
+
+    def __init__(self, n):
+
+        self.n = n
+
+        self.buf = array("d", bytes(8 * n))
+
+        self.i = 0
+
+        self.count = 0
+
+        self.sum = 0.0
+
+        self.sumsq = 0.0
+
+        self.base = None
+
+    def push(self, x):
+
+        if self.base is None:
+
+            self.base = x
+
+        x -= self.base
+
+        old = self.buf[self.i] if self.count == self.n else 0.0
+
+        self.buf[self.i] = x
+
+        self.i = (self.i + 1) % self.n
+
+        self.count = min(self.count + 1, self.n)
+
+        if self.i == 0:
+
+            self.sum = math.fsum(self.buf)
+
+            self.sumsq = math.fsum(v * v for v in self.buf)
+
+        else:
+
+            self.sum += x - old
+
+            self.sumsq += x * x - old * old
+
+    def mean(self):
+
+        return self.base + self.sum / self.count
+
+    def std(self):
+
+        m = self.sum / self.count
+
+        return math.sqrt(max(0.0, self.sumsq / self.count - m * m))
+
+def _wilder(avg, x, k, n):
+
+    # simple mean over the first n samples, Wilder smoothing (alpha = 1/n) after that
+
+    return avg + (x - avg) / min(k, n)
+
+class IndicatorEngine:
+
+    """SMA, fast/slow EMA, RSI, ATR and Bollinger bands over a price stream, each updated in O(1)
+
+    per tick. Ticks are closes; pass high/low when bars are available, otherwise the true range
+
+    degrades to the close-to-close move."""
+
+    def __init__(self, sma=SMA_PERIOD, ema_fast=EMA_FAST, ema_slow=EMA_SLOW, rsi=RSI_PERIOD, atr=ATR_PERIOD, band_k=BAND_K):
+
+        self.window = RollingWindow(sma)
+
+        self.alpha_fast = 2.0 / (ema_fast + 1)
+
+        self.alpha_slow = 2.0 / (ema_slow + 1)
+
+        self.rsi_period = rsi
+
+        self.atr_period = atr
+
+        self.band_k = band_k
+
+        self.warmup = max(sma, ema_slow, rsi + 1, atr + 1)
+
+        self.ticks = 0
+
+        self.close = None
+
+        self.ema_fast = self.ema_slow = None
+
+        self.avg_gain = self.avg_loss = self.atr = 0.0
+
+    def update(self, price, high=None, low=None):
+
+        high = price if high is None else high
+
+        low = price if low is None else low
+
+        prev = self.close
+
+        self.ticks += 1
+
+        self.window.push(price)
+
+        if prev is None:
+
+            self.ema_fast = self.ema_slow = price
+
+        else:
+
+            self.ema_fast += self.alpha_fast * (price - self.ema_fast)
+
+            self.ema_slow += self.alpha_slow * (price - self.ema_slow)
+
+            k = self.ticks - 1
+
+            move = price - prev
+
+            self.avg_gain = _wilder(self.avg_gain, move if move > 0 else 0.0, k, self.rsi_period)
+
+            self.avg_loss = _wilder(self.avg_loss, -move if move < 0 else 0.0, k, self.rsi_period)
+
+            tr = max(high - low, abs(high - prev), abs(low - prev))
+
+            self.atr = _wilder(self.atr, tr, k, self.atr_period)
+
+        self.close = price
+
+    def rsi(self):
+
+        if self.avg_loss == 0:
+
+            return 100.0 if self.avg_gain > 0 else 50.0
+
+        return 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+
+    def snapshot(self):
+
+        if self.close is None:
+
+            return None
+
+        sma, std = self.window.mean(), self.window.std()
+
+        return {"close": self.close, "sma": sma, "ema_fast": self.ema_fast, "ema_slow": self.ema_slow,
+
+                "rsi": self.rsi(), "atr": self.atr, "upper": sma + self.band_k * std, "lower": sma - self.band_k * std,
+
+                "ticks": self.ticks, "ready": self.ticks >= self.warmup}
+
+def recompute_indicators(prices, sma=SMA_PERIOD, ema_fast=EMA_FAST, ema_slow=EMA_SLOW, rsi=RSI_PERIOD, atr=ATR_PERIOD, band_k=BAND_K):
+
+    """From-scratch reference over a whole price list (NumPy for the window statistics when
+
+    installed): what a non-incremental implementation pays per tick, and the check for the engine."""
+
+    np = _numpy()
+
+    if np is not None:
+
+        window = np.asarray(prices[-sma:], dtype=float)
+
+        mean, std = float(window.mean()), float(window.std())
+
+    else:
+
+        window = prices[-sma:]
+
+        mean = math.fsum(window) / len(window)
+
+        std = math.sqrt(max(0.0, math.fsum(v * v for v in window) / len(window) - mean * mean))
+
+    fast = slow = prices[0]
+
+    gain = loss = tr = 0.0
+
+    for k in range(1, len(prices)):
+
+        p, prev = prices[k], prices[k - 1]
+
+        fast += 2.0 / (ema_fast + 1) * (p - fast)
+
+        slow += 2.0 / (ema_slow + 1) * (p - slow)
+
+        gain = _wilder(gain, max(p - prev, 0.0), k, rsi)
+
+        loss = _wilder(loss, max(prev - p, 0.0), k, rsi)
+
+        tr = _wilder(tr, abs(p - prev), k, atr)
+
+    return {"sma": mean, "ema_fast": fast, "ema_slow": slow, "rsi": 100.0 - 100.0 / (1.0 + gain / loss) if loss else (100.0 if gain else 50.0),
+
+            "atr": tr, "upper": mean + band_k * std, "lower": mean - band_k * std}
+
+def bench_indicators(n=365 * 24 * 60, recompute_window=24 * 60, recompute_samples=500):
+
+    """Per-tick cost of the incremental engine over a year of minute ticks, against recomputing
+
+    over a one-day window on every tick, plus the largest deviation from the reference."""
+
+    rng = random.Random(7)
+
+    prices, p = array("d"), 60000.0
+
+    for _ in range(n):
+
+        p *= 1 + rng.gauss(0, 0.0008)
+
+        prices.append(p)
+
+    engine = IndicatorEngine()
+
+    update = engine.update
+
+    start = time.perf_counter()
+
+    for p in prices:
+
+        update(p)
+
+    incremental = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+
+    for end in range(n - recompute_samples, n):
+
+        recompute_indicators(prices[end - recompute_window:end])
+
+    recompute = (time.perf_counter() - start) / recompute_samples
+
+    got, want = engine.snapshot(), recompute_indicators(list(prices))
+
+    worst = max(abs(got[k] - want[k]) / max(abs(want[k]), 1e-12) for k in want)
+
+    print(f"{n} minute ticks ({n / 525600:.1f} years), numpy {'yes' if _numpy() else 'no'}")
+
+    print(f"  incremental update      {incremental * 1e6:8.2f} us/tick ({incremental * n:.2f} s total)")
+
+    print(f"  recompute {recompute_window}-tick window {recompute * 1e6:8.2f} us/tick")
+
+    print(f"  speedup                 {recompute / incremental:8.1f}x")
+
+    print(f"  max relative deviation  {worst:.2e}")
+
+    print("  last:", {k: round(v, 2) if isinstance(v, float) else v for k, v in got.items()})
+
+    return incremental, recompute, worst
+
+# ---------------- Market data ----------------
+
+class TickStore:
+
+    """Append-only columnar tick history: one directory per asset ("bitcoin_usd"), one segment
+
+    per UTC day, and one raw little-endian float64 file per column (.ts, .price, .volume). Rows
+
+    are fixed width, so a segment's row count is its file size / 8 and reads map the files
+
+    with np.memmap, giving zero-copy views. Writes need only the stdlib.
+
+    Each asset records what its volume column means (<asset>/volume_kind): "rolling_24h", a
+
+    running total such as CoinGecko's 24h volume (also assumed for assets that never recorded
+
+    one), or "per_tick", each row's own traded volume. bars() aggregates accordingly."""
+
+    COLUMNS = ("ts", "price", "volume")
+
+    VOLUME_KINDS = ("rolling_24h", "per_tick")
+
+    def __init__(self, directory=TICKSTORE_DIR):
+
+        self.directory = directory
+
+        self._lock = threading.Lock()
+
+        self._repaired = set()
+
+        self._kinds = {}  # asset -> volume kind recorded on disk
+
+    @staticmethod
+
+    def asset(coin, vs):
+
+        return f"{coin}_{vs}"
+
+    def _segment(self, asset, day):
+
+        return os.path.join(self.directory, asset, day)
+
+    def _rows(self, seg):
+
+        try:
+
+            return min(os.path.getsize(f"{seg}.{c}") for c in self.COLUMNS) // 8
+
+        except OSError:
+
+            return 0
+
+    def _repair(self, seg):
+
+        # a crash between column writes leaves one file longer; cut all back to the common length
+
+        if seg in self._repaired:
+
+            return
+
+        rows = self._rows(seg)
+
+        for c in self.COLUMNS:
+
+            path = f"{seg}.{c}"
+
+            if os.path.exists(path) and os.path.getsize(path) != rows * 8:
+
+                with open(path, "r+b") as f:
+
+                    f.truncate(rows * 8)
+
+        self._repaired.add(seg)
+
+    def _last_ts(self, seg):
+
+        rows = self._rows(seg)
+
+        if not rows:
+
+            return None
+
+        with open(f"{seg}.ts", "rb") as f:
+
+            f.seek((rows - 1) * 8)
+
+            return array("d", f.read(8))[0]
+
+    def _merge(self, seg, cols):
+
+        # rows older than the segment's tail (a late import): rewrite the day in ts order
+
+        rows = self._rows(seg)
+
+        old = []
+
+        for c in self.COLUMNS:
+
+            a = array("d")
+
+            with open(f"{seg}.{c}", "rb") as f:
+
+                a.frombytes(f.read(rows * 8))
+
+            old.append(a)
+
+        merged = sorted(list(zip(*old)) + list(zip(*cols)), key=lambda r: r[0])  # stable: stored rows first on ties
+
+        for c, values in zip(self.COLUMNS, zip(*merged)):
+
+            with open(f"{seg}.{c}.tmp", "wb") as f:
+
+                f.write(array("d", values).tobytes())
+
+        for c in self.COLUMNS:
+
+            os.replace(f"{seg}.{c}.tmp", f"{seg}.{c}")
+
+    def volume_kind(self, asset):
+
+        kind = self._kinds.get(asset)
+
+        if kind is None:
+
+            try:
+
+                with open(os.path.join(self.directory, asset, "volume_kind"), encoding="utf-8") as f:
+
+                    kind = f.read().strip()
+
+            except FileNotFoundError:
+
+                return "rolling_24h"
+
+            self._kinds[asset] = kind
+
+        return kind
+
+    def _record_volume_kind(self, asset, kind):
+
+        if kind not in self.VOLUME_KINDS:
+
+            raise ValueError(f"volume_kind must be one of {', '.join(self.VOLUME_KINDS)}, got {kind!r}")
+
+        path = os.path.join(self.directory, asset, "volume_kind")
+
+        if os.path.exists(path):
+
+            if self.volume_kind(asset) != kind:
+
+                raise ValueError(f"{asset} stores {self.volume_kind(asset)} volume, not {kind}")
+
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w", encoding="utf-8") as f:
+
+            f.write(kind)
+
+        self._kinds[asset] = kind
+
+    def append_many(self, asset, ts, price, volume=None, volume_kind=None):
+
+        """Appends rows and splits them into their daily segments. Segments stay sorted by ts
+
+        (range() binary-searches them): input is sorted first, and rows older than a segment's
+
+        last tick are merged in by rewriting that day, which only a late import should cause.
+
+        volume_kind, when given, is recorded for the asset (the first time) or checked."""
+
+        volume = volume if volume is not None else [0.0] * len(ts)
+
+        if any(a > b for a, b in zip(ts, ts[1:])):
+
+            order = sorted(range(len(ts)), key=ts.__getitem__)
+
+            ts, price, volume = ([col[i] for i in order] for col in (ts, price, volume))
+
+        with self._lock:
+
+            if volume_kind is not None and self._kinds.get(asset) != volume_kind:
+
+                self._record_volume_kind(asset, volume_kind)
+
+            start = 0
+
+            while start < len(ts):
+
+                day = time.strftime("%Y%m%d", time.gmtime(ts[start]))
+
+                end = bisect.bisect_left(ts, (ts[start] // 86400 + 1) * 86400, start)
+
+                seg = self._segment(asset, day)
+
+                os.makedirs(os.path.dirname(seg), exist_ok=True)
+
+                self._repair(seg)
+
+                cols = [values[start:end] for values in (ts, price, volume)]
+
+                last = self._last_ts(seg)
+
+                if last is not None and ts[start] < last:
+
+                    self._merge(seg, cols)
+
+                else:
+
+                    for c, values in zip(self.COLUMNS, cols):
+
+                        with open(f"{seg}.{c}", "ab") as f:
+
+                            f.write(array("d", values).tobytes())
+
+                start = end
+
+    def append(self, asset, ts, price, volume=0.0, volume_kind=None):
+
+        self.append_many(asset, [ts], [price], [volume], volume_kind)
+
+    def days(self, asset, start=None, end=None):
+
+        try:
+
+            names = os.listdir(os.path.join(self.directory, asset))
+
+        except FileNotFoundError:
+
+            return []
+
+        days = sorted({n.split(".")[0] for n in names if n.endswith(".ts")})
+
+        lo = time.strftime("%Y%m%d", time.gmtime(start)) if start is not None else ""
+
+        hi = time.strftime("%Y%m%d", time.gmtime(end)) if end is not None else "99999999"
+
+        return [d for d in days if lo <= d <= hi]
+
+    def segments(self, asset, start=None, end=None):
+
+        """Yields {"ts", "price", "volume"} views per daily segment, cut to [start, end)."""
+
+        np = _require_numpy()
+
+        for day in self.days(asset, start, end):
+
+            seg = self._segment(asset, day)
+
+            rows = self._rows(seg)
+
+            if not rows:
+
+                continue
+
+            cols = {c: np.memmap(f"{seg}.{c}", dtype="<f8", mode="r", shape=(rows,)) for c in self.COLUMNS}
+
+            i = int(np.searchsorted(cols["ts"], start, "left")) if start is not None else 0
+
+            j = int(np.searchsorted(cols["ts"], end, "left")) if end is not None else rows
+
+            if i < j:
+
+                yield {c: v[i:j] for c, v in cols.items()}
+
+    def range(self, asset, start=None, end=None):
+
+        """Columns for [start, end): a zero-copy view when the range sits in one day, one
+
+        concatenated copy otherwise."""
+
+        np = _require_numpy()
+
+        parts = list(self.segments(asset, start, end))
+
+        if len(parts) == 1:
+
+            return parts[0]
+
+        return {c: np.concatenate([p[c] for p in parts]) if parts else np.empty(0) for c in self.COLUMNS}
+
+    def bars(self, asset, start=None, end=None, interval="1m", volume=None):
+
+        """OHLCV bars over [start, end), cascading ticks -> 1m -> 1h -> 1d so each step only
+
+        reduces the (much shorter) output of the previous one. volume ("sum" or "last") defaults
+
+        to the asset's volume kind: a bar keeps the last reading of a rolling 24h total, and sums
+
+        per-tick volume."""
+
+        if interval not in ("1m", "1h", "1d"):
+
+            raise ValueError(f"interval must be 1m, 1h or 1d, got {interval!r}")
+
+        if volume is None:
+
+            volume = "last" if self.volume_kind(asset) == "rolling_24h" else "sum"
+
+        t = self.range(asset, start, end)
+
+        out = downsample({"ts": t["ts"], "open": t["price"], "high": t["price"], "low": t["price"],
+
+                          "close": t["price"], "volume": t["volume"]}, 60, volume)
+
+        for name, seconds in (("1h", 3600), ("1d", 86400)):
+
+            if interval == "1m" or out["ts"].size == 0:
+
+                break
+
+            out = downsample(out, seconds, volume)
+
+            if interval == name:
+
+                break
+
+        return out
+
+def _require_numpy():
+
+    np = _numpy()
+
+    if np is None:
+
+        raise RuntimeError("tick store queries need numpy: pip install numpy")
+
+    return np
+
+def downsample(bars, seconds, volume="sum"):
+
+    """OHLCV bars -> coarser OHLCV bars aligned to multiples of `seconds` (UTC). Group boundaries
+
+    come from one diff over the bucket ids; each column is then a single ufunc.reduceat pass.
+
+    volume="last" keeps the bucket's last value (for running totals like a 24h volume)."""
+
+    np = _require_numpy()
+
+    ts = np.asarray(bars["ts"])
+
+    if ts.size == 0:
+
+        return {k: np.empty(0) for k in ("ts", "open", "high", "low", "close", "volume")}
+
+    bucket = np.floor_divide(ts, seconds)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+
+    ends = np.concatenate((starts[1:], [ts.size])) - 1
+
+    vol = np.asarray(bars["volume"])
+
+    return {"ts": bucket[starts] * seconds, "open": np.asarray(bars["open"])[starts],
+
+            "high": np.maximum.reduceat(bars["high"], starts), "low": np.minimum.reduceat(bars["low"], starts),
+
+            "close": np.asarray(bars["close"])[ends],
+
+            "volume": np.add.reduceat(vol, starts) if volume == "sum" else vol[ends]}
+
+class CoinGeckoFeed:
+
+    """All coins x currencies in one /simple/price request (the endpoint takes comma lists)."""
+
+    def fetch(self, coins, currencies):
+
+        r = HTTP.get(COINGECKO_PRICE_URL, params={"ids": ",".join(coins), "vs_currencies": ",".join(currencies),
+
+                                                  "include_24hr_change": "true", "include_24hr_vol": "true"})
+
+        out = {}
+
+        for coin, data in (r.json() or {}).items():
+
+            for vs in currencies:
+
+                if isinstance(data, dict) and data.get(vs) is not None:
+
+                    out[(coin, vs)] = (float(data[vs]), float(data.get(f"{vs}_24h_change") or 0.0),
+
+                                       float(data.get(f"{vs}_24h_vol") or 0.0))
+
+        if not out:
+
+            raise ValueError(f"no quotes for {','.join(coins)}")
+
+        return out
+
+class FakePriceFeed:
+
+    """Offline feed for tests and --fake-prices: a seeded random walk per coin, 24h change
+
+    measured against the first price it produced. Other currencies are fixed multiples of USD."""
+
+    RATES = {"usd": 1.0, "inr": 83.0, "eur": 0.92}
+
+    def __init__(self, prices=None, volatility=0.002, seed=0, latency=0.0):
+
+        self.prices = dict(prices or {"bitcoin": 60000.0, "ethereum": 3000.0, "solana": 150.0, "dogecoin": 0.15})
+
+        self.volatility = volatility
+
+        self.latency = latency
+
+        self.opens = {}
+
+        self.calls = 0
+
+        self._rng = random.Random(seed)
+
+    def fetch(self, coins, currencies):
+
+        self.calls += 1
+
+        if self.latency:
+
+            time.sleep(self.latency)
+
+        out = {}
+
+        for coin in coins:
+
+            price = self.prices.get(coin, 100.0) * (1 + self._rng.gauss(0, self.volatility))
+
+            self.prices[coin] = price
+
+            change = (price / self.opens.setdefault(coin, price) - 1) * 100
+
+            volume = price * self._rng.uniform(1e5, 1e6)
+
+            for vs in currencies:
+
+                out[(coin, vs)] = (price * self.RATES.get(vs, 1.0), change, volume * self.RATES.get(vs, 1.0))
+
+        return out
+
+class MarketData:
+
+    """Shared quote cache in front of the price feed. Every MARKET_POLL_SECONDS the poller fetches
+
+    the whole watchlist in every currency as one batch and stores each tick; quote() answers from
+
+    memory while the price is younger than max_age, refetches the batch on demand otherwise, and
+
+    falls back to a flagged stale quote up to PRICE_STALE_MAX_AGE when the feed is failing.
+
+    Before its first fetch the poller rebuilds the indicator engines from the tick store."""
+
+    def __init__(self, feed, store=None, coins=WATCHLIST, currencies=MARKET_CURRENCIES, poll_seconds=MARKET_POLL_SECONDS):
+
+        self.feed = feed
+
+        self.store = store
+
+        self.coins = list(coins)
+
+        self.currencies = list(currencies)
+
+        self.poll_seconds = poll_seconds
+
+        self.quotes = {}  # (coin, vs) -> {"price", "change_24h", "ts"}
+
+        self.engines = {}  # (coin, vs) -> IndicatorEngine fed with every tick
+
+        self.counters = Counter()
+
+        self._lock = threading.Lock()
+
+        self._fetch_lock = threading.Lock()
+
+        self._stop = threading.Event()
+
+        self._thread = None
+
+    def start(self):
+
+        if self._thread is None:
+
+            self._thread = threading.Thread(target=self._run, name="vega-market", daemon=True)
+
+            self._thread.start()
+
+    def stop(self):
+
+        self._stop.set()
+
+    def _run(self):
+
+        with STARTUP.phase("indicator warm-up"):
+
+            self.load_history()
+
+        while True:
+
+            self.refresh()
+
+            if self._stop.wait(self.poll_seconds):
+
+                return
+
+    def refresh(self, want=None, max_age=None):
+
+        """One batched fetch of the watchlist (plus `want`, a (coin, vs) pair outside it).
+
+        With max_age, a caller that queued behind another fetch skips its own when `want` is
+
+        fresh by now. Returns the number of quotes stored."""
+
+        coins, currencies = list(self.coins), list(self.currencies)
+
+        if want is not None:
+
+            coins += [want[0]] if want[0] not in coins else []
+
+            currencies += [want[1]] if want[1] not in currencies else []
+
+        with self._fetch_lock:
+
+            if want is not None and max_age is not None and self._cached(*want, max_age) is not None:
+
+                return 0
+
+            with TRACER.span("market_fetch", coins=len(coins), currencies=len(currencies)):
+
+                try:
+
+                    batch = self.feed.fetch(coins, currencies)
+
+                except Exception as e:
+
+                    self.counters["errors"] += 1
+
+                    print(f"[vega] price fetch failed ({','.join(coins)}): {e}")
+
+                    return 0
+
+            now = time.time()
+
+            with self._lock:
+
+                for pair, (price, change, volume) in batch.items():
+
+                    self.quotes[pair] = {"price": price, "change_24h": change, "ts": now}
+
+                    self._engine(pair).update(price)
+
+            self.counters["fetches"] += 1
+
+            if self.store is not None:  # still under the fetch lock: load_history sees engine and store agree
+
+                try:
+
+                    for (coin, vs), (price, change, volume) in batch.items():
+
+                        self.store.append(TickStore.asset(coin, vs), now, price, volume, volume_kind="rolling_24h")
+
+                except (OSError, ValueError) as e:
+
+                    print(f"[vega] tick write failed: {e}")
 
-def camera_photo():
+        return len(batch)
 
-    photo_path = f"/sdcard/camera_{int(time.time())}.jpg"
+    def _engine(self, pair):
 
-    ok, out = safe_run(["termux-camera-photo", photo_path], "camera_photo")
+        engine = self.engines.get(pair)
 
-    if ok:
+        if engine is None:
 
-        speak_hindi("फोटो ले ली गई")
+            engine = self.engines[pair] = IndicatorEngine()
 
-    else:
+        return engine
 
-        speak_hindi("कैमरा खोलने में समस्या आई")
+    def load_history(self, seconds=INDICATOR_WARMUP_SECONDS):
 
-def set_volume(level):
+        """Rebuilds the watchlist engines from the last `seconds` of the tick store (the poller's
 
-    ok, out = safe_run(["termux-volume", "music", str(level)], f"volume_{level}")
+        warm-up before its first fetch). Runs under the fetch lock, and every tick an on-demand
 
-    if ok:
+        fetch fed to an engine is in the store by then, so the rebuilt engine replaces it."""
 
-        if level == 0:
+        if self.store is None:
 
-            speak_hindi("वॉल्यूम म्यूट कर दिया गया")
+            return 0
 
-        elif level >= 12:
+        since, n = time.time() - seconds, 0
 
-            speak_hindi("वॉल्यूम पूरा बढ़ा दिया गया")
+        with self._fetch_lock:
 
-        else:
+            for coin in self.coins:
 
-            speak_hindi("वॉल्यूम सेट कर दिया गया")
+                for vs in self.currencies:
 
-    else:
+                    engine = IndicatorEngine()
 
-        speak_hindi("वॉल्यूम बदलने में समस्या आई")
+                    try:
 
-def lock_device():
+                        prices = self.store.range(TickStore.asset(coin, vs), since)["price"]
 
-    ok, out = safe_run(["termux-lock"], "lock_device")
+                    except RuntimeError as e:
 
-    if ok:
+                        print(f"[vega] indicator warm-up skipped: {e}")
 
-        speak_hindi("फोन लॉक हो गया")
+                        return n
 
-    else:
+                    for price in prices.tolist():
 
-        speak_hindi("लॉक करने में समस्या आई")
+                        engine.update(price)
 
-def unlock_device():
+                    if engine.ticks:
 
-    ok, out = safe_run(["termux-wake-unlock"], "unlock_device")
+                        with self._lock:
 
-    if ok:
+                            self.engines[(coin, vs)] = engine
 
-        speak_hindi("फोन अनलॉक हो गया")
+                        n += engine.ticks
 
-    else:
+        return n
 
-        speak_hindi("अनलॉक करने में समस्या आई")
+    def indicators(self, coin, vs):
 
-def open_app(app_name_raw):
+        with self._lock:
 
-    app_map = load_json(APP_MAP_FILE, DEFAULT_APP_MAP.copy())
+            engine = self.engines.get((coin, vs))
 
-    app_key = app_name_raw.strip().lower()
+            return engine.snapshot() if engine is not None else None
 
-    if app_key in app_map:
+    def _cached(self, coin, vs, max_age):
 
-        pkg = app_map[app_key]
+        with self._lock:
 
-        if safe_run(["am", "start", "-n", f"{pkg}/.MainActivity"], f"open_app_{app_key}")[0]:
+            quote = self.quotes.get((coin, vs))
 
-            speak_hindi(f"{app_name_raw} खोल दिया")
+        if quote is not None and time.time() - quote["ts"] <= max_age:
 
-            return True
+            return dict(quote, age=time.time() - quote["ts"])
 
-    log_feedback(f"open_app:{app_key}", "fail", "mapping_missing_or_open_failed")
+        return None
 
-    suggested = load_json(SUGGESTED_FIXES, [])
+    def quote(self, coin="bitcoin", vs="usd", max_age=PRICE_MAX_AGE):
 
-    suggested.append({"time": time.time(), "command": f"open_app:{app_key}", "suggestion": "check package name or pronunciation"})
+        """Latest quote as {"price", "change_24h", "ts", "age"}, or None when nothing usable."""
 
-    save_json(SUGGESTED_FIXES, suggested)
+        quote = self._cached(coin, vs, max_age)
 
-    speak_hindi(f"{app_name_raw} नहीं खुल पाया — मैंने suggestion रखा है, टर्मिनल में CONFIRM करके placeholder जोड़ो")
+        if quote is not None:
 
-    return False
+            self.counters["hits"] += 1
 
-# ---------------- HuggingFace helper ----------------
+            return quote
 
-def hf_query(prompt, max_tokens=200):
+        self.counters["misses"] += 1
 
-    if not HF_API_KEY:
+        self.refresh((coin, vs), max_age)
 
-        return None, "no_token"
+        quote = self._cached(coin, vs, max_age)
 
-    headers = {"Authorization": f"Bearer {HF_API_KEY}"}
+        if quote is None:
 
-    payload = {"inputs": prompt, "parameters": {"max_new_tokens": max_tokens, "temperature": 0.1}}
+            quote = self._cached(coin, vs, PRICE_STALE_MAX_AGE)
 
-    try:
+            if quote is not None:
 
-        resp = requests.post(HF_API_URL, headers=headers, json=payload, timeout=30)
+                self.counters["stale"] += 1
 
-    except Exception as e:
+        return quote
 
-        return None, f"request_failed:{e}"
+    def stats(self):
 
-    if resp.status_code == 200:
+        return {**self.counters, "pairs": len(self.quotes)}
 
-        try:
+MARKET = MarketData(CoinGeckoFeed(), TickStore())
 
-            out = resp.json()
+# ---------------- Trading helper ----------------
 
-            if isinstance(out, list) and len(out) and "generated_text" in out[0]:
+def get_coin_price(coin_id="bitcoin", vs_currency="usd", max_age=PRICE_MAX_AGE):
 
-                return out[0]["generated_text"].strip(), None
+    quote = MARKET.quote(coin_id, vs_currency, max_age)
 
-            if isinstance(out, dict) and "generated_text" in out:
+    if quote is None:
 
-                return out["generated_text"].strip(), None
+        return {}
 
-            if isinstance(out, str):
+    return {vs_currency: quote["price"], f"{vs_currency}_24h_change": quote["change_24h"], "age": quote["age"]}
 
-                return out.strip(), None
+def format_price(value, vs=TRADE_CURRENCY):
 
-            return str(out)[:1000], None
+    symbol = {"usd": "$", "inr": "₹", "eur": "€"}.get(vs, vs.upper() + " ")
 
-        except Exception as e:
+    return f"{symbol}{value:.2f}" if value >= 1 else f"{symbol}{value:.4g}"
 
-            return None, f"parse_error:{e}"
+def suggestion_levels(price, change24, ind=None):
 
-    else:
+    """Entry/stop/target for a long at `price`: ATR multiples around an EMA-crossover trend once
 
-        return None, f"HF error {resp.status_code}: {resp.text}"
+    the indicator engine is warm, else the fixed percentages keyed on the 24h change sign."""
 
-# ---------------- Normalizer & safety ----------------
+    if ind and ind["ready"] and ind["atr"] > 0:
 
-def contains_dangerous_intent(text):
+        trend = "up" if ind["ema_fast"] > ind["ema_slow"] else "down"
 
-    t = text.lower()
+        return {"basis": "atr", "trend": trend, "entry": price, "sl": price - ATR_STOP_MULT * ind["atr"],
 
-    for kw in DANGEROUS_KEYWORDS:
+                "tp": price + ATR_TARGET_MULT * ind["atr"], "indicators": ind}
 
-        if kw in t:
+    trend = "up" if change24>0 else "down"
 
-            return True, kw
+    sl_pct = 0.01 if trend=="up" else 0.02
 
-    return False, None
+    return {"basis": "24h", "trend": trend, "entry": price, "sl": price*(1 - sl_pct), "tp": price*(1 + 0.03)}
 
-def normalize_and_intent(text):
+def trading_suggestion(coin="bitcoin", vs=TRADE_CURRENCY):
 
-    dangerous, kw = contains_dangerous_intent(text)
+    data = get_coin_price(coin, vs)
 
-    if dangerous:
+    if not data:
 
-        return "DANGEROUS", kw
+        return "Market data unavailable right now."
 
-    t = text.lower()
+    ticker = WATCHLIST.get(coin, (coin.upper(), []))[0]
 
-    # local rules
+    change24 = data.get(f"{vs}_24h_change",0)
 
-    if any(x in t for x in ["screenshot","स्क्रीनशॉट","screen shot"]):
+    levels = suggestion_levels(data.get(vs), change24, MARKET.indicators(coin, vs))
 
-        return "SCREENSHOT", None
+    entry, sl, tp, trend = levels["entry"], levels["sl"], levels["tp"], levels["trend"]
 
-    if any(x in t for x in ["lock","लॉक"]):
+    note = f" Price is {data['age'] / 60:.0f} min old." if data["age"] > PRICE_MAX_AGE else ""
 
-        return "LOCK", None
+    if levels["basis"] == "atr":
 
-    if any(x in t for x in ["unlock","अनलॉक"]):
+        ind = levels["indicators"]
 
-        return "UNLOCK", None
+        note = f" RSI {ind['rsi']:.0f}, bands {format_price(ind['lower'], vs)}-{format_price(ind['upper'], vs)}." + note
 
-    if any(x in t for x in ["camera","कैमरा","photo","फोटो"]):
+    return (f"{ticker} price {format_price(entry, vs)}, 24h change {change24:.2f}%. Suggested entry {format_price(entry, vs)}, "
 
-        return "CAMERA", None
+            f"stop-loss {format_price(sl, vs)}, take-profit {format_price(tp, vs)} (trend {trend}).{note}")
 
-    if any(x in t for x in ["volume","वॉल्यूम","आवाज़","आवाज"]):
+# ---------------- Backtest ----------------
 
-        if any(x in t for x in ["increase","बढ़ा","फुल","ऊपर","up"]):
+BAR_COLUMNS = {"ts": ("timestamp", "time", "date", "ts", "open_time"), "close": ("close", "price"),
 
-            return "VOLUME_UP", None
+               "high": ("high",), "low": ("low",)}
 
-        if any(x in t for x in ["decrease","घटा","कम","down"]):
+def _parse_ts(value):
 
-            return "VOLUME_DOWN", None
+    if hasattr(value, "timestamp"):  # datetime from a Parquet timestamp column
 
-        if "mute" in t or "म्यूट" in t:
+        return value.timestamp()
 
-            return "VOLUME_MUTE", None
+    try:
 
-    if any(x in t for x in ["time","समय","टाइम"]):
+        ts = float(value)
 
-        return "TIME", None
+    except ValueError:
 
-    if "battery" in t or "बैटरी" in t:
+        from datetime import datetime
 
-        return "BATTERY", None
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
 
-    if "खोलो" in t or "open" in t:
+    return ts / 1000.0 if ts > 1e11 else ts  # epoch milliseconds
 
-        app_name = text.replace("खोलो","").replace("open","").strip()
+def _bar_columns(names):
 
-        return "OPEN_APP", app_name
+    lower = [str(n).strip().lower() for n in names]
 
-    # trading intents
+    cols = {}
 
-    if "bitcoin" in t or "btc" in t or "buy bitcoin" in t:
+    for key, options in BAR_COLUMNS.items():
 
-        return "TRADE_ADVICE", "bitcoin"
+        cols[key] = next((lower.index(o) for o in options if o in lower), None)
 
-    # authorized scan phrasing
+    if cols["ts"] is None or cols["close"] is None:
 
-    if any(x in t for x in ["scan","port scan","run scan","run port"]):
+        raise ValueError(f"need a timestamp and a close/price column, got {list(names)}")
 
-        m = re.search(r"((?:\d{1,3}\.){3}\d{1,3})|([a-z0-9\.-]+\.[a-z]{2,})", t)
+    return cols
 
-        target = m.group(0) if m else None
+def read_price_bars(path, chunk=BACKTEST_CHUNK):
 
-        return "AUTHORIZED_SCAN", target
+    """Streams (ts, high, low, close) tuples from a CSV or Parquet file in chunks of `chunk` rows,
 
-    # fallback: ask HF for normalization (safe prompt)
+    so memory stays flat however long the history is. High/low default to the close."""
 
-    hf_prompt = (
+    if path.endswith(".parquet"):
 
-        "You are a safe normalizer. Convert this user's voice phrase into a short intent phrase "
+        try:
 
-        "for an Android assistant. Do NOT include any instructions to install hacking tools, perform network scans, or illegal actions.\n"
+            import pyarrow.parquet as pq
 
-        f"User: {text}\nNormalizer:"
+        except ImportError:
 
-    )
+            raise RuntimeError("Parquet input needs pyarrow: pip install pyarrow")
 
-    hf_out, err = hf_query(hf_prompt, max_tokens=60)
+        pf = pq.ParquetFile(path)
 
-    if hf_out and not err:
+        cols = _bar_columns(pf.schema_arrow.names)
 
-        low = hf_out.lower()
+        for batch in pf.iter_batches(batch_size=chunk):
 
-        if any(x in low for x in ["screenshot","screen"]):
+            data = {k: batch.column(i).to_pylist() for k, i in cols.items() if i is not None}
 
-            return "SCREENSHOT", None
+            ts = [_parse_ts(t) for t in data["ts"]]
 
-        if "lock" in low:
+            close = data["close"]
 
-            return "LOCK", None
+            high, low = data.get("high", close), data.get("low", close)
 
-        if "unlock" in low:
+            yield list(zip(ts, map(float, high), map(float, low), map(float, close)))
 
-            return "UNLOCK", None
+        return
 
-        if "camera" in low or "photo" in low:
+    with open(path, newline="", encoding="utf-8") as f:
 
-            return "CAMERA", None
+        reader = csv.reader(f)
 
-        if low.startswith("open "):
+        cols = _bar_columns(next(reader))
 
-            return "OPEN_APP", hf_out[5:].strip()
+        t, c = cols["ts"], cols["close"]
 
-        if "time" in low or "समय" in low:
+        h = cols["high"] if cols["high"] is not None else c
 
-            return "TIME", None
+        l = cols["low"] if cols["low"] is not None else c
 
-        if "battery" in low or "बैटरी" in low:
+        while True:
 
-            return "BATTERY", None
+            rows = list(itertools.islice(reader, chunk))
 
-        if any(x in low for x in ["volume","वॉल्यूम","आवाज","आवाज़"]):
+            if not rows:
 
-            if any(x in low for x in ["increase","up","बढ़ा","फुल"]):
+                return
 
-                return "VOLUME_UP", None
+            yield [(_parse_ts(r[t]), float(r[h]), float(r[l]), float(r[c])) for r in rows if r]
 
-            if any(x in low for x in ["decrease","down","कम","घटा"]):
+class Backtest:
 
-                return "VOLUME_DOWN", None
+    """Replays bars through the live suggestion rules: while flat, every bar where
 
-    return "UNKNOWN", text
+    suggestion_levels() would answer opens a long at the close with its stop and target; a bar
 
-# ---------------- Voice listening ----------------
+    whose low reaches the stop or high reaches the target closes it (stop first when a bar
 
-try:
+    touches both, the conservative reading). The 24h change comes from a rolling 24h window."""
 
-    import speech_recognition as sr
+    def __init__(self, fee_pct=BACKTEST_FEE_PCT, engine=None):
 
-except Exception:
+        self.fee = fee_pct / 100.0
 
-    print("[vega] Missing dependency: SpeechRecognition. Install with: pip install SpeechRecognition")
+        self.engine = engine or IndicatorEngine()
 
-    raise
+        self.day = deque()  # (ts, close) within the last 24h
 
-def listen_google_stt(timeout=LISTEN_SECONDS, phrase_limit=LISTEN_SECONDS):
+        self.position = None
 
-    r = sr.Recognizer()
+        self.equity = self.peak = 1.0
 
-    with sr.Microphone() as source:
+        self.max_drawdown = 0.0
 
-        r.adjust_for_ambient_noise(source, duration=0.8)
+        self.trades = Counter()
 
-        print("सुन रहा हूँ... (Google STT)")
+        self.bars = 0
 
-        audio = r.listen(source, timeout=timeout, phrase_time_limit=phrase_limit)
+    def _close(self, price, reason):
 
-        try:
+        pos, self.position = self.position, None
 
-            text = r.recognize_google(audio, language='hi-IN')
+        ret = price / pos["entry"] * (1 - self.fee) ** 2 - 1
 
-            return text
+        self.equity *= 1 + ret
 
-        except sr.UnknownValueError:
+        self.peak = max(self.peak, self.equity)
 
-            try:
+        self.max_drawdown = max(self.max_drawdown, 1 - self.equity / self.peak)
 
-                text = r.recognize_google(audio, language='en-US')
+        self.trades[reason] += 1
 
-                return text
+        self.trades["win" if ret > 0 else "loss"] += 1
 
-            except Exception:
+        self.trades[f"{pos['trend']}_{'win' if ret > 0 else 'loss'}"] += 1
 
-                return ""
+    def feed(self, bars):
 
-        except Exception:
+        engine, day = self.engine, self.day
 
-            return ""
+        for ts, high, low, close in bars:
 
-# Optional: Vosk offline STT fallback (if user installed vosk & model)
+            self.bars += 1
 
-def listen_vosk_offline():
+            pos = self.position
 
-    try:
+            if pos is not None:
 
-        from vosk import Model, KaldiRecognizer
+                if low <= pos["sl"]:
 
-        import pyaudio
+                    self._close(pos["sl"], "stop")
 
-    except Exception:
+                elif high >= pos["tp"]:
 
-        return ""
+                    self._close(pos["tp"], "target")
 
-    model_path = "vosk-model-small-hi-0.22"  # Updated path as per download
+            engine.update(close, high, low)
 
-    if not os.path.exists(model_path):
+            day.append((ts, close))
 
-        return ""
+            while ts - day[0][0] > 24 * 3600:
 
-    wf_rate = 16000
+                day.popleft()
 
-    model = Model(model_path)
+            if self.position is None and engine.ticks >= engine.warmup:
 
-    rec = KaldiRecognizer(model, wf_rate)
+                change24 = (close / day[0][1] - 1) * 100
 
-    p = pyaudio.PyAudio()
+                self.position = suggestion_levels(close, change24, engine.snapshot())
 
-    stream = p.open(format=pyaudio.paInt16, channels=1, rate=wf_rate, input=True, frames_per_buffer=8000)
+            self.last = close
 
-    stream.start_stream()
+    def report(self):
 
-    print("सुन रहा हूँ... (Vosk offline)")
+        if self.position is not None:
 
-    while True:
+            self._close(self.last, "open_at_end")
 
-        data = stream.read(4000, exception_on_overflow=False)
+        closed = self.trades["win"] + self.trades["loss"]
 
-        if rec.AcceptWaveform(data):
+        return {"bars": self.bars, "trades": closed, "pnl_pct": (self.equity - 1) * 100,
 
-            res = json.loads(rec.Result())
+                "max_drawdown_pct": self.max_drawdown * 100, "hit_rate": self.trades["win"] / closed if closed else 0.0,
 
-            return res.get("text", "")
+                **{k: v for k, v in self.trades.items() if k not in ("win", "loss")}}
 
-    return ""
+def store_bar_chunks(asset, interval="1m", start=None, end=None, chunk=BACKTEST_CHUNK, store=None):
 
-# ---------------- Main voice loop ----------------
+    """Backtest input from the tick store: (ts, high, low, close) chunks of downsampled bars."""
 
-def voice_loop():
+    bars = (store or TickStore()).bars(asset, start, end, interval)
 
-    while True:
+    for i in range(0, bars["ts"].size, chunk):
 
-        try:
+        j = i + chunk
 
-            text = listen_google_stt()
+        yield list(zip(bars["ts"][i:j].tolist(), bars["high"][i:j].tolist(), bars["low"][i:j].tolist(), bars["close"][i:j].tolist()))
 
-            if not text:
+def run_backtest(path, fee_pct=BACKTEST_FEE_PCT):
 
-                # try offline fallback
+    """`path` is a CSV/Parquet file, or store:<coin>_<vs>[:1m|1h|1d] for the local tick store."""
 
-                text = listen_vosk_offline()
+    bt = Backtest(fee_pct)
 
-            if not text:
+    start = time.perf_counter()
 
-                continue
+    if path.startswith("store:"):
 
-            print(f"तुम बोले: {text}")
+        asset, _, interval = path[len("store:"):].partition(":")
 
-            log_usage(text)
+        chunks = store_bar_chunks(asset, interval or "1m")
 
-            intent, meta = normalize_and_intent(text)
+    else:
 
-            if intent == "DANGEROUS":
+        chunks = read_price_bars(path)
 
-                speak_hindi("माफ़ कीजिए — मैं यह काम करने में मदद नहीं कर सकता।")
+    for bars in chunks:
 
-                log_feedback(text, "blocked", f"dangerous:{meta}")
+        bt.feed(bars)
 
-                save_memory(text, "blocked_dangerous")
+    elapsed = time.perf_counter() - start
 
-                continue
+    result = bt.report()
 
-            # handle local intents
+    print(f"{path}: {result['bars']} bars in {elapsed:.2f}s ({result['bars'] / max(elapsed, 1e-9) * 60 / 1e6:.1f}M bars/min)")
 
-            if intent == "SCREENSHOT":
+    print(f"  trades {result['trades']}  hit rate {result['hit_rate'] * 100:.1f}%  PnL {result['pnl_pct']:+.2f}%  "
 
-                take_screenshot(); save_memory(text, "screenshot")
+          f"max drawdown {result['max_drawdown_pct']:.2f}%  (fee {fee_pct}%/side)")
 
-                continue
+    print("  exits:", {k: v for k, v in result.items() if k in ("stop", "target", "open_at_end")},
 
-            if intent == "LOCK":
+          " by trend:", {k: v for k, v in result.items() if k.startswith(("up_", "down_"))})
 
-                lock_device(); save_memory(text, "lock")
+    return result
 
-                continue
+def write_synthetic_bars(path, n=365 * 24 * 60, seed=7):
 
-            if intent == "UNLOCK":
+    """A random-walk year of 1m bars as CSV (timestamp,open,high,low,close) for a dry run."""
 
-                unlock_device(); save_memory(text, "unlock")
+    rng = random.Random(seed)
 
-                continue
+    ts, price = 1_700_000_000, 60000.0
 
-            if intent == "CAMERA":
+    with open(path, "w", newline="") as f:
 
-                camera_photo(); save_memory(text, "camera")
+        w = csv.writer(f)
 
-                continue
+        w.writerow(["timestamp", "open", "high", "low", "close"])
 
-            if intent == "VOLUME_UP":
+        for i in range(n):
 
-                set_volume(15); save_memory(text, "volume_up")
+            close = price * (1 + rng.gauss(0, 0.0008))
 
-                continue
+            wick = abs(rng.gauss(0, 0.0004)) * price
 
-            if intent == "VOLUME_DOWN":
+            w.writerow([ts + 60 * i, f"{price:.2f}", f"{max(price, close) + wick:.2f}", f"{min(price, close) - wick:.2f}", f"{close:.2f}"])
 
-                set_volume(3); save_memory(text, "volume_down")
+            price = close
 
-                continue
+    return path
 
-            if intent == "VOLUME_MUTE":
+# ---------------- Replay benchmark ----------------
 
-                set_volume(0); save_memory(text, "volume_mute")
+class StubSubprocess:
 
-                continue
+    """Replay stand-in for CommandRunner.local: every non-device command is counted, sleeps
 
-            if intent == "TIME":
+    `latency` seconds and succeeds with canned output. Nothing is executed."""
 
-                tstr = time.strftime("अभी समय है %H:%M:%S")
+    CANNED = {}
 
-                speak_hindi(tstr); save_memory(text, "time")
+    def __init__(self, latency=0.0):
 
-                continue
+        self.latency = latency
 
-            if intent == "BATTERY":
+        self.calls = Counter()
 
-                try:
+    def run(self, cmd, *args, **kw):
 
-                    out = subprocess.check_output(["dumpsys", "battery"], text=True)
+        name = os.path.basename(cmd[0])
 
-                    m = re.search(r"level: (\d+)", out)
+        self.calls[name] += 1
 
-                    level = m.group(1) if m else "unknown"
+        if self.latency:
 
-                    speak_hindi(f"बैटरी {level}% है")
+            time.sleep(self.latency)
 
-                except Exception:
+        out = self.CANNED.get(name, "")
 
-                    speak_hindi("बैटरी लेवल नहीं मिला")
+        out = out if kw.get("text") else out.encode()
 
-                save_memory(text, "battery")
+        return subprocess.CompletedProcess(cmd, 0, out, out[:0])
 
-                continue
+class _StubResponse:
 
-            if intent == "OPEN_APP":
+    def __init__(self, payload, status_code=200):
 
-                opened = open_app(meta)
+        self._payload = payload
 
-                save_memory(text, f"open_app:{meta}:{opened}")
+        self.status_code = status_code
 
-                continue
+        self.text = json.dumps(payload)
 
-            if intent == "TRADE_ADVICE":
+    def json(self):
 
-                if meta == "bitcoin":
+        return self._payload
 
-                    sugg = trading_suggestion_for_btc()
+class StubHttp:
 
-                    speak_hindi(sugg)
+    """Replay stand-in for HTTP: HF answers with a canned generation, CoinGecko with a fixed quote."""
 
-                    save_memory(text, sugg)
+    def __init__(self, hf_latency=0.0, coin_latency=0.0, reply="ठीक है, समझ गया।"):
 
-                    continue
+        self.hf_latency = hf_latency
 
-            # Authorized scan flow
+        self.coin_latency = coin_latency
 
-            if intent == "AUTHORIZED_SCAN":
+        self.reply = reply
 
-                tgt = meta
+        self.calls = Counter()
 
-                if not tgt:
+    def get(self, url, params=None, **kw):
 
-                    speak_hindi("कृपया लक्ष्य बताइए — IP या domain.")
+        self.calls["coingecko"] += 1
 
-                    continue
+        if self.coin_latency:
 
-                if not is_valid_hostname_or_ip(tgt):
+            time.sleep(self.coin_latency)
 
-                    speak_hindi("लक्ष्य invalid है।")
+        ids = (params or {}).get("ids", "bitcoin").split(",")
 
-                    continue
+        currencies = (params or {}).get("vs_currencies", "usd").split(",")
 
-                wl = load_json(WHITELIST_FILE, {})
+        quote = {}
 
-                if tgt not in wl:
+        for vs in currencies:
 
-                    speak_hindi("यह लक्ष्य whitelist में नहीं है — मालिक से invitation token लें।")
+            quote[vs], quote[f"{vs}_24h_change"] = 60000.0, 1.5
 
-                    audit_log({"action":"scan_blocked","target":tgt,"reason":"not_whitelisted"})
+        return _StubResponse({c: dict(quote) for c in ids})
 
-                    continue
+    def post(self, url, **kw):
 
-                speak_hindi("Owner invite token terminal में डालिए।")
+        self.calls["hf"] += 1
 
-                token = input("Invite token: ").strip()
+        if self.hf_latency:
 
-                if not verify_invite_token(tgt, token):
+            time.sleep(self.hf_latency)
 
-                    speak_hindi("Token invalid. Aborting.")
+        return _StubResponse([{"generated_text": self.reply}])
 
-                    audit_log({"action":"token_invalid","target":tgt,"token_try": token})
+    def request(self, method, url, **kw):  # HttpClient.mount() target
 
-                    continue
+        return self.post(url, **kw) if method == "POST" else self.get(url, **kw)
 
-                ok = require_typed_confirmation()
+    def close(self):
 
-                if not ok:
+        pass
 
-                    speak_hindi("Confirmation not received. Aborting.")
+def load_replay_corpus(path=None):
 
-                    continue
+    """Utterances from a .txt file (one per line), a usage JSON list (legacy usage.json or its
 
-                ok, out = run_approved_action("port_scan", target=tgt)
+    .migrated copy), an event-log directory, or by default this install's usage log (under
 
-                if ok:
+    REPLAY_SOURCE_DIR, since --bench-replay itself writes to a scratch LOG_DIR)."""
 
-                    speak_hindi("Scan complete. Result saved to logs. Summary:")
+    if path is None:
 
-                    speak_hindi(out[:300] if out else "No output")
+        PERSIST.flush()  # replaying in place: this session's queued usage belongs to the log
 
-                else:
+        events = os.path.join(REPLAY_SOURCE_DIR, "events")
 
-                    speak_hindi("Scan failed: " + str(out)[:200])
+        path = events if os.path.isdir(events) else None
 
-                continue
+    if path and os.path.isdir(path):
 
-            # If unknown -> ask HF for help (understanding / friendly reply)
+        corpus = [e.get("command") for e in EventLog(path).iter_events("usage")]
 
-            speak_hindi("सोच रहा हूँ...") # quick feedback
+    elif path and path.endswith((".json", ".migrated")):
 
-            hf_resp, err = hf_query(text, max_tokens=180)
+        with open(path, encoding="utf-8") as f:
 
-            if hf_resp:
+            corpus = [e.get("command") if isinstance(e, dict) else e for e in json.load(f)]
 
-                print("HF:", hf_resp)
+    elif path:
 
-                speak_hindi(hf_resp if len(hf_resp) < 300 else hf_resp[:300] + "...")
+        with open(path, encoding="utf-8") as f:
 
-                save_memory(text, hf_resp)
+            corpus = [line.strip() for line in f]
 
-                log_feedback(text, "success", "hf_reply")
+    else:
 
-            else:
+        corpus = []
 
-                print("[vega] HF error:", err)
+    corpus = [u for u in corpus if isinstance(u, str) and u.strip()]
 
-                speak_hindi("समझ नहीं आया — क्या सरल शब्दों में बोलोगे?")
+    if corpus:
 
-                log_feedback(text, "fail", err if err else "hf_fail")
+        return corpus, path
 
-                save_memory(text, "hf_fail")
+    return list(BENCH_UTTERANCES), "built-in samples"
 
-        except KeyboardInterrupt:
+@contextlib.contextmanager
 
-            speak_hindi("सर्विस बंद कर रहा हूँ — बाय")
+def replay_services(device, local, http, engine):
 
-            save_json(os.path.join(LOG_DIR, "shutdown.json"), {"time": time.time()})
+    """Plug replay stubs into RUNNER, HTTP and TTS through their own seams, and put the real
 
-            os._exit(0)
+    ones back on exit."""
 
-        except Exception as e:
+    saved = RUNNER.device, RUNNER.local, TTS.engine, sys.stdin
 
-            print("[vega] voice loop exception:", e)
+    RUNNER.device, RUNNER.local, TTS.engine = device, local, engine
 
-            log_feedback("internal_exception", "fail", str(e))
+    sys.stdin = io.StringIO("")  # scan prompts see EOF instead of waiting for a keyboard
 
-            time.sleep(1)
+    for url in (HF_API_URL, COINGECKO_PRICE_URL):
 
-# ---------------- Terminal monitor ----------------
+        HTTP.mount(urllib.parse.urlsplit(url).hostname, http)
 
-def terminal_monitor():
+    try:
 
-    while True:
+        yield
 
-        try:
+    finally:
 
-            cmd = input().strip()
+        RUNNER.device, RUNNER.local, TTS.engine, sys.stdin = saved
 
-            if not cmd:
+        HTTP.close()  # drops the stubs; real sessions reopen on demand
 
-                continue
+        device.close()
 
-            C = cmd.upper()
+def bench_replay(corpus_path=None, rounds=3, hf_latency=0.0, device_latency=0.0, coin_latency=0.0):
 
-            if C == "CONFIRM":
+    """Drive handle_utterance (normalize -> router -> handlers -> TTS/persist) from transcripts
 
-                suggested = load_json(SUGGESTED_FIXES, [])
+    with device, HF and CoinGecko stubbed; report throughput, stage percentiles and allocations."""
 
-                if not suggested:
+    import tracemalloc
 
-                    print("कोई suggested fixes नहीं है।")
+    corpus, source = load_replay_corpus(corpus_path)
 
-                    continue
+    device, local, http = FakeDeviceExecutor(device_latency), StubSubprocess(device_latency), StubHttp(hf_latency, coin_latency)
 
-                first = suggested.pop(0)
+    PERSIST.start()
 
-                save_json(SUGGESTED_FIXES, suggested)
+    with replay_services(device, local, http, FakeTTSEngine()), open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
 
-                command = first.get("command", "")
+        handle_utterance(corpus[0])  # warm pools and caches outside the measurement
 
-                if command.startswith("open_app:"):
+        PERSIST.flush()
 
-                    app_name = command.split(":", 1)[1]
+        STAGES.reset()
 
-                    app_map = load_json(APP_MAP_FILE, DEFAULT_APP_MAP.copy())
+        start = time.perf_counter()
 
-                    app_map[app_name] = "com.example.placeholder"
+        for _ in range(rounds):
 
-                    save_json(APP_MAP_FILE, app_map)
+            for u in corpus:
 
-                    print(f"Placeholder mapping added for '{app_name}'. Edit {APP_MAP_FILE} to set real package.")
+                handle_utterance(u)
 
-                    speak_hindi(f"{app_name} के लिए placeholder mapping जोड़ दिया — फ़ाइल एडिट करके सही package डाल देना")
+        PERSIST.flush()
 
-                else:
+        elapsed = time.perf_counter() - start
 
-                    print("Applied safe non-destructive suggestion (logged).")
+        timed_stages = STAGES.reset()
 
-            elif C == "ANALYZE":
+        tracemalloc.start()
 
-                analyze()
+        before = tracemalloc.take_snapshot()
 
-                print("Analyze complete.")
+        for u in corpus:
 
-            elif C == "SHOWLOGS":
+            handle_utterance(u)
 
-                fb = load_json(FEEDBACK_FILE, [])
+        PERSIST.flush()
 
-                print("Recent feedback (last 10):")
+        after = tracemalloc.take_snapshot()
 
-                for e in fb[-10:]:
+        peak = tracemalloc.get_traced_memory()[1]
 
-                    print(e)
+        tracemalloc.stop()
 
-            elif C in ("EXIT","QUIT"):
+    n = rounds * len(corpus)
 
-                speak_hindi("सर्विस बंद कर रहा हूँ — बाय")
+    diff = [d for d in after.compare_to(before, "lineno") if d.count_diff > 0]
 
-                save_json(os.path.join(LOG_DIR, "shutdown.json"), {"time": time.time()})
+    blocks = sum(d.count_diff for d in diff)
 
-                os._exit(0)
+    size = sum(d.size_diff for d in diff if d.size_diff > 0)
 
-            else:
+    print(f"replay: {len(corpus)} utterances from {source} x {rounds} rounds "
 
-                print("Commands: CONFIRM, ANALYZE, SHOWLOGS, EXIT")
+          f"(stub latency: hf {hf_latency * 1000:.0f} ms, device {device_latency * 1000:.0f} ms, coin {coin_latency * 1000:.0f} ms)")
 
-        except Exception as e:
+    print(f"  throughput   {n / elapsed:9.1f} utterances/s ({elapsed / n * 1000:.2f} ms/utterance)")
 
-            print("[vega] terminal monitor error:", e)
+    print(timed_stages.report())
 
-        time.sleep(0.5)
+    print(f"stub calls: device {dict(device.calls + local.calls)}  http {dict(http.calls)}")
 
-# ---------------- Analyzer (auto-suggest repairs) ----------------
+    print(f"allocations (1 round under tracemalloc): +{blocks} blocks retained ({blocks / len(corpus):.1f}/utterance), "
 
-def analyze():
+          f"+{size / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB")
 
-    data = load_json(FEEDBACK_FILE, [])
+    for d in sorted(diff, key=lambda d: -d.count_diff)[:5]:
 
-    if not data:
+        frame = d.traceback[0]
 
-        print("No feedback yet.")
+        print(f"    {d.count_diff:6d} blocks  {d.size_diff / 1024:8.1f} KiB  {os.path.basename(frame.filename)}:{frame.lineno}")
 
-        return
+    return n / elapsed, timed_stages
 
-    fails = [d for d in data if d["status"] == "fail"]
+def _argv_value(flag, default):
 
-    if not fails:
+    if flag in sys.argv and len(sys.argv) > sys.argv.index(flag) + 1:
 
-        print("No failures logged.")
+        return sys.argv[sys.argv.index(flag) + 1]
 
-        return
+    return default
 
-    counts = Counter([f["command"] for f in fails])
+# ---------------- Startup ----------------
 
-    most_common, cnt = counts.most_common(1)[0]
+def warm_start():
 
-    if cnt >= 3:
+    """Background half of startup: HTTP stack and device snapshot while the microphone opens."""
 
-        speak_hindi(f"ध्यान दें: '{most_common}' बार-बार फेल हो रहा है — टर्मिनल में CONFIRM करके placeholder जोड़ो")
+    with STARTUP.phase("warm http sessions"):
 
-        suggested = load_json(SUGGESTED_FIXES, [])
+        for url in (HF_API_URL, COINGECKO_PRICE_URL):
 
-        suggested.append({"time": time.time(), "command": most_common, "hint": "possible mapping/permission issue"})
+            HTTP.session(urllib.parse.urlsplit(url).netloc)
 
-        save_json(SUGGESTED_FIXES, suggested)
+    with STARTUP.phase("device state snapshot"):
 
-    else:
+        DEVICE_STATE.refresh()
 
-        print("No recurring failures found.")
+def start_services():
 
-# ---------------- Auxiliary functions ----------------
+    PERSIST.start()
 
-def is_valid_hostname_or_ip(s):
+    TTS.start()
 
-    return bool(re.match(r"^\d{1,3}(\.\d{1,3}){3}$", s) or re.match(r"^[a-z0-9\.-]{1,253}$", s, re.IGNORECASE))
+    MARKET.start()
 
-def verify_invite_token(target, token):
+    VOSK.start_loading()  # offline model loads while Google STT serves the first utterances
 
-    wl = load_json(WHITELIST_FILE, {})
+    threading.Thread(target=warm_start, name="vega-warm", daemon=True).start()
 
-    if target in wl and "token" in wl[target]:
+    STARTUP.mark("start services")
 
-        return wl[target]["token"] == token
+def profile_startup(live=False):
 
-    return False
+    """--startup-profile: times start_services() and the microphone. Unless `live`
 
-def require_typed_confirmation(timeout_seconds=60):
+    (--live, on the phone) the price feed and device commands are stubbed, so the report is
 
-    print("Dangerous action requested. To proceed TYPE: CONFIRM: YES (and press Enter)")
+    reproducible off-device and no made-up tick reaches the real tick store."""
 
-    speak_hindi("ध्यान दें: खतरनाक कार्रवाई के लिए टाइप करके पुष्टि करिए। टर्मिनल में CONFIRM: YES टाइप कीजिये।")
+    if not live:
 
-    start = time.time()
+        MARKET.feed = FakePriceFeed()
 
-    try:
+        scratch = tempfile.mkdtemp(prefix="vega_profile_")
 
-        while time.time() - start < timeout_seconds:
+        atexit.register(shutil.rmtree, scratch, True)
 
-            user = input().strip()
+        MARKET.store = TickStore(scratch)
 
-            return user == "CONFIRM: YES"
+        RUNNER.device, RUNNER.local = FakeDeviceExecutor(), StubSubprocess()
 
-    except Exception:
+    start_services()
 
-        pass
+    start_capture()
 
-    return False
+    time.sleep(0.5)  # let background phases that finish quickly land in the report
 
-def run_approved_action(action_name, target=None, extra_args=None):
+    print(STARTUP.report())
 
-    approved = load_json(APPROVED_CMDS_FILE, {})
+# ---------------- Main ----------------
 
-    if action_name not in approved:
+if __name__ == "__main__":
 
-        return False, f"Action '{action_name}' not found"
+    if "--bench-intent" in sys.argv:
 
-    base_cmd = approved[action_name].copy()
+        bench_intent_matcher()
 
-    final_cmd = []
+        sys.exit(0)
 
-    for part in base_cmd:
+    if "--backtest" in sys.argv:
 
-        if "{target}" in part:
+        path = _argv_value("--backtest", None)
 
-            if not target:
+        if path is None or path.startswith("--"):
 
-                return False, "No target provided"
+            path = write_synthetic_bars(os.path.join(tempfile.mkdtemp(prefix="vega_bt_"), "synthetic_1m.csv"))
 
-            if not is_valid_hostname_or_ip(target):
+        run_backtest(path, fee_pct=float(_argv_value("--fee", BACKTEST_FEE_PCT)))
 
-                return False, "Invalid target format"
+        sys.exit(0)
 
-            final_cmd.append(part.replace("{target}", target))
+    if "--bench-indicators" in sys.argv:
 
-        else:
+        bench_indicators()
 
-            final_cmd.append(part)
+        sys.exit(0)
 
-    if extra_args:
+    if "--bench-device" in sys.argv:
 
-        final_cmd += extra_args
+        bench_device_executor()
 
-    audit_log({"phase":"pre-exec","action":action_name,"cmd":final_cmd,"target":target})
+        sys.exit(0)
 
-    ok,out = safe_run(final_cmd, label=f"approved:{action_name}")
+    if "--bench-http" in sys.argv:
 
-    audit_log({"phase":"post-exec","action":action_name,"cmd":final_cmd,"target":target,"success":ok,"stdout_snippet": (out or "")[:1000]})
+        bench_http_pool()
 
-    return ok, out
+        sys.exit(0)
 
-# ---------------- Trading helper ----------------
+    STARTUP.mark("module definitions")
 
-def get_coin_price(coin_id="bitcoin", vs_currency="usd"):
+    if "--startup-profile" in sys.argv:
 
-    try:
+        profile_startup(live="--live" in sys.argv)
 
-        r = requests.get(f"https://api.coingecko.com/api/v3/simple/price?ids={coin_id}&vs_currencies={vs_currency}&include_24hr_change=true", timeout=10)
+        sys.exit(0)
 
-        j = r.json()
+    if "--bench-replay" in sys.argv:
 
-        return j.get(coin_id, {})
+        corpus = _argv_value("--bench-replay", None)
 
-    except Exception:
+        bench_replay(None if corpus is None or corpus.startswith("--") else corpus,
 
-        return {}
+                     rounds=int(_argv_value("--rounds", 3)),
 
-def trading_suggestion_for_btc():
+                     hf_latency=float(_argv_value("--hf-ms", 0)) / 1000.0,
 
-    data = get_coin_price("bitcoin","usd")
+                     device_latency=float(_argv_value("--device-ms", 0)) / 1000.0,
 
-    if not data:
+                     coin_latency=float(_argv_value("--coin-ms", 0)) / 1000.0)
 
-        return "Market data unavailable right now."
+        sys.exit(0)
 
-    price = data.get("usd")
+    if "--trace-chrome" in sys.argv:
 
-    change24 = data.get("usd_24h_change",0)
+        i = sys.argv.index("--trace-chrome")
 
-    trend = "up" if change24>0 else "down"
+        if len(sys.argv) <= i + 1:
 
-    sl_pct = 0.01 if trend=="up" else 0.02
+            print("usage: vega_full.py --trace-chrome <traces.jsonl> [out.json]")
 
-    entry = price
+            sys.exit(2)
 
-    sl = round(entry*(1 - sl_pct),2)
+        convert_trace_file(sys.argv[i + 1], sys.argv[i + 2] if len(sys.argv) > i + 2 else None)
 
-    tp = round(entry*(1 + 0.03),2)
+        sys.exit(0)
 
-    return f"BTC price ${entry:.2f}, 24h change {change24:.2f}%. Suggested entry ${entry:.2f}, stop-loss ${sl:.2f}, take-profit ${tp:.2f} (trend {trend})."
+    if "--trace" in sys.argv:
 
-# ---------------- Main ----------------
+        TRACER.enabled = True
 
-if __name__ == "__main__":
+    if "--fake-prices" in sys.argv:
 
-    if HF_API_KEY and HF_API_KEY.startswith("hf_"):
+        MARKET.feed = FakePriceFeed(seed=int(time.time()))
 
-        print("\033[96m[vega]\033[0m HuggingFace integration enabled.")
+    if "--listen-wav" in sys.argv:
 
-    else:
+        path = _argv_value("--listen-wav", None)
 
-        print("\033[93m[vega]\033[0m HuggingFace integration disabled (no token or invalid).")
+        if path is None or path.startswith("--"):
 
-    speak_hindi("वेगा सर्विस शुरू हो रही है")
+            print("usage: vega_full.py --listen-wav <mono 16-bit .wav>")
 
-    analyze() # quick analyze at start
+            sys.exit(2)
 
-    # start threads
+        try:
 
-    t_voice = threading.Thread(target=voice_loop, daemon=True)
+            replay_wav(path)
 
-    t_term = threading.Thread(target=terminal_monitor, daemon=True)
+        except (OSError, EOFError, ValueError, wave.Error) as e:
 
-    t_voice.start()
+            print(f"[vega] cannot replay {path}: {e}")
 
-    t_term.start()
+            sys.exit(1)
 
-    # main keepalive
+        sys.exit(0)
 
-    try:
+    if HF_API_KEY and HF_API_KEY.startswith("hf_"):
 
-        while True:
+        print("\033[96m[vega]\033[0m HuggingFace integration enabled.")
 
-            time.sleep(10)
+    else:
 
-            # keep awake (best-effort)
+        print("\033[93m[vega]\033[0m HuggingFace integration disabled (no token or invalid).")
 
-            try:
+    start_services()
 
-                subprocess.run(["termux-wake-lock"], check=False)
+    speak_hindi("वेगा सर्विस शुरू हो रही है")
 
-            except:
+    try:
 
-                pass
+        asyncio.run(run_core())
 
     except KeyboardInterrupt:
 
-        speak_hindi("सर्विस बंद कर रहा हूँ — बाय")
-
-        save_json(os.path.join(LOG_DIR, "shutdown.json"), {"time": time.time()})
+        speak_hindi("सर्विस बंद कर रहा हूँ — बाय", interrupt=True)
 
-        os._exit(0)
+        shutdown_service()